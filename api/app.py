@@ -1,58 +1,284 @@
 # api/app.py - VERSION CORRIGÉE AVEC INSTRUMENTATOR
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from starlette.middleware.base import BaseHTTPMiddleware
 import joblib
-import pandas as pd
 import logging
 import os
-from .config import MODEL_PATH, MODEL_SCALERX_PATH, MODEL_SCALERY_PATH, PREDICTIONS_LOG
+from .config import (
+    MODEL_SCALERX_PATH, MODEL_SCALERY_PATH, PREDICTIONS_LOG,
+    MODELS_DIR, DEFAULT_MODEL, FEATURE_COLUMNS, MODEL_RELOAD_INTERVAL, MODEL_MEMORY_BUDGET_MB,
+    MICRO_BATCH_ENABLED, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS,
+    INFERENCE_EXECUTOR, INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, INFERENCE_MODE,
+    PREDICTION_LOG_BUFFER_SIZE, PREDICTION_LOG_FLUSH_SIZE, PREDICTION_LOG_FLUSH_INTERVAL,
+    PREDICTION_STORE, PREDICTION_STORE_COMPACT_INTERVAL,
+    PREDICTION_STATS_SNAPSHOT, PREDICTION_STATS_SNAPSHOT_INTERVAL, LOG_RETENTION_DAYS, REFERENCE_DATA_PATH,
+    ROLLUPS_DB, ROLLUP_INTERVAL, ROLLUP_MINUTE_RETENTION_DAYS, ROLLUP_HOUR_RETENTION_DAYS,
+    DRIFT_WINDOW_SIZE, DRIFT_METRICS_SOURCE, DRIFT_UPDATE_INTERVAL, RECENT_PREDICTIONS_SIZE,
+    WINDOW_METRICS_LOCK,
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, PREDICTION_CACHE_DECIMALS,
+    REPORT_PRERENDER_INTERVAL, REPORT_CACHE_MAX_ENTRIES, STARTUP_MODE, LAZY_EVIDENTLY, MODEL_MMAP_MODE
+)
+from .executor import InferenceExecutor
+from .registry import ModelRegistry
+from .prediction_cache import PredictionCache
+from .prediction_log import PredictionLogWriter
+from .storage import get_prediction_store
+from .prediction_stats import RunningPredictionStats
+from .rollups import PredictionRollups
+from .drift import StreamingDriftEngine
+from .reference import load_reference_data, load_reference_profile
+from .monitoring_evidently import (
+    MONITORED_COLUMNS, REPORTS_DIR,
+    update_prometheus_drift_metrics, update_streaming_drift_metrics, update_window_drift_metrics,
+    set_window_confidence_baseline,
+    generate_data_drift_report, generate_data_summary_report, load_evidently
+)
+from .scheduler import DriftMetricsScheduler, SharedIntervalGate
+from .windows import RecentPredictions, default_window, get_windows, set_recent_predictions
+from .report_cache import ReportCache
 from .routes import router, set_model_globals
-from .monitoring_prometheus import prometheus_middleware, setup_metrics_endpoint
+from .monitoring_prometheus import PrometheusMiddleware, setup_metrics_endpoint, StartupTimer, MULTIPROCESS
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Durée des imports du module (phase "imports" du démarrage)
+IMPORTS_DURATION = time.perf_counter() - _IMPORT_STARTED
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gère le cycle de vie de l'application"""
     # ========== STARTUP ==========
-    logger.info("🚀 Starting up Iris Classification API...")
+    logger.info(f"🚀 Starting up Iris Classification API (mode {STARTUP_MODE})...")
+    startup_timer = StartupTimer(IMPORTS_DURATION)
     
-    # Chargement du modèle
+    # Chargement du modèle par défaut via le registre (les autres sont chargés à la demande)
     global model, model_scaler_X, model_scaler_y
-    
+
+    model_registry = ModelRegistry(
+        MODELS_DIR,
+        DEFAULT_MODEL,
+        mode=INFERENCE_MODE,
+        micro_batching=MICRO_BATCH_ENABLED,
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+        memory_budget_mb=MODEL_MEMORY_BUDGET_MB,
+        mmap_mode=MODEL_MMAP_MODE
+    )
     try:
-        model = joblib.load(MODEL_PATH)
-        model_scaler_X = joblib.load(MODEL_SCALERX_PATH)
-        model_scaler_y = joblib.load(MODEL_SCALERY_PATH)
+        default_model = await model_registry.load(DEFAULT_MODEL)
+        model = default_model.engine.model
+        model_scaler_X = joblib.load(MODEL_SCALERX_PATH, mmap_mode=MODEL_MMAP_MODE)
+        model_scaler_y = joblib.load(MODEL_SCALERY_PATH, mmap_mode=MODEL_MMAP_MODE)
         logger.info("✅ Modèles chargés avec succès")
     except Exception as e:
         logger.error(f"❌ Erreur lors du chargement des modèles: {e}")
         raise
+    startup_timer.mark("models")
+
+    # Mode "eager" : Evidently importé dès le démarrage plutôt qu'au premier rapport
+    if not LAZY_EVIDENTLY:
+        load_evidently()
+        startup_timer.mark("evidently")
     
-    # Initialisation du fichier de log
+    # Initialisation du stockage du log
     os.makedirs("logfiles", exist_ok=True)
-    if not os.path.exists(PREDICTIONS_LOG):
-        df_log = pd.DataFrame(columns=[
-            'timestamp', 'sepal_length', 'sepal_width', 
-            'petal_length', 'petal_width', 'prediction',
-            'prediction_name', 'confidence'
-        ])
-        df_log.to_csv(PREDICTIONS_LOG, index=False)
-        logger.info("📝 Fichier de log des prédictions initialisé")
+    prediction_store = get_prediction_store()
+    prediction_store.initialize()
+    logger.info(f"📝 Stockage du log des prédictions: {PREDICTION_STORE}")
+    startup_timer.mark("prediction_store")
+
+    # Écrivain bufferisé du log (un seul par stockage)
+    prediction_logger = PredictionLogWriter.for_store(
+        prediction_store,
+        max_buffer=PREDICTION_LOG_BUFFER_SIZE,
+        flush_size=PREDICTION_LOG_FLUSH_SIZE,
+        flush_interval=PREDICTION_LOG_FLUSH_INTERVAL,
+        compact_interval=PREDICTION_STORE_COMPACT_INTERVAL,
+        retention_days=LOG_RETENTION_DAYS
+    )
+
+    # Statistiques incrémentales (snapshot, ou reconstruction depuis le log)
+    prediction_stats = RunningPredictionStats.load_or_rebuild(
+        PREDICTION_STATS_SNAPSHOT,
+        prediction_store,
+        snapshot_interval=PREDICTION_STATS_SNAPSHOT_INTERVAL
+    )
+    prediction_logger.add_listener(prediction_stats.update)
+    prediction_logger.add_flush_callback(prediction_stats.maybe_save_snapshot)
+
+    # Agrégats par minute et par heure, mis à jour par le thread écrivain
+    prediction_rollups = None
+    if ROLLUP_INTERVAL > 0:
+        prediction_rollups = PredictionRollups(
+            ROLLUPS_DB,
+            prediction_store,
+            interval=ROLLUP_INTERVAL,
+            minute_retention_days=ROLLUP_MINUTE_RETENTION_DAYS,
+            hour_retention_days=ROLLUP_HOUR_RETENTION_DAYS
+        )
+        prediction_rollups.initialize()
+        prediction_logger.add_flush_callback(prediction_rollups.maybe_update)
+        logger.info(f"🗂️ Agrégats par minute/heure toutes les {ROLLUP_INTERVAL:g}s ({ROLLUPS_DB})")
+    startup_timer.mark("prediction_stats")
+
+    # Drift en streaming : profil de référence précalculé (data/reference_profile.npz),
+    # fenêtre courante initialisée avec la fin du log puis alimentée à chaque prédiction
+    drift_engine = StreamingDriftEngine(
+        load_reference_profile(), MONITORED_COLUMNS, window_size=DRIFT_WINDOW_SIZE
+    )
+    read_drift_window = lambda: prediction_store.read(
+        columns=[*MONITORED_COLUMNS, "prediction", "confidence"], limit=DRIFT_WINDOW_SIZE
+    )
+
+    def refresh_baselines():
+        # Nouveau profil seulement si l'empreinte du CSV de référence a changé
+        profile = load_reference_profile()
+        if profile is not drift_engine.profile:
+            drift_engine.set_reference(profile, read_drift_window())
+            logger.info("📐 Référence modifiée : profil rechargé et fenêtre de drift recalculée")
+
+        # Base des confiances : le modèle par défaut évalué sur la référence,
+        # partagée avec les moteurs des fenêtres (rapports et métriques par fenêtre)
+        default = model_registry.default
+        key = (profile.digest, default.version)
+        if drift_engine.confidence_baseline_key != key:
+            reference = load_reference_data()
+            probabilities = default.engine.predict_proba(reference[FEATURE_COLUMNS].to_numpy())
+            drift_engine.set_confidence_baseline(probabilities.max(axis=1), key)
+            set_window_confidence_baseline(probabilities.max(axis=1), key)
+
+    drift_engine.observe_frame(read_drift_window())
+    refresh_baselines()
+    if not MULTIPROCESS:
+        prediction_logger.add_listener(drift_engine.observe_records)
+    logger.info(f"📈 Moteur de drift en streaming prêt (fenêtre de {DRIFT_WINDOW_SIZE} prédictions)")
+    startup_timer.mark("drift_engine")
+
+    # Fenêtres des données courantes (vérifiées dès le démarrage) et buffer des
+    # dernières prédictions ; en multiprocess, les fenêtres sont relues dans le log partagé
+    windows = get_windows()
+    default_window()
+    if RECENT_PREDICTIONS_SIZE > 0 and not MULTIPROCESS:
+        recent_predictions = RecentPredictions(RECENT_PREDICTIONS_SIZE)
+        recent_predictions.load(prediction_store)
+        prediction_logger.add_listener(recent_predictions.observe_records)
+        set_recent_predictions(recent_predictions)
+    logger.info(f"🪟 Fenêtres de monitoring: {', '.join(windows)}")
+    startup_timer.mark("windows")
+
+    # Rafraîchissement planifié des métriques de drift (thread dédié, single-flight)
+    if DRIFT_METRICS_SOURCE == "streaming" and MULTIPROCESS:
+        # Plusieurs workers : chaque processus ne voit que ses propres requêtes,
+        # la fenêtre est donc relue depuis le log partagé (lecture de la fin seulement)
+        def drift_metrics():
+            drift_engine.reset(read_drift_window())
+            return update_streaming_drift_metrics(drift_engine)
+    elif DRIFT_METRICS_SOURCE == "streaming":
+        def drift_metrics():
+            return update_streaming_drift_metrics(drift_engine)
+    else:
+        drift_metrics = update_prometheus_drift_metrics
+
+    # Métriques par fenêtre : en multiprocess, chaque worker relirait les mêmes
+    # fenêtres dans le log partagé ; un seul les calcule par intervalle (gauges "mostrecent")
+    windows_gate = SharedIntervalGate(WINDOW_METRICS_LOCK, DRIFT_UPDATE_INTERVAL) if MULTIPROCESS else None
+    last_windows = None
+
+    def drift_job():
+        nonlocal last_windows
+        # Référence et base des confiances à jour pour toutes les sources de métriques ;
+        # une série Prometheus par fenêtre configurée, en plus des métriques principales
+        refresh_baselines()
+        summary = drift_metrics()
+        if windows_gate is None:
+            last_windows = update_window_drift_metrics(windows)
+        else:
+            ran, result = windows_gate.run(lambda: update_window_drift_metrics(windows))
+            if ran:
+                last_windows = result
+        summary["windows"] = last_windows
+        return summary
+    drift_scheduler = DriftMetricsScheduler(drift_job, interval=DRIFT_UPDATE_INTERVAL)
+    drift_scheduler.start()
+    logger.info(f"⏱️ Métriques de drift ({DRIFT_METRICS_SOURCE}) rafraîchies toutes les {DRIFT_UPDATE_INTERVAL:g}s")
+
+    # Cache des rapports HTML Evidently (clé = référence + version des données)
+    report_cache = ReportCache(
+        REPORTS_DIR,
+        REFERENCE_DATA_PATH,
+        prediction_store,
+        {"drift": generate_data_drift_report, "summary": generate_data_summary_report},
+        max_entries=REPORT_CACHE_MAX_ENTRIES
+    )
+    if REPORT_PRERENDER_INTERVAL > 0:
+        report_cache.start_prerender(REPORT_PRERENDER_INTERVAL)
+        logger.info(f"🖼️ Pré-rendu des rapports toutes les {REPORT_PRERENDER_INTERVAL:g}s")
+    prediction_logger.start()
+    startup_timer.mark("background_tasks")
     
+    # Moteur d'inférence (une seule passe predict_proba, mode compilé vérifié par le registre)
+    engine = default_model.engine
+    logger.info(f"🧠 Moteur d'inférence: {engine.mode}")
+
+    # Pool d'inférence partagé par tous les modèles (l'inférence ne bloque plus la boucle asyncio)
+    executor = InferenceExecutor(
+        engine=engine,
+        model_path=engine.source,
+        kind=INFERENCE_EXECUTOR,
+        max_workers=INFERENCE_WORKERS,
+        max_queue=INFERENCE_MAX_QUEUE,
+        mmap_mode=MODEL_MMAP_MODE
+    )
+    executor.start()
+    model_registry.executor = executor
+    logger.info(f"⚙️ Executor d'inférence démarré ({INFERENCE_EXECUTOR}, {INFERENCE_WORKERS} workers)")
+    if MICRO_BATCH_ENABLED:
+        logger.info(f"📦 Micro-batching activé (max {MICRO_BATCH_MAX_SIZE} lignes, {MICRO_BATCH_MAX_WAIT_MS} ms)")
+
+    # Cache des résultats de prédiction, vidé à chaque nouvelle version d'un modèle
+    prediction_cache = None
+    if PREDICTION_CACHE_SIZE > 0:
+        prediction_cache = PredictionCache(
+            max_size=PREDICTION_CACHE_SIZE,
+            ttl=PREDICTION_CACHE_TTL,
+            decimals=PREDICTION_CACHE_DECIMALS
+        )
+        model_registry.add_reload_callback(prediction_cache.invalidate)
+        logger.info(f"🗃️ Cache des prédictions activé ({PREDICTION_CACHE_SIZE} entrées, {PREDICTION_CACHE_TTL:g}s)")
+
+    # Rechargement à chaud des modèles dont l'artefact change sur disque
+    if MODEL_RELOAD_INTERVAL > 0:
+        model_registry.start_watching(MODEL_RELOAD_INTERVAL)
+        logger.info(f"🔁 Surveillance des modèles toutes les {MODEL_RELOAD_INTERVAL:g}s")
+    startup_timer.mark("inference")
+
     # Injection des variables globales dans les routes
-    set_model_globals(model, model_scaler_X, model_scaler_y, PREDICTIONS_LOG)
+    set_model_globals(model, model_scaler_X, model_scaler_y, PREDICTIONS_LOG, model_registry, executor,
+                      prediction_logger, prediction_stats, drift_engine, drift_scheduler,
+                      report_cache, prediction_cache, prediction_rollups)
     logger.info("✅ Variables globales injectées dans les routes")
     logger.info("✅ Démarrage de l'API terminé")
+    startup_timer.finish()
 
     yield
     
     # ========== SHUTDOWN ==========
     logger.info("🛑 Shutting down Iris Classification API...")
+    drift_scheduler.stop()
+    report_cache.stop()
+    await model_registry.stop()
+    executor.shutdown()
+
+    # Écriture des prédictions encore en mémoire
+    prediction_logger.stop()
+    prediction_stats.save_snapshot()
+    logger.info("📝 Log des prédictions vidé")
 
 
 # Création de l'application FastAPI
@@ -68,21 +294,12 @@ app = FastAPI(
 # ⬇️ 1. CONFIGURATION DE PROMETHEUS /metrics (DOIT être fait AVANT les middlewares)
 setup_metrics_endpoint(app)
 
-# ⬇️ 2. MIDDLEWARE Prometheus
-app.add_middleware(BaseHTTPMiddleware, dispatch=prometheus_middleware)
+# ⬇️ 2. MIDDLEWARE Prometheus (ASGI pur, journalise aussi les requêtes en DEBUG)
+app.add_middleware(PrometheusMiddleware)
 
 # ⬇️ 3. ROUTES
 app.include_router(router)
 
-# ⬇️ 4. MIDDLEWARE de logging
-@app.middleware("http")
-async def log_requests(request, call_next):
-    """Middleware pour logger toutes les requêtes"""
-    logger.info(f"📨 Request: {request.method} {request.url}")
-    response = await call_next(request)
-    logger.info(f"📤 Response: {response.status_code}")
-    return response
-
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,130 @@
+# api/batching.py
+"""
+Micro-batching des requêtes /predict concurrentes
+
+Les requêtes unitaires arrivant en même temps sont regroupées pendant
+une courte fenêtre (max_wait_ms) ou jusqu'à max_batch_size lignes, puis
+évaluées en un seul appel vectorisé à predict_proba. Chaque appelant
+récupère ensuite sa propre ligne de probabilités.
+
+Les lots sont évalués dans des tâches séparées : plusieurs lots peuvent
+être en cours en même temps si l'executor d'inférence a plusieurs workers.
+"""
+import asyncio
+import logging
+import time
+import numpy as np
+
+from .monitoring_prometheus import MICRO_BATCH_SIZE, MICRO_BATCH_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Regroupe les appels concurrents à predict_proba"""
+
+    def __init__(self, predict_proba, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        """
+        Args:
+            predict_proba: Coroutine prenant un tableau N×4 et retournant N×K probabilités
+            max_batch_size: Nombre maximal de lignes par lot
+            max_wait_ms: Attente maximale (en ms) avant d'évaluer un lot incomplet
+        """
+        self.predict_proba = predict_proba
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []
+        self._wakeup = None
+        self._full = None
+        self._task = None
+        self._flushes = set()
+
+    async def start(self):
+        """Démarre la tâche de regroupement (à appeler dans le lifespan)"""
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrête la tâche et fait échouer les requêtes encore en attente"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Laisser les lots déjà lancés se terminer
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+        pending, self._pending = self._pending, []
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher arrêté"))
+
+    async def submit(self, row) -> np.ndarray:
+        """
+        Ajoute une ligne au prochain lot et attend ses probabilités
+
+        Args:
+            row: Les 4 caractéristiques de la fleur
+
+        Returns:
+            Les probabilités de chaque classe pour cette ligne
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future, time.perf_counter()))
+
+        if len(self._pending) == 1:
+            self._wakeup.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+
+        return await future
+
+    async def _run(self):
+        """Boucle de regroupement : attend un lot plein ou l'expiration du délai"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._pending:
+                continue
+
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            if self._pending:
+                self._wakeup.set()
+
+            flush = asyncio.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        """Évalue un lot et distribue les résultats aux appelants"""
+        now = time.perf_counter()
+        MICRO_BATCH_SIZE.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            MICRO_BATCH_QUEUE_WAIT.observe(now - enqueued_at)
+
+        try:
+            X = np.array([row for row, _, _ in batch], dtype=float)
+            probabilities = await self.predict_proba(X)
+        except Exception as e:
+            logger.warning(f"Échec de l'évaluation du micro-lot: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), row_probabilities in zip(batch, probabilities):
+            if not future.done():
+                future.set_result(row_probabilities)
@@ -0,0 +1,234 @@
+# api/codecs.py
+"""
+Formats compacts des requêtes et réponses de prédiction
+
+Requête (Content-Type) :
+- application/json (défaut) : validé par pydantic (IrisFeatures / BatchPredictionRequest)
+- application/msgpack : mêmes objets que le JSON (ou directement les lignes
+  N×4), convertis sans construire de modèle pydantic
+- application/octet-stream : float32 little-endian contigus, 4 valeurs par
+  ligne (sepal_length, sepal_width, petal_length, petal_width)
+
+Réponse : un Accept explicite (application/json, application/msgpack ou
+application/octet-stream) est respecté, sinon la réponse reprend le format
+de la requête. Hors JSON complet, aucun PredictionResponse n'est construit :
+- "json"    : ?lean=true, même contenu construit en dictionnaires
+- "msgpack" : même contenu que "json"
+- "binary"  : probabilités N×K en float32 little-endian ; l'ordre des
+  classes, le modèle et sa version sont dans les en-têtes X-Classes,
+  X-Model-Name et X-Model-Version
+
+msgpack n'est importé qu'à la première requête qui l'utilise.
+"""
+import numpy as np
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from .config import FEATURE_COLUMNS
+from .schema import IrisFeatures, BatchPredictionRequest
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+OCTET_STREAM = "application/octet-stream"
+
+# Alias rencontrés chez les clients msgpack
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+N_FEATURES = len(FEATURE_COLUMNS)
+FLOAT32_LE = np.dtype("<f4")
+
+
+class UnsupportedMediaType(Exception):
+    """Levée quand le Content-Type de la requête n'est pas pris en charge (415)"""
+
+
+class InvalidPayload(Exception):
+    """Levée quand un corps msgpack ou binaire ne décrit pas des lignes de 4 valeurs (422)"""
+
+
+# ========== NÉGOCIATION ==========
+def _media_type(header: str) -> str:
+    return header.split(";", 1)[0].strip().lower()
+
+
+def request_format(content_type: str) -> str:
+    """Format du corps de la requête : "json", "msgpack" ou "binary" """
+    media_type = _media_type(content_type or JSON)
+    if media_type == JSON or media_type.endswith("+json"):
+        return "json"
+    if media_type in MSGPACK_TYPES:
+        return "msgpack"
+    if media_type == OCTET_STREAM:
+        return "binary"
+    raise UnsupportedMediaType(
+        f"Content-Type non pris en charge: {media_type} (attendu: {JSON}, {MSGPACK} ou {OCTET_STREAM})"
+    )
+
+
+def response_format(accept: str, body_format: str, lean: bool = False) -> str:
+    """
+    Format de la réponse : "model" (PredictionResponse), "json", "msgpack" ou "binary"
+
+    Les préférences q= de l'en-tête Accept ne sont pas pondérées : le
+    premier type pris en charge qui y figure l'emporte.
+    """
+    for media_type in (_media_type(part) for part in (accept or "").split(",")):
+        if media_type == JSON:
+            return "json" if lean else "model"
+        if media_type in MSGPACK_TYPES:
+            return "msgpack"
+        if media_type == OCTET_STREAM:
+            return "binary"
+    if body_format == "json":
+        return "json" if lean else "model"
+    return body_format
+
+
+# ========== DÉCODAGE ==========
+def _unpack_msgpack(body: bytes):
+    import msgpack
+
+    try:
+        return msgpack.unpackb(body)
+    except Exception as e:
+        raise InvalidPayload(f"Corps msgpack invalide: {e}")
+
+
+def _features_row(obj) -> list:
+    """Ligne [sepal_length, sepal_width, petal_length, petal_width] d'un objet ou d'une liste"""
+    try:
+        if isinstance(obj, dict):
+            return [float(obj[column]) for column in FEATURE_COLUMNS]
+        if isinstance(obj, (list, tuple)) and len(obj) == N_FEATURES:
+            return [float(value) for value in obj]
+    except KeyError as e:
+        raise InvalidPayload(f"Caractéristique manquante: {e.args[0]}")
+    except (TypeError, ValueError) as e:
+        raise InvalidPayload(f"Valeur non numérique: {e}")
+    raise InvalidPayload(f"Attendu un objet {{{', '.join(FEATURE_COLUMNS)}}} ou une liste de {N_FEATURES} valeurs")
+
+
+def _float32_rows(body: bytes) -> np.ndarray:
+    if not body or len(body) % (N_FEATURES * FLOAT32_LE.itemsize):
+        raise InvalidPayload(
+            f"Le corps binaire doit contenir N×{N_FEATURES} float32 ({len(body)} octets reçus)"
+        )
+    return np.frombuffer(body, dtype=FLOAT32_LE).reshape(-1, N_FEATURES).astype(np.float64)
+
+
+def _check_finite(X: np.ndarray) -> np.ndarray:
+    if not np.isfinite(X).all():
+        raise InvalidPayload("Les caractéristiques doivent être des nombres finis")
+    return X
+
+
+def decode_features(body: bytes, body_format: str) -> list:
+    """
+    Ligne unique [sepal_length, sepal_width, petal_length, petal_width]
+
+    Raises:
+        pydantic.ValidationError: Corps JSON invalide
+        InvalidPayload: Corps msgpack ou binaire invalide
+    """
+    if body_format == "json":
+        features = IrisFeatures.model_validate_json(body)
+        return [features.sepal_length, features.sepal_width, features.petal_length, features.petal_width]
+
+    if body_format == "binary":
+        X = _check_finite(_float32_rows(body))
+        if len(X) != 1:
+            raise InvalidPayload(f"/predict attend une seule ligne ({len(X)} reçues), voir /predict/batch")
+        return X[0].tolist()
+
+    row = _features_row(_unpack_msgpack(body))
+    _check_finite(np.array(row))
+    return row
+
+
+def decode_batch(body: bytes, body_format: str) -> np.ndarray:
+    """
+    Lot sous forme de tableau N×4
+
+    Raises:
+        pydantic.ValidationError: Corps JSON invalide
+        InvalidPayload: Corps msgpack ou binaire invalide
+    """
+    if body_format == "json":
+        return np.array(BatchPredictionRequest.model_validate_json(body).to_rows(), dtype=float)
+
+    if body_format == "binary":
+        return _check_finite(_float32_rows(body))
+
+    payload = _unpack_msgpack(body)
+    if isinstance(payload, dict):
+        if ("instances" in payload) == ("data" in payload):
+            raise InvalidPayload("Fournir exactement un des champs 'instances' ou 'data'")
+        payload = payload.get("instances", payload.get("data"))
+    if not isinstance(payload, (list, tuple)) or not payload:
+        raise InvalidPayload("Le lot doit contenir au moins une ligne")
+    return _check_finite(np.array([_features_row(row) for row in payload], dtype=np.float64))
+
+
+# ========== ENCODAGE ==========
+def prediction_payload(prediction, prediction_name: str, probabilities, confidence,
+                       model_version: str, model_name: str) -> dict:
+    """Contenu d'un PredictionResponse, sans construire le modèle pydantic"""
+    return {
+        "prediction": str(prediction),
+        "prediction_name": prediction_name,
+        "probabilities": probabilities.tolist(),
+        "confidence": float(confidence),
+        "model_version": model_version,
+        "model_name": model_name,
+    }
+
+
+def encode(payload: dict, response_fmt: str) -> Response:
+    """Réponse "json" ou "msgpack" d'un contenu déjà construit"""
+    if response_fmt == "msgpack":
+        import msgpack
+
+        return Response(content=msgpack.packb(payload), media_type=MSGPACK)
+    return JSONResponse(content=payload)
+
+
+def encode_probabilities(probabilities, classes, model_name: str, model_version: str) -> Response:
+    """Réponse "binary" : probabilités N×K en float32 little-endian"""
+    return Response(
+        content=np.ascontiguousarray(probabilities, dtype=FLOAT32_LE).tobytes(),
+        media_type=OCTET_STREAM,
+        headers={
+            "X-Classes": ",".join(str(c) for c in classes),
+            "X-Model-Name": model_name,
+            "X-Model-Version": model_version,
+        }
+    )
+
+
+# ========== OPENAPI ==========
+def _inline_refs(schema, definitions):
+    """Remplace les $ref internes de pydantic par leur définition (pas de $defs dans l'OpenAPI)"""
+    if isinstance(schema, dict):
+        ref = schema.get("$ref", "")
+        if ref.startswith("#/$defs/"):
+            return _inline_refs(definitions[ref.rsplit("/", 1)[-1]], definitions)
+        return {key: _inline_refs(value, definitions) for key, value in schema.items() if key != "$defs"}
+    if isinstance(schema, list):
+        return [_inline_refs(item, definitions) for item in schema]
+    return schema
+
+
+def openapi_request_body(model) -> dict:
+    """openapi_extra d'une route dont le corps est décodé à la main"""
+    schema = model.model_json_schema()
+    binary = {"schema": {"type": "string", "format": "binary"}}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                JSON: {"schema": _inline_refs(schema, schema.get("$defs", {}))},
+                MSGPACK: binary,
+                OCTET_STREAM: binary,
+            }
+        }
+    }
@@ -1,5 +1,122 @@
+import os
+
+# Registre des modèles : un sous-dossier de MODELS_DIR par modèle (<nom>/<nom>.pkl)
+MODELS_DIR = os.getenv("MODELS_DIR", "models")
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "random_forest_classifier")
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "10"))  # 0 = pas de surveillance
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "512"))
+
+# Mode de démarrage : "fast" (Evidently importé au premier rapport, tableaux des
+# modèles chargés en mmap et partagés entre workers) ou "eager" (tout est chargé au démarrage)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "fast")
+LAZY_EVIDENTLY = STARTUP_MODE == "fast"
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r" if STARTUP_MODE == "fast" else "") or None
+
 # Chemins des fichiers
-MODEL_PATH = "models/random_forest_classifier/random_forest_classifier.pkl"
-MODEL_SCALERX_PATH = "models/random_forest_classifier/random_forest_classifier_scaler_X.pkl"
-MODEL_SCALERY_PATH = "models/random_forest_classifier/random_forest_classifier_scaler_y.pkl"
-PREDICTIONS_LOG = "logfiles/predictions_log.csv"
\ No newline at end of file
+MODEL_PATH = f"{MODELS_DIR}/{DEFAULT_MODEL}/{DEFAULT_MODEL}.pkl"
+MODEL_SCALERX_PATH = f"{MODELS_DIR}/{DEFAULT_MODEL}/{DEFAULT_MODEL}_scaler_X.pkl"
+MODEL_SCALERY_PATH = f"{MODELS_DIR}/{DEFAULT_MODEL}/{DEFAULT_MODEL}_scaler_y.pkl"
+PREDICTIONS_LOG = "logfiles/predictions_log.csv"
+PREDICTIONS_DIR = "logfiles/predictions"
+PREDICTIONS_DB = "logfiles/predictions.sqlite"
+PREDICTIONS_ARCHIVE_DIR = "logfiles/archive"
+ROLLUPS_DB = "logfiles/rollups.sqlite"
+PREDICTION_STATS_SNAPSHOT = "logfiles/prediction_stats.json"
+
+# Données de référence du monitoring (générées par python -m api.reference)
+IRIS_SOURCE_PATH = "data/Iris.csv"
+REFERENCE_DATA_PATH = "data/reference_data.csv"
+REFERENCE_PROFILE_PATH = "data/reference_profile.npz"
+
+# Ordre des caractéristiques attendu par le modèle
+FEATURE_COLUMNS = ['sepal_length', 'sepal_width', 'petal_length', 'petal_width']
+
+# Colonnes de data/Iris.csv renommées comme dans l'API
+IRIS_CSV_COLUMNS = {
+    'SepalLengthCm': 'sepal_length',
+    'SepalWidthCm': 'sepal_width',
+    'PetalLengthCm': 'petal_length',
+    'PetalWidthCm': 'petal_width',
+    'Species': 'prediction_name'
+}
+
+# Micro-batching des requêtes /predict concurrentes
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "true").lower() == "true"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+
+# Pool d'inférence (hors boucle asyncio) : "thread" ou "process"
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+
+# Moteur d'inférence : "sklearn" (predict_proba du modèle) ou "compiled" (forêt aplatie en NumPy)
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "sklearn")
+
+# Cache des résultats de prédiction (0 = désactivé)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+PREDICTION_CACHE_DECIMALS = int(os.getenv("PREDICTION_CACHE_DECIMALS", "6"))
+# Lots plus grands évalués sans consulter le cache (consultation faite sur la boucle asyncio)
+PREDICTION_CACHE_MAX_BATCH = int(os.getenv("PREDICTION_CACHE_MAX_BATCH", "1000"))
+
+# Scoring en flux (/predict/stream) : nombre de lignes évaluées par bloc
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "5000"))
+# Corps reçu gardé en mémoire jusqu'à cette taille, puis recopié dans un fichier temporaire
+STREAM_SPOOL_MEMORY_MB = float(os.getenv("STREAM_SPOOL_MEMORY_MB", "8"))
+
+# Part des requêtes /predict renvoyant le détail des étapes (en-tête Server-Timing)
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", "0"))
+
+# Écriture bufferisée du log des prédictions
+PREDICTION_LOG_BUFFER_SIZE = int(os.getenv("PREDICTION_LOG_BUFFER_SIZE", "10000"))
+PREDICTION_LOG_FLUSH_SIZE = int(os.getenv("PREDICTION_LOG_FLUSH_SIZE", "500"))
+PREDICTION_LOG_FLUSH_INTERVAL = float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL", "1.0"))
+
+# Stockage du log des prédictions : "csv" (PREDICTIONS_LOG), "parquet" (PREDICTIONS_DIR,
+# partitionné par heure) ou "sqlite" (PREDICTIONS_DB, WAL, indexé par horodatage et classe)
+PREDICTION_STORE = os.getenv("PREDICTION_STORE", "csv")
+PREDICTION_STORE_COMPACT_INTERVAL = float(os.getenv("PREDICTION_STORE_COMPACT_INTERVAL", "3600"))
+PREDICTION_STATS_SNAPSHOT_INTERVAL = float(os.getenv("PREDICTION_STATS_SNAPSHOT_INTERVAL", "10"))
+
+# Rotation du log CSV (archives gzip dans PREDICTIONS_ARCHIVE_DIR) et rétention
+# des prédictions brutes, tous backends (0 = désactivé)
+LOG_ROTATE_MAX_MB = float(os.getenv("LOG_ROTATE_MAX_MB", "100"))
+LOG_ROTATE_INTERVAL_HOURS = float(os.getenv("LOG_ROTATE_INTERVAL_HOURS", "24"))
+LOG_RETENTION_DAYS = float(os.getenv("LOG_RETENTION_DAYS", "30"))
+
+# Agrégats par minute et par heure de l'historique (ROLLUPS_DB), lus par les
+# statistiques longues et les tableaux de bord (0 = désactivé / tout garder)
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "60"))
+ROLLUP_MINUTE_RETENTION_DAYS = float(os.getenv("ROLLUP_MINUTE_RETENTION_DAYS", "7"))
+ROLLUP_HOUR_RETENTION_DAYS = float(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "365"))
+
+# Drift en streaming : taille de la fenêtre courante et source des métriques
+# Prometheus ("streaming" = moteur incrémental, "evidently" = rapport complet)
+DRIFT_WINDOW_SIZE = int(os.getenv("DRIFT_WINDOW_SIZE", "100"))
+DRIFT_METRICS_SOURCE = os.getenv("DRIFT_METRICS_SOURCE", "streaming")
+
+# Fenêtres des données courantes (drift et qualité) : "nom=type:taille" séparés par
+# des virgules ; count:N = N dernières prédictions, sliding:S = S dernières secondes,
+# tumbling:S = dernière période complète de S secondes (voir api/windows.py)
+MONITORING_WINDOWS = os.getenv("MONITORING_WINDOWS", "last100=count:100,15m=sliding:900,1h=tumbling:3600")
+DEFAULT_MONITORING_WINDOW = os.getenv("DEFAULT_MONITORING_WINDOW", "last100")
+# Dernières prédictions gardées en mémoire pour les fenêtres (0 = relire le log)
+RECENT_PREDICTIONS_SIZE = int(os.getenv("RECENT_PREDICTIONS_SIZE", "100000"))
+# Taille maximale des fenêtres ad hoc (?window_type=&window_size= des routes /evidently/*)
+MAX_ADHOC_WINDOW_ROWS = int(os.getenv("MAX_ADHOC_WINDOW_ROWS", "100000"))
+MAX_ADHOC_WINDOW_SECONDS = float(os.getenv("MAX_ADHOC_WINDOW_SECONDS", "86400"))
+
+# Verrou des métriques par fenêtre : avec plusieurs workers, un seul les calcule par intervalle
+WINDOW_METRICS_LOCK = "logfiles/window_metrics.lock"
+
+# Rafraîchissement planifié des métriques de drift (en secondes)
+DRIFT_UPDATE_INTERVAL = float(os.getenv(
+    "DRIFT_UPDATE_INTERVAL", "5" if DRIFT_METRICS_SOURCE == "streaming" else "900"
+))
+
+# Pré-rendu des rapports Evidently en tâche de fond (0 = désactivé, en secondes)
+REPORT_PRERENDER_INTERVAL = float(os.getenv("REPORT_PRERENDER_INTERVAL", "0"))
+# Rapports gardés en cache (un par type et par fenêtre) ; au-delà, les moins
+# récemment servis sont retirés et leurs fichiers supprimés
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "32"))
\ No newline at end of file
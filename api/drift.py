@@ -0,0 +1,424 @@
+# api/drift.py
+"""
+Moteur de drift en streaming pour les colonnes surveillées
+
+Les esquisses de référence (histogramme sur une grille fixe et quantiles)
+viennent du profil précalculé de la référence (voir reference.py). La fenêtre courante est un
+buffer circulaire d'indices de bins : chaque prédiction enregistrée met à
+jour les histogrammes courants en O(1), et le calcul des statistiques
+(KS, PSI, Wasserstein) ne dépend que du nombre de bins, pas du nombre de
+lignes. Les métriques de drift peuvent donc être rafraîchies toutes les
+quelques secondes, sans relancer un rapport Evidently complet.
+
+La fenêtre garde aussi la classe prédite et la confiance de chaque ligne.
+compute_prediction_drift() en déduit, en un seul bincount sur
+(classe, colonne, bin), le drift de chaque colonne par classe prédite, le
+drift des classes prédites (chi-deux contre les fréquences de la
+référence) et le drift des confiances contre une distribution de base
+(confiances du modèle sur la référence).
+
+Les statistiques sont calculées à la résolution de la grille de bins :
+ce sont des approximations des tests exacts d'Evidently. KS et Wasserstein
+utilisent la grille fine ; le PSI regroupe ses bins en PSI_BINS bins de
+même effectif de référence (déciles), car sur une grille de 100 bins pour
+quelques centaines de lignes la plupart des bins sont vides et le PSI
+d'un trafic sans drift dépasse déjà tout seuil d'alerte.
+"""
+import threading
+import numpy as np
+import pandas as pd
+from scipy.special import chdtrc, kolmogorov
+
+from .reference import ReferenceProfile
+from .storage import LOG_COLUMNS
+
+# Grille des confiances : 20 bins sur [0, 1]
+CONFIDENCE_EDGES = np.linspace(0.0, 1.0, 21)
+
+# Plancher des probabilités dans le PSI (bins vides)
+PSI_EPSILON = 1e-4
+
+# Nombre de bins du PSI (quantiles de la référence, fusionnés en cas d'égalité)
+PSI_BINS = 10
+
+
+def _ks_pvalue(ks, n, m):
+    """p-value asymptotique de KS avec correction de Stephens (vectorisée, 1.0 si un effectif est nul)"""
+    ks, n, m = np.broadcast_arrays(np.asarray(ks, dtype=float), np.asarray(n, dtype=float), np.asarray(m, dtype=float))
+    pvalue = np.ones(ks.shape)
+    valid = (n > 0) & (m > 0)
+    en = np.sqrt(n[valid] * m[valid] / (n[valid] + m[valid]))
+    pvalue[valid] = kolmogorov((en + 0.12 + 0.11 / en) * ks[valid])
+    return pvalue
+
+
+def _psi(reference: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """Population Stability Index sur le dernier axe"""
+    reference = np.clip(reference, PSI_EPSILON, None)
+    current = np.clip(current, PSI_EPSILON, None)
+    return np.sum((current - reference) * np.log(current / reference), axis=-1)
+
+
+class ReferenceSketch:
+    """Histogramme et quantiles d'une colonne de référence"""
+
+    def __init__(self, stats: dict, levels: np.ndarray, n: int):
+        """
+        Args:
+            stats: Statistiques de la colonne (ReferenceProfile.column)
+            levels: Niveaux des quantiles
+            n: Nombre de lignes de référence
+        """
+        self.edges = stats["edges"]
+        self.n_slots = len(self.edges) + 1
+        self.levels = levels
+        self.n = n
+        self.probabilities = stats["probabilities"]
+        self.cdf = np.cumsum(self.probabilities)[:len(self.edges)]
+        self.quantiles = stats["quantiles"]
+        self.std = float(np.sqrt(stats["var"])) or 1.0
+
+        # Regroupement des bins fins (selon leur borne inférieure) entre les quantiles
+        # de la référence : matrice bins fins × PSI_BINS (colonnes vides si quantiles égaux)
+        inner = np.unique(np.interp(np.linspace(0.0, 1.0, PSI_BINS + 1)[1:-1], levels, self.quantiles))
+        groups = np.searchsorted(inner, np.concatenate([[-np.inf], self.edges]), side='right')
+        self.psi_matrix = np.zeros((self.n_slots, PSI_BINS))
+        self.psi_matrix[np.arange(self.n_slots), groups] = 1.0
+        self.psi_probabilities = self.probabilities @ self.psi_matrix
+
+    def slot_index(self, values) -> np.ndarray:
+        """Indice de bin de chaque valeur (0 et n_slots-1 = débordements)"""
+        return np.searchsorted(self.edges, values, side='right')
+
+
+class StreamingDriftEngine:
+    """Fenêtre glissante des N dernières prédictions comparée à la référence"""
+
+    def __init__(self, reference, columns, window_size: int = 100,
+                 n_bins: int = 100, threshold: float = 0.05):
+        """
+        Args:
+            reference: Profil de référence, ou données de référence (DataFrame)
+            columns: Colonnes numériques surveillées
+            window_size: Nombre de prédictions dans la fenêtre courante
+            n_bins: Nombre de bins des histogrammes (si reference est un DataFrame)
+            threshold: Seuil de p-value en dessous duquel un test signale un drift
+        """
+        self.columns = list(columns)
+        self.window_size = window_size
+        self.n_bins = n_bins
+        self.threshold = threshold
+        self._slots = np.zeros((window_size, len(self.columns)), dtype=np.intp)
+        self._labels = np.zeros(window_size, dtype=np.intp)
+        self._confidences = np.full(window_size, np.nan)
+        self._record_index = [LOG_COLUMNS.index(c) for c in self.columns]
+        self._prediction_index = LOG_COLUMNS.index("prediction")
+        self._confidence_index = LOG_COLUMNS.index("confidence")
+        self._confidence_baseline = None
+        self.confidence_baseline_key = None
+        self._lock = threading.Lock()
+        self.set_reference(reference)
+
+    def set_reference(self, reference, frame: pd.DataFrame = None):
+        """
+        Remplace la référence et vide la fenêtre (les bins changent)
+
+        Args:
+            reference: Profil de référence, ou données de référence (DataFrame)
+            frame: Prédictions avec lesquelles remplir à nouveau la fenêtre
+        """
+        if isinstance(reference, pd.DataFrame):
+            reference = ReferenceProfile.from_frame(reference, self.columns, self.n_bins)
+        sketches = [
+            ReferenceSketch(reference.column(c), reference.levels, reference.n) for c in self.columns
+        ]
+        n_slots = sketches[0].n_slots
+        classes = reference.classes
+        with self._lock:
+            self.profile = reference
+            self.sketches = sketches
+            self.classes = classes
+            # Indice len(classes) : classe prédite absente de la référence
+            self._class_index = reference.class_index()
+            if classes:
+                self._class_reference = reference.class_probabilities(self.columns)
+                self._class_reference_n = reference.arrays["class_n"]
+                self._priors = reference.arrays["priors"]
+            self._psi_matrices = np.stack([sketch.psi_matrix for sketch in sketches])
+            self._offsets = np.arange(len(self.columns)) * n_slots
+            self._counts = np.zeros((len(self.columns), n_slots), dtype=np.int64)
+            self._position = 0
+            self._size = 0
+        if frame is not None:
+            self.observe_frame(frame)
+
+    def set_confidence_baseline(self, confidences, key=None):
+        """
+        Distribution de base des confiances (ex: confiances du modèle sur la référence)
+
+        Args:
+            confidences: Confiances de base
+            key: Identifiant de la base (ex: (empreinte de la référence, version du modèle))
+        """
+        confidences = np.asarray(confidences, dtype=float)
+        confidences = confidences[np.isfinite(confidences)]
+        if len(confidences) == 0:
+            return
+        probabilities = self._confidence_histogram(confidences)
+        self._confidence_baseline = (probabilities, np.cumsum(probabilities), len(confidences), confidences.mean())
+        self.confidence_baseline_key = key
+
+    @staticmethod
+    def _confidence_histogram(confidences: np.ndarray) -> np.ndarray:
+        n_bins = len(CONFIDENCE_EDGES) - 1
+        slots = np.clip(np.searchsorted(CONFIDENCE_EDGES, confidences, side='right') - 1, 0, n_bins - 1)
+        return np.bincount(slots, minlength=n_bins) / len(confidences)
+
+    # ========== ALIMENTATION DE LA FENÊTRE ==========
+    def _encode_labels(self, labels, n: int) -> np.ndarray:
+        """Indice de classe de chaque prédiction (len(classes) si inconnue)"""
+        unknown = len(self.classes)
+        if labels is None:
+            return np.full(n, unknown, dtype=np.intp)
+        codes = pd.Series(np.asarray(labels)).astype(str).map(self._class_index)
+        return codes.fillna(unknown).to_numpy(dtype=np.intp)
+
+    def observe(self, X, labels=None, confidences=None):
+        """
+        Ajoute des lignes
+
+        Args:
+            X: Tableau N×colonnes dans l'ordre de self.columns
+            labels: Classes prédites (optionnel)
+            confidences: Confiances (optionnel)
+        """
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or len(X) == 0:
+            return
+        X = X[-self.window_size:]
+        sketches = self.sketches
+        slots = np.column_stack([
+            sketch.slot_index(X[:, j]) for j, sketch in enumerate(sketches)
+        ])
+        codes = self._encode_labels(None if labels is None else np.asarray(labels)[-len(X):], len(X))
+        confidences = (
+            np.full(len(X), np.nan) if confidences is None
+            else np.asarray(confidences, dtype=float)[-len(X):]
+        )
+
+        with self._lock:
+            if sketches is not self.sketches:
+                # Référence remplacée entre-temps : la fenêtre a été remplie à nouveau
+                return
+            n = len(slots)
+            n_slots = self._counts.shape[1]
+            positions = (self._position + np.arange(n)) % self.window_size
+
+            # Les lignes écrasées sont les plus anciennes de la fenêtre
+            n_free = self.window_size - self._size
+            if n > n_free:
+                evicted = self._slots[positions[n_free:]]
+                self._counts -= np.bincount(
+                    (evicted + self._offsets).ravel(), minlength=self._counts.size
+                ).reshape(-1, n_slots)
+
+            self._slots[positions] = slots
+            self._labels[positions] = codes
+            self._confidences[positions] = confidences
+            self._counts += np.bincount(
+                (slots + self._offsets).ravel(), minlength=self._counts.size
+            ).reshape(-1, n_slots)
+            self._position = (self._position + n) % self.window_size
+            self._size = min(self.window_size, self._size + n)
+
+    def observe_frame(self, frame: pd.DataFrame):
+        """Ajoute des prédictions lues dans le log (colonnes surveillées, prediction, confidence)"""
+        self.observe(
+            frame[self.columns].to_numpy(),
+            frame["prediction"] if "prediction" in frame else None,
+            frame["confidence"] if "confidence" in frame else None
+        )
+
+    def reset(self, frame: pd.DataFrame = None):
+        """Vide la fenêtre, puis la remplit éventuellement avec des prédictions"""
+        with self._lock:
+            self._counts[:] = 0
+            self._position = 0
+            self._size = 0
+        if frame is not None:
+            self.observe_frame(frame)
+
+    def observe_records(self, records):
+        """Écouteur du log : ajoute des prédictions (tuples dans l'ordre de LOG_COLUMNS)"""
+        self.observe(
+            [[record[i] for i in self._record_index] for record in records],
+            [record[self._prediction_index] for record in records],
+            [record[self._confidence_index] for record in records]
+        )
+
+    # ========== CALCUL DU DRIFT ==========
+    def compute(self) -> dict:
+        """
+        Calcule le drift de chaque colonne sur la fenêtre courante
+
+        Returns:
+            dict avec, par colonne, ks, ks_pvalue, psi, wasserstein et drift_detected,
+            ainsi que num_rows, drift_share et dataset_drift_detected
+        """
+        with self._lock:
+            counts = self._counts.copy()
+            n = self._size
+            sketches = self.sketches
+
+        columns = {}
+        for column, sketch, column_counts in zip(self.columns, sketches, counts):
+            columns[column] = self._column_drift(sketch, column_counts, n)
+
+        drifted = sum(1 for c in columns.values() if c["drift_detected"])
+        drift_share = drifted / len(columns) if n else 0.0
+        return {
+            "num_rows": n,
+            "columns": columns,
+            "drifted_columns_count": drifted,
+            "drift_share": drift_share,
+            "dataset_drift_detected": drift_share > 0.5,
+        }
+
+    def _column_drift(self, sketch: ReferenceSketch, counts: np.ndarray, n: int) -> dict:
+        if n == 0:
+            return {"ks": 0.0, "ks_pvalue": 1.0, "psi": 0.0, "wasserstein": 0.0, "drift_detected": False}
+
+        probabilities = counts / n
+        cdf = np.cumsum(probabilities)[:len(sketch.edges)]
+
+        # Kolmogorov-Smirnov (p-value asymptotique avec correction de Stephens)
+        ks = float(np.abs(cdf - sketch.cdf).max())
+        ks_pvalue = float(_ks_pvalue(ks, n, sketch.n))
+
+        # Population Stability Index (bins grossiers, voir PSI_BINS)
+        psi = float(_psi(sketch.psi_probabilities, probabilities @ sketch.psi_matrix))
+
+        # Wasserstein normalisé par l'écart-type de référence (via les quantiles)
+        current_quantiles = np.interp(sketch.levels, cdf, sketch.edges)
+        wasserstein = float(np.mean(np.abs(current_quantiles - sketch.quantiles)) / sketch.std)
+
+        return {
+            "ks": ks,
+            "ks_pvalue": ks_pvalue,
+            "psi": psi,
+            "wasserstein": wasserstein,
+            "drift_detected": ks_pvalue < self.threshold,
+        }
+
+    def compute_prediction_drift(self) -> dict:
+        """
+        Drift tenant compte des prédictions, en une passe sur la fenêtre courante
+
+        Returns:
+            dict avec num_rows, classes (par classe prédite : count, share,
+            reference_share, confidence_mean et, par colonne, ks, ks_pvalue,
+            psi et drift_detected), label_drift (chi2, pvalue, drift_detected,
+            unknown) et confidence_drift (ks, ks_pvalue, psi, mean_shift,
+            drift_detected ; None sans distribution de base)
+        """
+        with self._lock:
+            n = self._size
+            slots = self._slots[:n].copy()
+            labels = self._labels[:n].copy()
+            confidences = self._confidences[:n].copy()
+            classes = self.classes
+            n_slots = self._counts.shape[1]
+            psi_matrices = self._psi_matrices
+            if classes:
+                class_reference = self._class_reference
+                class_reference_n = self._class_reference_n
+                priors = self._priors
+
+        result = {
+            "num_rows": n,
+            "classes": {},
+            "label_drift": None,
+            "confidence_drift": self._confidence_drift(confidences),
+        }
+        if not classes:
+            return result
+
+        n_classes, n_columns = len(classes), len(self.columns)
+        known = labels < n_classes
+
+        # Histogrammes courants par classe : un seul bincount sur (classe, colonne, bin)
+        index = (labels[known, None] * n_columns + np.arange(n_columns)) * n_slots + slots[known]
+        counts = np.bincount(index.ravel(), minlength=n_classes * n_columns * n_slots)
+        counts = counts.reshape(n_classes, n_columns, n_slots)
+        class_n = counts[:, 0, :].sum(axis=1)
+
+        probabilities = counts / np.maximum(class_n, 1)[:, None, None]
+        cdf = np.cumsum(probabilities, axis=2)[:, :, :n_slots - 1]
+        reference_cdf = np.cumsum(class_reference, axis=2)[:, :, :n_slots - 1]
+        ks = np.abs(cdf - reference_cdf).max(axis=2)
+        ks_pvalue = _ks_pvalue(ks, class_n[:, None], class_reference_n[:, None])
+        psi = _psi(
+            np.einsum('kcs,csg->kcg', class_reference, psi_matrices),
+            np.einsum('kcs,csg->kcg', probabilities, psi_matrices)
+        )
+        empty = class_n == 0
+        ks[empty], psi[empty] = 0.0, 0.0
+
+        # Confiance moyenne par classe prédite
+        finite = known & np.isfinite(confidences)
+        confidence_sums = np.bincount(labels[finite], weights=confidences[finite], minlength=n_classes)
+        confidence_counts = np.bincount(labels[finite], minlength=n_classes)
+
+        n_known = int(class_n.sum())
+        for k, name in enumerate(classes):
+            result["classes"][name] = {
+                "count": int(class_n[k]),
+                "share": float(class_n[k] / n_known) if n_known else 0.0,
+                "reference_share": float(priors[k]),
+                "confidence_mean": (
+                    float(confidence_sums[k] / confidence_counts[k]) if confidence_counts[k] else None
+                ),
+                "columns": {
+                    column: {
+                        "ks": float(ks[k, j]),
+                        "ks_pvalue": float(ks_pvalue[k, j]),
+                        "psi": float(psi[k, j]),
+                        "drift_detected": bool(ks_pvalue[k, j] < self.threshold),
+                    }
+                    for j, column in enumerate(self.columns)
+                },
+            }
+
+        # Classes prédites contre les fréquences de la référence (chi-deux, K-1 degrés de liberté)
+        chi2, pvalue = 0.0, 1.0
+        if n_known and n_classes > 1:
+            expected = n_known * priors
+            chi2 = float(np.sum((class_n - expected) ** 2 / expected))
+            pvalue = float(chdtrc(n_classes - 1, chi2))
+        result["label_drift"] = {
+            "chi2": chi2,
+            "pvalue": pvalue,
+            "drift_detected": pvalue < self.threshold,
+            "unknown": int(n - n_known),
+        }
+        return result
+
+    def _confidence_drift(self, confidences: np.ndarray):
+        baseline = self._confidence_baseline
+        confidences = confidences[np.isfinite(confidences)]
+        if baseline is None:
+            return None
+        reference, reference_cdf, reference_n, reference_mean = baseline
+        if len(confidences) == 0:
+            return {"ks": 0.0, "ks_pvalue": 1.0, "psi": 0.0, "mean_shift": 0.0, "drift_detected": False}
+
+        probabilities = self._confidence_histogram(confidences)
+        ks = float(np.abs(np.cumsum(probabilities) - reference_cdf).max())
+        ks_pvalue = float(_ks_pvalue(ks, len(confidences), reference_n))
+        return {
+            "ks": ks,
+            "ks_pvalue": ks_pvalue,
+            "psi": float(_psi(reference, probabilities)),
+            "mean_shift": float(confidences.mean() - reference_mean),
+            "drift_detected": ks_pvalue < self.threshold,
+        }
@@ -0,0 +1,145 @@
+# api/executor.py
+"""
+Exécution de l'inférence hors de la boucle asyncio
+
+Les appels au modèle sont envoyés dans un pool dédié (threads ou processus)
+afin que /health, /metrics et les autres routes restent réactives pendant
+l'inférence. Le nombre de lots en cours est borné : au-delà, les nouvelles
+demandes sont refusées (ExecutorSaturated -> HTTP 503).
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import joblib
+
+from .inference import InferenceEngine
+from .monitoring_prometheus import INFERENCE_QUEUE_DEPTH, INFERENCE_WORKER_UTILIZATION
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Levée quand la file d'attente d'inférence est pleine"""
+
+
+# ========== WORKERS (mode processus) ==========
+# Moteur par défaut préchargé une seule fois dans chaque processus worker ;
+# les autres modèles du registre y sont chargés à leur première utilisation
+_worker_engine = None
+_worker_engines = {}
+_worker_mmap_mode = None
+
+
+def _init_worker(model_path: str, mode: str, version: str = None, mmap_mode: str = None):
+    """Initialise un processus worker en chargeant le modèle"""
+    global _worker_engine, _worker_mmap_mode
+    _worker_mmap_mode = mmap_mode
+    _worker_engine = InferenceEngine(
+        joblib.load(model_path, mmap_mode=mmap_mode), mode=mode, source=model_path, version=version
+    )
+    _worker_engines[model_path] = _worker_engine
+
+
+def _worker_ready() -> bool:
+    """Tâche vide utilisée pour démarrer les workers dès le lancement"""
+    return _worker_engine is not None
+
+
+def _worker_predict_proba(X, source: str = None, version: str = None, mode: str = None):
+    """Calcule les probabilités dans un processus worker"""
+    if source is None:
+        return _worker_engine.predict_proba(X)
+
+    # Rechargé si le registre a substitué une nouvelle version de l'artefact
+    engine = _worker_engines.get(source)
+    if engine is None or engine.version != version or engine.mode != mode:
+        engine = InferenceEngine(
+            joblib.load(source, mmap_mode=_worker_mmap_mode), mode=mode, source=source, version=version
+        )
+        _worker_engines[source] = engine
+    return engine.predict_proba(X)
+
+
+# ========== EXECUTOR ==========
+class InferenceExecutor:
+    """Pool d'inférence borné, en threads ou en processus"""
+
+    def __init__(self, engine: InferenceEngine = None, model_path: str = None, kind: str = "thread",
+                 max_workers: int = 4, max_queue: int = 64, mmap_mode: str = None):
+        """
+        Args:
+            engine: Moteur d'inférence déjà chargé (mode thread)
+            model_path: Chemin du modèle, rechargé dans chaque worker (mode process)
+            kind: "thread" ou "process"
+            max_workers: Nombre de workers du pool
+            max_queue: Nombre de lots pouvant attendre un worker libre
+            mmap_mode: Mode mmap de joblib.load dans les workers (pages partagées entre processus)
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Type d'executor inconnu: {kind}")
+
+        self.engine = engine
+        self.model_path = model_path
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.mmap_mode = mmap_mode
+        self._pool = None
+        self._in_flight = 0
+
+    def start(self):
+        """Crée le pool (et précharge le modèle dans les workers en mode process)"""
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.model_path, self.engine.mode, self.engine.version, self.mmap_mode)
+            )
+            # Forcer le démarrage des workers avant la première requête
+            for future in [self._pool.submit(_worker_ready) for _ in range(self.max_workers)]:
+                future.result()
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+        self._update_gauges()
+
+    def shutdown(self):
+        """Arrête le pool en attendant la fin des tâches en cours"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def run(self, X, engine: InferenceEngine = None):
+        """
+        Calcule les probabilités d'un tableau N×4 dans le pool
+
+        Args:
+            X: Lignes à évaluer
+            engine: Moteur à utiliser (par défaut celui de l'executor)
+
+        Raises:
+            ExecutorSaturated: si la file d'attente est pleine
+        """
+        if self._in_flight >= self.max_workers + self.max_queue:
+            raise ExecutorSaturated("File d'attente d'inférence saturée")
+
+        self._in_flight += 1
+        self._update_gauges()
+        try:
+            loop = asyncio.get_running_loop()
+            engine = engine or self.engine
+            if self.kind == "process":
+                return await loop.run_in_executor(
+                    self._pool, _worker_predict_proba, X, engine.source, engine.version, engine.mode
+                )
+            return await loop.run_in_executor(self._pool, engine.predict_proba, X)
+        finally:
+            self._in_flight -= 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        busy = min(self._in_flight, self.max_workers)
+        INFERENCE_QUEUE_DEPTH.set(self._in_flight - busy)
+        INFERENCE_WORKER_UTILIZATION.set(busy / self.max_workers)
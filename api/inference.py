@@ -0,0 +1,144 @@
+# api/inference.py
+"""
+Moteur d'inférence du modèle de classification
+
+- Une seule passe predict_proba : la classe prédite est déduite des
+  probabilités (argmax) au lieu d'un second appel à model.predict.
+- Mode "compiled" optionnel : les arbres du modèle sont aplatis en tableaux
+  NumPy contigus et toute la forêt est évaluée de façon vectorisée sur les
+  lignes, sans DataFrame ni surcoût d'appel scikit-learn.
+"""
+import logging
+import time
+import numpy as np
+import pandas as pd
+
+from .monitoring_prometheus import PREDICTION_STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Étapes internes du moteur (par lot évalué)
+DATAFRAME_LATENCY = PREDICTION_STAGE_LATENCY.labels(endpoint="engine", stage="dataframe")
+FOREST_LATENCY = PREDICTION_STAGE_LATENCY.labels(endpoint="engine", stage="forest")
+
+INFERENCE_MODES = ("sklearn", "compiled")
+
+
+class CompiledForest:
+    """
+    Forêt (ou arbre unique) aplatie en tableaux NumPy
+
+    Tous les noeuds de tous les arbres sont concaténés ; les feuilles
+    pointent sur elles-mêmes, ce qui permet d'avancer tous les arbres et
+    toutes les lignes en parallèle pendant max_depth itérations.
+    """
+
+    def __init__(self, model):
+        estimators = getattr(model, "estimators_", [model])
+
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes) + offset
+            is_leaf = tree.children_left == -1
+
+            left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+
+            # Distribution normalisée des classes à chaque noeud
+            counts = tree.value[:, 0, :]
+            value.append(counts / counts.sum(axis=1, keepdims=True))
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.left = np.ascontiguousarray(np.concatenate(left), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(right), dtype=np.intp)
+        self.feature = np.ascontiguousarray(np.concatenate(feature), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(threshold), dtype=np.float64)
+        self.value = np.ascontiguousarray(np.concatenate(value), dtype=np.float64)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Évalue toute la forêt sur un tableau N×4
+
+        Returns:
+            Tableau N×K des probabilités moyennes des arbres
+        """
+        # scikit-learn compare les caractéristiques en float32
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])
+
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].sum(axis=0) / self.n_trees
+
+
+class InferenceEngine:
+    """Point d'entrée unique pour calculer les prédictions d'un modèle"""
+
+    def __init__(self, model, mode: str = "sklearn", source: str = None, version: str = None):
+        """
+        Args:
+            model: Modèle scikit-learn (RandomForest ou DecisionTree)
+            mode: "sklearn" (predict_proba du modèle) ou "compiled"
+            source: Chemin de l'artefact (rechargé dans les workers en mode process)
+            version: Version de l'artefact
+        """
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Mode d'inférence inconnu: {mode}")
+
+        self.model = model
+        self.mode = mode
+        self.source = source
+        self.version = version
+        self.classes_ = model.classes_
+        self.feature_names = getattr(model, "feature_names_in_", None)
+        self._forest = CompiledForest(model) if mode == "compiled" else None
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Calcule les probabilités d'un tableau N×4 en une seule passe"""
+        start_time = time.perf_counter()
+        if self._forest is not None:
+            probabilities = self._forest.predict_proba(X)
+            FOREST_LATENCY.observe(time.perf_counter() - start_time)
+            return probabilities
+
+        # Colonnes nommées comme à l'entraînement (évite l'avertissement sklearn)
+        df = pd.DataFrame(X, columns=self.feature_names)
+        built_at = time.perf_counter()
+        DATAFRAME_LATENCY.observe(built_at - start_time)
+
+        probabilities = self.model.predict_proba(df)
+        FOREST_LATENCY.observe(time.perf_counter() - built_at)
+        return probabilities
+
+    def decide(self, probabilities):
+        """
+        Déduit la classe prédite et la confiance à partir des probabilités
+
+        Fonctionne pour une ligne (K,) comme pour un lot (N, K).
+
+        Returns:
+            (classes prédites, confiances)
+        """
+        return self.classes_[probabilities.argmax(axis=-1)], probabilities.max(axis=-1)
+
+    def verify(self, X, atol: float = 1e-9) -> bool:
+        """Vérifie que le mode compilé reproduit predict_proba de scikit-learn"""
+        if self._forest is None:
+            return True
+        expected = self.model.predict_proba(pd.DataFrame(X, columns=self.feature_names))
+        return bool(np.allclose(self._forest.predict_proba(X), expected, atol=atol))
@@ -1,69 +1,117 @@
 """
 Monitoring Evidently pour détecter le drift et la qualité des données
 Compatible avec Evidently 0.7.x
+
+Evidently n'est importé qu'à la première génération de rapport (voir
+load_evidently) : son import coûte plusieurs secondes au démarrage.
 """
 import pandas as pd
+from datetime import datetime, timedelta
 from pathlib import Path
-from evidently import Report
-from evidently.presets import DataDriftPreset, DataSummaryPreset
+
+from .drift import StreamingDriftEngine
+from .reference import load_reference_data, load_reference_profile
+from .storage import get_prediction_store
+from .windows import EmptyWindow, WindowSpec, default_window, get_recent_predictions, get_windows, load_window
 
 # Import des métriques Prometheus
 from .monitoring_prometheus import (
     DATASET_DRIFT_DETECTED,
     DRIFT_SHARE,
     COLUMN_DRIFT,
+    COLUMN_DRIFT_SCORE,
     DATA_ROWS_COUNT,
-    PREDICTION_CLASS_DISTRIBUTION
+    PREDICTION_CLASS_DISTRIBUTION,
+    CLASS_COLUMN_DRIFT_SCORE,
+    PREDICTION_CLASS_SHARE,
+    PREDICTION_LABEL_DRIFT,
+    CONFIDENCE_DRIFT,
+    WINDOW_ROWS_COUNT,
+    WINDOW_DRIFT_SHARE,
+    WINDOW_COLUMN_DRIFT_SCORE,
+    WINDOW_LABEL_DRIFT
 )
 
-# Chemins des fichiers
-REFERENCE_DATA_PATH = Path("data/reference_data.csv")
-CURRENT_DATA_PATH = Path("logfiles/predictions_log.csv")
+# Dossier des rapports (créé à la première génération)
 REPORTS_DIR = Path("evidently_reports")
 
-# Créer le dossier pour les rapports
-REPORTS_DIR.mkdir(exist_ok=True)
-
 # Colonnes importantes à surveiller pour le drift
 MONITORED_COLUMNS = ['petal_length', 'petal_width', 'sepal_length', 'sepal_width']
 
+# Confiances de base des moteurs de fenêtre et leur clé (fournies par l'application)
+_window_confidence_baseline = (None, None)
 
-def load_reference_data() -> pd.DataFrame:
-    """Charge les données de référence"""
-    df = pd.read_csv(REFERENCE_DATA_PATH)
-    return df
+
+def load_evidently():
+    """
+    Importe Evidently à la demande
+
+    Returns:
+        (Report, DataDriftPreset, DataSummaryPreset)
+    """
+    from evidently import Report
+    from evidently.presets import DataDriftPreset, DataSummaryPreset
+    return Report, DataDriftPreset, DataSummaryPreset
 
 
-def load_current_data(limit: int = 100) -> pd.DataFrame:
+def load_current_data(limit: int = 100, window_minutes: float = None, window: WindowSpec = None) -> pd.DataFrame:
     """
     Charge les données de production récentes
     
+    Seule la fin du log est lue : le coût dépend de la fenêtre, pas de
+    la taille de l'historique.
+
     Args:
         limit: Nombre de lignes à charger (les plus récentes)
+        window_minutes: Si renseigné, charge plutôt les prédictions
+            des N dernières minutes (ex: 15)
+        window: Si renseignée, charge plutôt les prédictions de cette fenêtre
+            (depuis le buffer des dernières prédictions quand il la couvre)
     """
-    df = pd.read_csv(CURRENT_DATA_PATH)
-    
     # Garder seulement les colonnes nécessaires
     columns = ['sepal_length', 'sepal_width', 'petal_length', 'petal_width', 
                'prediction', 'prediction_name']
     
-    # Prendre les N dernières lignes
-    df = df[columns].tail(limit)
+    store = get_prediction_store()
+    if window is not None:
+        return load_window(window, store, get_recent_predictions(), columns=columns)
+
+    if window_minutes is not None:
+        since = datetime.now() - timedelta(minutes=window_minutes)
+        return store.read(columns=columns, since=since)
+
+    # Prendre les N dernières lignes (seules ces colonnes sont lues)
+    df = store.read(columns=columns, limit=limit)
     
     return df
 
 
-def generate_data_drift_report() -> str:
+def _window_data(window: WindowSpec = None) -> pd.DataFrame:
+    """Données de la fenêtre demandée (fenêtre par défaut sinon), non vides"""
+    window = window or default_window()
+    current = load_current_data(window=window)
+    if current.empty:
+        raise EmptyWindow(f"Aucune prédiction dans la fenêtre {window.name}")
+    return current
+
+
+def generate_data_drift_report(report_path: Path = None, window: WindowSpec = None) -> str:
     """
     Génère un rapport de Data Drift
     Compare les données actuelles avec les données de référence
     
+    Args:
+        report_path: Fichier HTML de sortie (par défaut dans REPORTS_DIR)
+        window: Fenêtre des données courantes (DEFAULT_MONITORING_WINDOW par défaut)
+
     Returns:
         Chemin du rapport HTML généré
     """
+    Report, DataDriftPreset, _ = load_evidently()
+
     # Charger les données
     reference = load_reference_data()
-    current = load_current_data()
+    current = _window_data(window)
     
     # Créer le rapport avec DataDriftPreset
     report = Report(metrics=[
@@ -74,22 +122,30 @@ def generate_data_drift_report() -> str:
     result = report.run(reference_data=reference, current_data=current)
     
     # Sauvegarder en HTML sur l'objet résultat
-    report_path = REPORTS_DIR / "data_drift_report.html"
+    if report_path is None:
+        REPORTS_DIR.mkdir(exist_ok=True)
+        report_path = REPORTS_DIR / "data_drift_report.html"
     result.save_html(str(report_path))
     
     return str(report_path)
 
 
-def generate_data_summary_report() -> str:
+def generate_data_summary_report(report_path: Path = None, window: WindowSpec = None) -> str:
     """
     Génère un rapport de résumé/qualité des données
     
+    Args:
+        report_path: Fichier HTML de sortie (par défaut dans REPORTS_DIR)
+        window: Fenêtre des données courantes (DEFAULT_MONITORING_WINDOW par défaut)
+
     Returns:
         Chemin du rapport HTML généré
     """
+    Report, _, DataSummaryPreset = load_evidently()
+
     # Charger les données
     reference = load_reference_data()
-    current = load_current_data()
+    current = _window_data(window)
     
     # Créer le rapport avec DataSummaryPreset
     report = Report(metrics=[
@@ -100,24 +156,31 @@ def generate_data_summary_report() -> str:
     result = report.run(reference_data=reference, current_data=current)
     
     # Sauvegarder en HTML sur l'objet résultat
-    report_path = REPORTS_DIR / "data_summary_report.html"
+    if report_path is None:
+        REPORTS_DIR.mkdir(exist_ok=True)
+        report_path = REPORTS_DIR / "data_summary_report.html"
     result.save_html(str(report_path))
     
     return str(report_path)
 
 
-def update_prometheus_drift_metrics():
+def update_prometheus_drift_metrics(window: WindowSpec = None):
     """
     Met à jour les métriques Prometheus avec les données de drift
 
     Cette fonction extrait les métriques numériques d'Evidently pour Prometheus.
 
+    Args:
+        window: Fenêtre des données courantes (DEFAULT_MONITORING_WINDOW par défaut)
+
     Returns:
         dict: Résumé des métriques mises à jour
     """
+    Report, DataDriftPreset, _ = load_evidently()
+
     # Charger les données
     reference = load_reference_data()
-    current = load_current_data()
+    current = _window_data(window)
 
     # Créer un rapport de drift (utilise le Preset pour compatibilité 0.7.x)
     report = Report(metrics=[DataDriftPreset()])
@@ -181,9 +244,146 @@ def update_prometheus_drift_metrics():
             class_distribution[class_name] = int(count)
         summary["class_distribution"] = class_distribution
 
+    # Drift par classe et des classes prédites (une passe NumPy sur la même fenêtre)
+    summary["prediction_drift"] = update_prediction_drift_metrics(_window_engine(window or default_window()))
+
     return summary
 
 
+def update_streaming_drift_metrics(engine) -> dict:
+    """
+    Met à jour les métriques Prometheus à partir du moteur de drift en streaming
+
+    Coût constant (indépendant du nombre de prédictions) : peut être appelé
+    toutes les quelques secondes.
+
+    Args:
+        engine: StreamingDriftEngine alimenté par le log des prédictions
+
+    Returns:
+        dict: Résumé des métriques mises à jour
+    """
+    result = engine.compute()
+
+    DATASET_DRIFT_DETECTED.set(1 if result["dataset_drift_detected"] else 0)
+    DRIFT_SHARE.set(result["drift_share"])
+    DATA_ROWS_COUNT.set(result["num_rows"])
+
+    for col_name, stats in result["columns"].items():
+        COLUMN_DRIFT.labels(column_name=col_name).set(1 if stats["drift_detected"] else 0)
+        for statistic in ("ks", "ks_pvalue", "psi", "wasserstein"):
+            COLUMN_DRIFT_SCORE.labels(column_name=col_name, statistic=statistic).set(stats[statistic])
+
+    return {
+        "dataset_drift_detected": result["dataset_drift_detected"],
+        "drift_share": result["drift_share"],
+        "drifted_columns_count": result["drifted_columns_count"],
+        "num_rows": result["num_rows"],
+        "columns": result["columns"],
+        "prediction_drift": update_prediction_drift_metrics(engine),
+    }
+
+
+def set_window_confidence_baseline(confidences, key=None):
+    """
+    Confiances de base des moteurs de fenêtre (les mêmes que celles du moteur en streaming)
+
+    Args:
+        confidences: Confiances du modèle par défaut sur la référence
+        key: Identifiant de la base (empreinte de la référence, version du modèle)
+    """
+    global _window_confidence_baseline
+    _window_confidence_baseline = (confidences, key)
+
+
+def _window_engine(window: WindowSpec) -> StreamingDriftEngine:
+    """Moteur de drift rempli avec les prédictions d'une fenêtre"""
+    frame = load_window(
+        window, get_prediction_store(), get_recent_predictions(),
+        columns=[*MONITORED_COLUMNS, 'prediction', 'confidence']
+    )
+    engine = StreamingDriftEngine(load_reference_profile(), MONITORED_COLUMNS, window_size=max(len(frame), 1))
+    confidences, key = _window_confidence_baseline
+    if confidences is not None:
+        engine.set_confidence_baseline(confidences, key)
+    engine.observe_frame(frame)
+    return engine
+
+
+def update_window_drift_metrics(windows: dict = None) -> dict:
+    """
+    Met à jour les métriques Prometheus de chaque fenêtre configurée (label window)
+
+    Args:
+        windows: {nom: WindowSpec} (par défaut les fenêtres de MONITORING_WINDOWS)
+
+    Returns:
+        dict: Par fenêtre, sa définition, num_rows, drift_share,
+        dataset_drift_detected et label_drift
+    """
+    summary = {}
+    for name, window in (windows or get_windows()).items():
+        engine = _window_engine(window)
+        drift = engine.compute()
+        label_drift = engine.compute_prediction_drift()["label_drift"]
+
+        WINDOW_ROWS_COUNT.labels(window=name).set(drift["num_rows"])
+        WINDOW_DRIFT_SHARE.labels(window=name).set(drift["drift_share"])
+        for col_name, stats in drift["columns"].items():
+            for statistic in ("ks", "ks_pvalue", "psi", "wasserstein"):
+                WINDOW_COLUMN_DRIFT_SCORE.labels(
+                    window=name, column_name=col_name, statistic=statistic
+                ).set(stats[statistic])
+        if label_drift is not None:
+            WINDOW_LABEL_DRIFT.labels(window=name, statistic="chi2").set(label_drift["chi2"])
+            WINDOW_LABEL_DRIFT.labels(window=name, statistic="pvalue").set(label_drift["pvalue"])
+
+        summary[name] = {
+            **window.describe(),
+            "num_rows": drift["num_rows"],
+            "drift_share": drift["drift_share"],
+            "dataset_drift_detected": drift["dataset_drift_detected"],
+            "label_drift": label_drift,
+        }
+    return summary
+
+
+def update_prediction_drift_metrics(engine) -> dict:
+    """
+    Met à jour les métriques Prometheus du drift tenant compte des prédictions
+
+    Drift de chaque colonne par classe prédite, des classes prédites
+    (chi-deux contre la référence) et des confiances, calculé en une passe
+    NumPy sur la fenêtre du moteur (quelques millisecondes pour 100k lignes).
+
+    Args:
+        engine: StreamingDriftEngine
+
+    Returns:
+        dict: Résultat de engine.compute_prediction_drift()
+    """
+    result = engine.compute_prediction_drift()
+
+    for class_name, stats in result["classes"].items():
+        PREDICTION_CLASS_SHARE.labels(class_name=class_name, source="current").set(stats["share"])
+        PREDICTION_CLASS_SHARE.labels(class_name=class_name, source="reference").set(stats["reference_share"])
+        for col_name, column in stats["columns"].items():
+            for statistic in ("ks", "ks_pvalue", "psi"):
+                CLASS_COLUMN_DRIFT_SCORE.labels(
+                    class_name=class_name, column_name=col_name, statistic=statistic
+                ).set(column[statistic])
+
+    if result["label_drift"] is not None:
+        PREDICTION_LABEL_DRIFT.labels(statistic="chi2").set(result["label_drift"]["chi2"])
+        PREDICTION_LABEL_DRIFT.labels(statistic="pvalue").set(result["label_drift"]["pvalue"])
+
+    if result["confidence_drift"] is not None:
+        for statistic in ("ks", "ks_pvalue", "psi", "mean_shift"):
+            CONFIDENCE_DRIFT.labels(statistic=statistic).set(result["confidence_drift"][statistic])
+
+    return result
+
+
 if __name__ == "__main__":
     # Test du module
     print("🔍 Génération du rapport Data Drift...")
@@ -1,8 +1,21 @@
 # monitoring_prometheus.py - VERSION FINALE CORRIGÉE
 from prometheus_fastapi_instrumentator import Instrumentator
-from prometheus_client import Counter, Histogram, Gauge
+from prometheus_client import (
+    Counter, Histogram, Gauge, CollectorRegistry, multiprocess, generate_latest, CONTENT_TYPE_LATEST
+)
+from fastapi import Response
+import logging
+import os
 import time
 
+logger = logging.getLogger(__name__)
+
+# Mode multiprocess (plusieurs workers, voir gunicorn.conf.py) : chaque processus
+# écrit ses valeurs dans PROMETHEUS_MULTIPROC_DIR, agrégées à la lecture de /metrics.
+# multiprocess_mode indique comment chaque gauge est agrégée entre workers
+# ("live*" : seuls les workers vivants comptent).
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
 # ========== MÉTRIQUES CUSTOMISÉES ==========
 IRIS_PREDICTION_COUNT = Counter(
     'iris_prediction_requests_total',
@@ -25,7 +38,20 @@ PREDICTION_CONFIDENCE = Histogram(
 
 ACTIVE_REQUESTS = Gauge(
     'iris_active_requests',
-    'Number of active requests to the Iris API'
+    'Number of active requests to the Iris API',
+    multiprocess_mode='livesum'
+)
+
+INFERENCE_QUEUE_DEPTH = Gauge(
+    'iris_inference_queue_depth',
+    'Number of inference batches waiting for a free worker',
+    multiprocess_mode='livesum'
+)
+
+INFERENCE_WORKER_UTILIZATION = Gauge(
+    'iris_inference_worker_utilization',
+    'Share of inference workers currently busy (0.0 to 1.0)',
+    multiprocess_mode='liveall'
 )
 
 REQUEST_BY_ENDPOINT = Counter(
@@ -34,98 +60,407 @@ REQUEST_BY_ENDPOINT = Counter(
     ['method', 'endpoint', 'status_code']
 )
 
+BATCH_PREDICTION_SIZE = Histogram(
+    'iris_batch_prediction_size',
+    'Number of rows per /predict/batch request',
+    buckets=[1, 10, 50, 100, 500, 1000, 5000, 10000]
+)
+
+# Étapes du traitement d'une prédiction (buckets fins sous la milliseconde)
+PREDICTION_STAGE_LATENCY = Histogram(
+    'iris_prediction_stage_seconds',
+    'Time spent in each stage of the prediction pipeline',
+    ['endpoint', 'stage'],
+    buckets=[0.00005, 0.0001, 0.00025, 0.0005, 0.00075, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0]
+)
+
+# ========== MICRO-BATCHING ==========
+MICRO_BATCH_SIZE = Histogram(
+    'iris_micro_batch_size',
+    'Number of /predict requests evaluated together by the micro-batcher',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256]
+)
+
+MICRO_BATCH_QUEUE_WAIT = Histogram(
+    'iris_micro_batch_queue_wait_seconds',
+    'Time a /predict request waits in the micro-batcher before evaluation',
+    buckets=[0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.05, 0.1]
+)
+
+# ========== DÉMARRAGE ==========
+STARTUP_PHASE_DURATION = Gauge(
+    'iris_startup_phase_seconds',
+    'Duration of each application startup phase',
+    ['phase'],
+    multiprocess_mode='livemax'
+)
+
+STARTUP_DURATION = Gauge(
+    'iris_startup_duration_seconds',
+    'Total application startup duration, module imports included',
+    multiprocess_mode='livemax'
+)
+
+# ========== REGISTRE DES MODÈLES ==========
+MODELS_LOADED = Gauge(
+    'iris_models_loaded',
+    'Number of models currently loaded in memory',
+    multiprocess_mode='livemax'
+)
+
+MODEL_MEMORY_BYTES = Gauge(
+    'iris_models_memory_bytes',
+    'Estimated memory used by the loaded models (artifact sizes)',
+    multiprocess_mode='livesum'
+)
+
+MODEL_RELOADS = Counter(
+    'iris_model_reloads_total',
+    'Model loads and hot swaps by model and outcome',
+    ['model_name', 'status']
+)
+
+# ========== CACHE DES PRÉDICTIONS ==========
+PREDICTION_CACHE_HITS = Counter(
+    'iris_prediction_cache_hits_total',
+    'Predictions served from the result cache'
+)
+
+PREDICTION_CACHE_MISSES = Counter(
+    'iris_prediction_cache_misses_total',
+    'Predictions not found in the result cache'
+)
+
+PREDICTION_CACHE_EVICTIONS = Counter(
+    'iris_prediction_cache_evictions_total',
+    'Entries removed from the result cache',
+    ['reason']
+)
+
+PREDICTION_CACHE_SIZE = Gauge(
+    'iris_prediction_cache_size',
+    'Number of entries in the result cache',
+    multiprocess_mode='livesum'
+)
+
+# ========== LOG DES PRÉDICTIONS ==========
+LOG_BUFFER_DEPTH = Gauge(
+    'iris_prediction_log_buffer_depth',
+    'Number of predictions waiting in memory to be written to the log',
+    multiprocess_mode='livesum'
+)
+
+LOG_FLUSH_LATENCY = Histogram(
+    'iris_prediction_log_flush_seconds',
+    'Time to write one block of buffered predictions to the log',
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+)
+
+LOG_DROPPED_RECORDS = Counter(
+    'iris_prediction_log_dropped_total',
+    'Predictions dropped because the log buffer was full or the write failed'
+)
+
 # ========== MÉTRIQUES EVIDENTLY (DATA DRIFT & QUALITY) ==========
 DATASET_DRIFT_DETECTED = Gauge(
     'iris_dataset_drift_detected',
-    'Whether dataset drift is detected (1=yes, 0=no)'
+    'Whether dataset drift is detected (1=yes, 0=no)',
+    multiprocess_mode='mostrecent'
 )
 
 DRIFT_SHARE = Gauge(
     'iris_drift_share_columns',
-    'Share of columns with detected drift (0.0 to 1.0)'
+    'Share of columns with detected drift (0.0 to 1.0)',
+    multiprocess_mode='mostrecent'
 )
 
 COLUMN_DRIFT = Gauge(
     'iris_column_drift',
     'Drift detected for specific column (1=yes, 0=no)',
-    ['column_name']
+    ['column_name'],
+    multiprocess_mode='mostrecent'
+)
+
+COLUMN_DRIFT_SCORE = Gauge(
+    'iris_column_drift_score',
+    'Streaming drift statistic per column (ks, ks_pvalue, psi, wasserstein)',
+    ['column_name', 'statistic'],
+    multiprocess_mode='mostrecent'
 )
 
 DATA_ROWS_COUNT = Gauge(
     'iris_data_rows_count',
-    'Number of rows in current dataset'
+    'Number of rows in current dataset',
+    multiprocess_mode='mostrecent'
 )
 
 PREDICTION_CLASS_DISTRIBUTION = Gauge(
     'iris_prediction_class_distribution',
     'Distribution of prediction classes in current data',
-    ['class_name']
+    ['class_name'],
+    multiprocess_mode='mostrecent'
+)
+
+# Drift tenant compte des prédictions (statistique et p-value, pas seulement 0/1)
+CLASS_COLUMN_DRIFT_SCORE = Gauge(
+    'iris_class_column_drift_score',
+    'Drift statistic per predicted class and column against the same class in the reference (ks, ks_pvalue, psi)',
+    ['class_name', 'column_name', 'statistic'],
+    multiprocess_mode='mostrecent'
+)
+
+PREDICTION_CLASS_SHARE = Gauge(
+    'iris_prediction_class_share',
+    'Share of each predicted class in the current window and in the reference',
+    ['class_name', 'source'],
+    multiprocess_mode='mostrecent'
+)
+
+PREDICTION_LABEL_DRIFT = Gauge(
+    'iris_prediction_label_drift',
+    'Chi-square test of predicted classes against the reference priors (chi2, pvalue)',
+    ['statistic'],
+    multiprocess_mode='mostrecent'
+)
+
+CONFIDENCE_DRIFT = Gauge(
+    'iris_confidence_drift',
+    'Drift of prediction confidences against the model baseline on the reference (ks, ks_pvalue, psi, mean_shift)',
+    ['statistic'],
+    multiprocess_mode='mostrecent'
+)
+
+# Une série par fenêtre configurée (MONITORING_WINDOWS)
+WINDOW_ROWS_COUNT = Gauge(
+    'iris_window_rows_count',
+    'Number of predictions in each monitoring window',
+    ['window'],
+    multiprocess_mode='mostrecent'
+)
+
+WINDOW_DRIFT_SHARE = Gauge(
+    'iris_window_drift_share_columns',
+    'Share of columns with detected drift in each monitoring window (0.0 to 1.0)',
+    ['window'],
+    multiprocess_mode='mostrecent'
+)
+
+WINDOW_COLUMN_DRIFT_SCORE = Gauge(
+    'iris_window_column_drift_score',
+    'Drift statistic per monitoring window and column (ks, ks_pvalue, psi, wasserstein)',
+    ['window', 'column_name', 'statistic'],
+    multiprocess_mode='mostrecent'
 )
 
+WINDOW_LABEL_DRIFT = Gauge(
+    'iris_window_prediction_label_drift',
+    'Chi-square test of predicted classes against the reference priors per monitoring window (chi2, pvalue)',
+    ['window', 'statistic'],
+    multiprocess_mode='mostrecent'
+)
+
+
+DRIFT_UPDATE_DURATION = Histogram(
+    'iris_drift_update_duration_seconds',
+    'Duration of one scheduled drift metrics refresh',
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0]
+)
+
+DRIFT_UPDATE_ERRORS = Counter(
+    'iris_drift_update_errors_total',
+    'Number of failed drift metrics refreshes'
+)
+
+DRIFT_LAST_UPDATE_TIMESTAMP = Gauge(
+    'iris_drift_last_update_timestamp_seconds',
+    'Unix time of the last successful drift metrics refresh',
+    multiprocess_mode='max'
+)
+
+DRIFT_METRICS_STALENESS = Gauge(
+    'iris_drift_metrics_staleness_seconds',
+    'Age of the published drift metrics',
+    multiprocess_mode='livemin'
+)
+
+# ========== CHRONOMÉTRAGE DU DÉMARRAGE ==========
+class StartupTimer:
+    """Mesure la durée de chaque phase du démarrage (appeler mark() à la fin de chaque phase)"""
+
+    def __init__(self, imports_duration: float = 0.0):
+        self.phases = {"imports": imports_duration}
+        self._last = time.perf_counter()
+        STARTUP_PHASE_DURATION.labels(phase="imports").set(imports_duration)
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+        STARTUP_PHASE_DURATION.labels(phase=phase).set(self.phases[phase])
+
+    def finish(self) -> float:
+        total = sum(self.phases.values())
+        STARTUP_DURATION.set(total)
+        phases = ", ".join(f"{phase}: {duration:.2f}s" for phase, duration in self.phases.items())
+        logger.info(f"⏱️ Démarrage en {total:.2f}s ({phases})")
+        return total
 
-# ========== MIDDLEWARE (défini au niveau module) ==========
-async def prometheus_middleware(request, call_next):
+
+# ========== CHRONOMÉTRAGE DES ÉTAPES D'UNE PRÉDICTION ==========
+# Clé du scope ASGI où PrometheusMiddleware note le début de la requête
+REQUEST_START_KEY = "iris.request_start"
+
+
+class StageTimer:
+    """Mesure la durée de chaque étape d'une requête (appeler mark() à la fin de chaque étape)"""
+
+    # Séries déjà résolues : {(endpoint, étape): histogramme}
+    _series = {}
+
+    def __init__(self, endpoint: str, start: float = None):
+        """
+        Args:
+            endpoint: Route chronométrée (libellé des métriques)
+            start: Instant (perf_counter) de début de la requête, sinon maintenant
+        """
+        self.endpoint = endpoint
+        self.stages = []
+        self._last = start if start is not None else time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def observe(self):
+        """Publie les durées dans iris_prediction_stage_seconds"""
+        for stage, duration in self.stages:
+            series = self._series.get((self.endpoint, stage))
+            if series is None:
+                series = PREDICTION_STAGE_LATENCY.labels(endpoint=self.endpoint, stage=stage)
+                self._series[(self.endpoint, stage)] = series
+            series.observe(duration)
+
+    def server_timing(self) -> str:
+        """Valeur de l'en-tête HTTP Server-Timing (durées en ms)"""
+        return ", ".join(f"{stage};dur={duration * 1000:.3f}" for stage, duration in self.stages)
+
+
+# ========== MISE À JOUR GROUPÉE (batch) ==========
+def record_batch_predictions(predictions, confidences):
     """
-    Middleware pour les métriques Prometheus
-    IMPORTANT : Doit être ajouté AVANT le démarrage de l'app
+    Met à jour les métriques pour un lot de prédictions en une seule passe
+
+    Les compteurs sont incrémentés une fois par classe (et non une fois
+    par ligne) ; seul l'histogramme de confiance est alimenté ligne à ligne.
     """
-    start_time = time.time()
-    
-    # Traitement spécial pour /predict
-    if request.url.path == "/predict":
-        ACTIVE_REQUESTS.inc()
-        
-        try:
-            # Appeler l'endpoint et obtenir la réponse
-            response = await call_next(request)
-            
-            # Mesurer la latence
-            process_time = time.time() - start_time
-            PREDICTION_LATENCY.observe(process_time)
-            
-            # Compter les prédictions selon le status code
-            if response.status_code == 200:
-                IRIS_PREDICTION_COUNT.labels(
-                    prediction_class="success",
-                    status="200"
-                ).inc()
+    n_rows = len(predictions)
+    BATCH_PREDICTION_SIZE.observe(n_rows)
+    IRIS_PREDICTION_COUNT.labels(prediction_class="success", status="200").inc(n_rows)
+
+    for prediction_class, confidence in zip(predictions, confidences):
+        PREDICTION_CONFIDENCE.labels(prediction_class=str(prediction_class)).observe(confidence)
+
+
+# ========== MIDDLEWARE (ASGI pur) ==========
+# Libellé des requêtes ne correspondant à aucune route (scanners, 404...) :
+# les séries restent bornées au nombre de routes de l'application
+UNMATCHED_HANDLER = "unmatched"
+
+# Handlers exclus des métriques http_* (comme pour l'Instrumentator)
+EXCLUDED_HANDLERS = ("/metrics",)
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total',
+    'Total number of requests by method, status and handler.',
+    ['method', 'status', 'handler']
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Latency with only few buckets by handler.',
+    ['method', 'handler'],
+    buckets=(0.1, 0.5, 1.0)
+)
+
+class PrometheusMiddleware:
+    """
+    Instrumentation HTTP en ASGI pur
+
+    Un seul niveau autour de l'application : ni tâche ni flux intermédiaire
+    par requête (contrairement à BaseHTTPMiddleware). Les libellés viennent
+    du modèle de route (ex: /models/{name}/reload) et non du chemin brut,
+    et les séries déjà résolues sont réutilisées d'une requête à l'autre.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._series = {}
+
+    def _get_series(self, method: str, handler: str, status_code: int, is_predict: bool):
+        """Séries (compteur par endpoint ou par prédiction, compteur et latence http_*)"""
+        key = (method, handler, status_code, is_predict)
+        series = self._series.get(key)
+        if series is None:
+            status = str(status_code)
+            if is_predict:
+                counter = IRIS_PREDICTION_COUNT.labels(
+                    prediction_class="success" if status_code == 200 else "error", status=status
+                )
             else:
-                IRIS_PREDICTION_COUNT.labels(
-                    prediction_class="error",
-                    status=str(response.status_code)
-                ).inc()
-            
-            return response
-            
-        except Exception as e:
-            # En cas d'erreur, compter comme erreur
-            IRIS_PREDICTION_COUNT.labels(
-                prediction_class="error",
-                status="500"
-            ).inc()
-            raise e
-            
-        finally:
-            # Toujours décrémenter le compteur de requêtes actives
-            ACTIVE_REQUESTS.dec()
-    
-    else:
-        # Pour les autres endpoints, monitoring simple
+                counter = REQUEST_BY_ENDPOINT.labels(method=method, endpoint=handler, status_code=status)
+
+            if handler in EXCLUDED_HANDLERS or handler == UNMATCHED_HANDLER:
+                series = (counter, None, None)
+            else:
+                series = (
+                    counter,
+                    HTTP_REQUESTS.labels(method=method, status=status, handler=handler),
+                    HTTP_REQUEST_DURATION.labels(method=method, handler=handler),
+                )
+            self._series[key] = series
+        return series
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        scope[REQUEST_START_KEY] = start_time
+        status_code = 500
+        is_predict = scope["path"] == "/predict"
+        if is_predict:
+            ACTIVE_REQUESTS.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # Compter par endpoint
-            REQUEST_BY_ENDPOINT.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status_code=response.status_code
-            ).inc()
-            
-            return response
-            
-        except Exception as e:
-            raise e
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start_time
+            route = scope.get("route")
+            handler = getattr(route, "path", None) or UNMATCHED_HANDLER
+            counter, requests, request_duration = self._get_series(
+                scope["method"], handler, status_code, is_predict
+            )
+            counter.inc()
+
+            if is_predict:
+                # Traitement spécial pour /predict
+                ACTIVE_REQUESTS.dec()
+                PREDICTION_LATENCY.observe(duration)
+
+            if requests is not None:
+                requests.inc()
+                request_duration.observe(duration)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s %s -> %s (%.2f ms)", scope["method"], scope["path"], status_code, duration * 1000)
 
 
 # ========== SETUP FUNCTION (appelée dans le lifespan) ==========
@@ -133,19 +468,26 @@ def setup_metrics_endpoint(app):
     """
     Configure l'endpoint /metrics pour Prometheus
     À appeler dans le lifespan de FastAPI
+
+    Les requêtes sont instrumentées par PrometheusMiddleware : l'Instrumentator
+    ne sert plus qu'à exposer /metrics.
     """
     instrumentator = Instrumentator(
-        should_group_status_codes=False,
-        should_ignore_untemplated=True,
         should_respect_env_var=True,
-        should_instrument_requests_inprogress=True,
-        excluded_handlers=[".*admin.*", "/metrics"],
         env_var_name="ENABLE_METRICS",
-        inprogress_name="iris_inprogress",
-        inprogress_labels=True,
     )
     
-    # Instrumenter et exposer /metrics
-    instrumentator.instrument(app).expose(app)
+    # Exposer /metrics
+    if not MULTIPROCESS:
+        instrumentator.expose(app)
+    elif os.environ.get("ENABLE_METRICS", "false") == "true":
+        # Valeurs lues dans les fichiers de tous les workers à chaque collecte
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+        @app.get("/metrics")
+        def metrics():
+            """Endpoint that serves Prometheus metrics."""
+            return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     
     return instrumentator
\ No newline at end of file
@@ -0,0 +1,116 @@
+# api/prediction_cache.py
+"""
+Cache des résultats de prédiction
+
+Les mêmes caractéristiques reviennent très souvent (échantillons de
+/generate-sample, scripts de test...). Les probabilités calculées sont
+gardées dans un cache LRU avec durée de vie, indexé par le modèle, sa
+version et les caractéristiques arrondies : un succès évite complètement
+l'évaluation de la forêt. Les entrées d'un modèle sont invalidées quand
+une nouvelle version est substituée.
+
+L'arrondi (decimals) doit rester fin : deux entrées arrondies à la même
+clé mais situées de part et d'autre d'un seuil d'un arbre recevraient la
+même réponse.
+
+Le cache n'est utilisé que depuis la boucle asyncio (pas de verrou) : un
+lot est arrondi en une seule opération NumPy et les compteurs Prometheus
+ne sont incrémentés qu'une fois par lot. Au-delà de PREDICTION_CACHE_MAX_BATCH
+lignes, /predict/batch n'utilise pas le cache (la boucle par ligne
+bloquerait la boucle asyncio plus longtemps que l'inférence elle-même).
+"""
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .monitoring_prometheus import (
+    PREDICTION_CACHE_HITS,
+    PREDICTION_CACHE_MISSES,
+    PREDICTION_CACHE_EVICTIONS,
+    PREDICTION_CACHE_SIZE
+)
+
+
+class PredictionCache:
+    """Cache LRU/TTL des probabilités par (modèle, version, caractéristiques)"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, decimals: int = 6):
+        """
+        Args:
+            max_size: Nombre maximal d'entrées (au-delà, les moins récentes sont évincées)
+            ttl: Durée de vie (en secondes) d'une entrée
+            decimals: Nombre de décimales conservées dans la clé
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.decimals = decimals
+        self._entries = OrderedDict()
+
+    def _keys(self, model_name: str, version: str, X) -> list:
+        """Clés d'un tableau N×4 : arrondi vectorisé, puis un tuple par ligne"""
+        rounded = np.round(np.asarray(X, dtype=np.float64).reshape(-1, np.shape(X)[-1]), self.decimals)
+        return [(model_name, version, *row) for row in rounded.tolist()]
+
+    def get(self, model_name: str, version: str, row):
+        """Probabilités en cache pour une ligne, ou None"""
+        cached, _ = self.get_many(model_name, version, [row])
+        return cached[0]
+
+    def put(self, model_name: str, version: str, row, probabilities: np.ndarray):
+        """Enregistre les probabilités d'une ligne"""
+        self.put_many(model_name, version, [row], [probabilities])
+
+    def get_many(self, model_name: str, version: str, rows):
+        """
+        Consulte le cache pour un lot (compteurs incrémentés une fois par lot)
+
+        Returns:
+            (probabilités en cache ou None pour chaque ligne, indices des lignes absentes)
+        """
+        entries = self._entries
+        now = time.monotonic()
+        cached, missing, expired = [], [], 0
+        for i, key in enumerate(self._keys(model_name, version, rows)):
+            entry = entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    entries.move_to_end(key)
+                    cached.append(entry[0])
+                    continue
+                del entries[key]
+                expired += 1
+            cached.append(None)
+            missing.append(i)
+
+        if len(cached) > len(missing):
+            PREDICTION_CACHE_HITS.inc(len(cached) - len(missing))
+        if missing:
+            PREDICTION_CACHE_MISSES.inc(len(missing))
+        if expired:
+            PREDICTION_CACHE_EVICTIONS.labels(reason="expired").inc(expired)
+            PREDICTION_CACHE_SIZE.set(len(entries))
+        return cached, missing
+
+    def put_many(self, model_name: str, version: str, rows, probabilities):
+        """Enregistre les probabilités d'un lot (lignes N×4, probabilités N×K)"""
+        entries = self._entries
+        expires_at = time.monotonic() + self.ttl
+        for key, row_probabilities in zip(self._keys(model_name, version, rows), probabilities):
+            entries[key] = (row_probabilities, expires_at)
+            entries.move_to_end(key)
+
+        evicted = len(entries) - self.max_size
+        for _ in range(max(evicted, 0)):
+            entries.popitem(last=False)
+        if evicted > 0:
+            PREDICTION_CACHE_EVICTIONS.labels(reason="lru").inc(evicted)
+        PREDICTION_CACHE_SIZE.set(len(entries))
+
+    def invalidate(self, model_name: str = None):
+        """Supprime les entrées d'un modèle (ou toutes)"""
+        keys = [k for k in self._entries if model_name is None or k[0] == model_name]
+        for key in keys:
+            del self._entries[key]
+        PREDICTION_CACHE_EVICTIONS.labels(reason="invalidated").inc(len(keys))
+        PREDICTION_CACHE_SIZE.set(len(self._entries))
@@ -0,0 +1,169 @@
+# api/prediction_log.py
+"""
+Écriture asynchrone et bufferisée du log des prédictions
+
+Les routes ajoutent les prédictions dans un buffer circulaire en mémoire ;
+un thread dédié (un seul écrivain par stockage) les écrit par blocs dès que
+le buffer atteint flush_size lignes ou toutes les flush_interval secondes.
+L'écriture elle-même est déléguée au backend de stockage (api/storage.py),
+que le thread écrivain archive (rotation), compacte et purge (rétention)
+aussi périodiquement.
+
+Des écouteurs peuvent être abonnés aux prédictions (appelés à l'ajout, dans
+la requête) et aux écritures (appelés dans le thread écrivain après chaque
+bloc écrit).
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from .storage import PredictionStore
+from .monitoring_prometheus import LOG_BUFFER_DEPTH, LOG_FLUSH_LATENCY, LOG_DROPPED_RECORDS
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLogWriter:
+    """Buffer circulaire de prédictions vidé par un thread écrivain"""
+
+    # Un seul écrivain par stockage dans le processus
+    _writers = {}
+    _writers_lock = threading.Lock()
+
+    @classmethod
+    def for_store(cls, store: PredictionStore, **kwargs) -> "PredictionLogWriter":
+        """Retourne l'écrivain associé à un stockage (le crée si besoin)"""
+        with cls._writers_lock:
+            if id(store) not in cls._writers:
+                cls._writers[id(store)] = cls(store, **kwargs)
+            return cls._writers[id(store)]
+
+    def __init__(self, store: PredictionStore, max_buffer: int = 10000, flush_size: int = 500,
+                 flush_interval: float = 1.0, compact_interval: float = 3600.0, retention_days: float = 0):
+        """
+        Args:
+            store: Backend de stockage de destination
+            max_buffer: Taille du buffer circulaire (au-delà, les plus anciennes lignes sont perdues)
+            flush_size: Nombre de lignes déclenchant une écriture immédiate
+            flush_interval: Délai maximal (en secondes) entre deux écritures
+            compact_interval: Délai (en secondes) entre deux compactions du stockage
+            retention_days: Ancienneté (en jours) au-delà de laquelle les prédictions
+                sont supprimées, vérifiée à chaque compaction (0 = tout garder)
+        """
+        self.store = store
+        self.compact_interval = compact_interval
+        self.retention_days = retention_days
+        self.max_buffer = max_buffer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._listeners = []
+        self._flush_callbacks = []
+
+    def add_listener(self, callback):
+        """Abonne callback(records) à chaque ajout de prédictions"""
+        self._listeners.append(callback)
+
+    def add_flush_callback(self, callback):
+        """Abonne callback() à chaque passage du thread écrivain"""
+        self._flush_callbacks.append(callback)
+
+    def start(self):
+        """Démarre le thread écrivain"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="prediction-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread et écrit tout ce qui reste dans le buffer"""
+        if self._thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def append(self, record: tuple):
+        """Ajoute une prédiction (tuple dans l'ordre de LOG_COLUMNS)"""
+        self.extend((record,))
+
+    def extend(self, records):
+        """Ajoute plusieurs prédictions en une seule prise de verrou"""
+        records = list(records)
+        with self._lock:
+            for record in records:
+                if len(self._buffer) == self.max_buffer:
+                    LOG_DROPPED_RECORDS.inc()
+                self._buffer.append(record)
+            depth = len(self._buffer)
+        LOG_BUFFER_DEPTH.set(depth)
+
+        if depth >= self.flush_size:
+            self._wakeup.set()
+
+        for callback in self._listeners:
+            try:
+                callback(records)
+            except Exception as e:
+                logger.error(f"Erreur dans un écouteur du log: {e}")
+
+    def flush(self):
+        """Écrit le contenu du buffer dans le fichier"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                records = list(self._buffer)
+                self._buffer.clear()
+            LOG_BUFFER_DEPTH.set(0)
+
+            start_time = time.perf_counter()
+            try:
+                self.store.append(records)
+            except Exception as e:
+                LOG_DROPPED_RECORDS.inc(len(records))
+                logger.error(f"Erreur lors de l'enregistrement du log: {e}")
+                return
+            LOG_FLUSH_LATENCY.observe(time.perf_counter() - start_time)
+
+    def _run(self):
+        """Boucle du thread écrivain : écrit sur seuil de taille ou de temps"""
+        last_compaction = time.monotonic()
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+            try:
+                self.store.rotate()
+            except Exception as e:
+                logger.error(f"Erreur lors de la rotation du log: {e}")
+
+            for callback in self._flush_callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Erreur dans un callback d'écriture du log: {e}")
+
+            if time.monotonic() - last_compaction >= self.compact_interval:
+                last_compaction = time.monotonic()
+                try:
+                    self.store.compact()
+                except Exception as e:
+                    logger.error(f"Erreur lors de la compaction du log: {e}")
+                if self.retention_days:
+                    try:
+                        self.store.apply_retention(datetime.now() - timedelta(days=self.retention_days))
+                    except Exception as e:
+                        logger.error(f"Erreur lors de la purge du log: {e}")
@@ -0,0 +1,279 @@
+# api/prediction_stats.py
+"""
+Statistiques des prédictions maintenues de façon incrémentale
+
+L'agrégat (nombre total, répartition par classe, somme des confiances,
+dernière prédiction) est mis à jour à chaque prédiction enregistrée, ce
+qui rend /prediction-stats indépendant de la taille du log. Il est
+sauvegardé périodiquement dans un snapshot JSON pour survivre aux
+redémarrages, et n'est reconstruit depuis le log que si ce snapshot manque.
+
+Avec plusieurs workers, chaque processus n'écrit que ses propres
+prédictions depuis son démarrage, dans son fichier
+(prediction_stats.<pid>.json). Au chargement, ces fichiers s'ajoutent au
+snapshot de base ; ceux des processus terminés y sont fusionnés puis
+supprimés (sous verrou de fichier).
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .storage import LOG_COLUMNS, PredictionStore
+
+logger = logging.getLogger(__name__)
+
+
+class RunningPredictionStats:
+    """Agrégat courant des prédictions"""
+
+    def __init__(self, snapshot_path: str, snapshot_interval: float = 10.0):
+        """
+        Args:
+            snapshot_path: Fichier JSON du snapshot
+            snapshot_interval: Délai minimal (en secondes) entre deux snapshots
+        """
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.total = 0
+        self.class_counts = {}
+        self.confidence_sum = 0.0
+        self.last_prediction = None
+        # État chargé au démarrage : le fichier du worker ne contient que la différence
+        self._base = self._empty_state()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_snapshot = 0.0
+
+    # ========== MISE À JOUR ==========
+    def update(self, records):
+        """Ajoute des prédictions (tuples dans l'ordre de LOG_COLUMNS)"""
+        with self._lock:
+            for record in records:
+                class_name = str(record[6])
+                self.total += 1
+                self.class_counts[class_name] = self.class_counts.get(class_name, 0) + 1
+                self.confidence_sum += float(record[7])
+            if records:
+                self.last_prediction = self._record_to_dict(records[-1])
+            self._dirty = True
+
+    @staticmethod
+    def _record_to_dict(record) -> dict:
+        last = dict(zip(LOG_COLUMNS, record))
+        if isinstance(last['timestamp'], datetime):
+            last['timestamp'] = last['timestamp'].isoformat(sep=' ', timespec='microseconds')
+        else:
+            last['timestamp'] = str(last['timestamp'])
+        last['prediction'] = str(last['prediction'])
+        for column in ('sepal_length', 'sepal_width', 'petal_length', 'petal_width', 'confidence'):
+            last[column] = float(last[column])
+        return last
+
+    def summary(self) -> dict:
+        """Champs de PredictionStatsResponse"""
+        with self._lock:
+            return {
+                "total_predictions": self.total,
+                "class_distribution": dict(self.class_counts),
+                "average_confidence": self.confidence_sum / self.total if self.total else 0.0,
+                "last_prediction": dict(self.last_prediction) if self.last_prediction else None,
+            }
+
+    @classmethod
+    def window_summary(cls, source, since) -> dict:
+        """
+        Champs de PredictionStatsResponse depuis une date
+
+        Args:
+            source: PredictionStore (requête indexée en SQLite, lecture de la
+                fin du fichier en CSV) ou PredictionRollups (agrégats par
+                heure et par minute, puis prédictions pas encore agrégées)
+            since: Début de la période
+        """
+        aggregate = source.aggregate(since=since)
+        total = aggregate["total"]
+        last = aggregate["last_prediction"]
+        return {
+            "total_predictions": total,
+            "class_distribution": aggregate["class_counts"],
+            "average_confidence": aggregate["confidence_sum"] / total if total else 0.0,
+            "last_prediction": cls._record_to_dict(last) if last is not None else None,
+        }
+
+    # ========== SNAPSHOT ==========
+    @staticmethod
+    def _empty_state() -> dict:
+        return {"total": 0, "class_counts": {}, "confidence_sum": 0.0, "last_prediction": None}
+
+    @staticmethod
+    def _merge(state: dict, other: dict) -> dict:
+        """Somme de deux états (la dernière prédiction est la plus récente des deux)"""
+        class_counts = dict(state["class_counts"])
+        for class_name, count in other["class_counts"].items():
+            class_counts[class_name] = class_counts.get(class_name, 0) + int(count)
+        last_prediction = state["last_prediction"]
+        if other.get("last_prediction") and (
+            last_prediction is None or other["last_prediction"]["timestamp"] >= last_prediction["timestamp"]
+        ):
+            last_prediction = other["last_prediction"]
+        return {
+            "total": state["total"] + int(other["total"]),
+            "class_counts": class_counts,
+            "confidence_sum": state["confidence_sum"] + float(other["confidence_sum"]),
+            "last_prediction": last_prediction,
+        }
+
+    def _worker_path(self, pid: int) -> Path:
+        path = Path(self.snapshot_path)
+        return path.with_name(f"{path.stem}.{pid}{path.suffix}")
+
+    def _worker_files(self) -> dict:
+        """{pid: fichier} des snapshots de workers"""
+        path = Path(self.snapshot_path)
+        files = {}
+        for worker_file in path.parent.glob(f"{path.stem}.*{path.suffix}"):
+            pid = worker_file.name[len(path.stem) + 1:-len(path.suffix) or None]
+            if pid.isdigit():
+                files[int(pid)] = worker_file
+        return files
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def _read_state(path) -> dict:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        return {
+            "total": int(state["total"]),
+            "class_counts": {k: int(v) for k, v in state["class_counts"].items()},
+            "confidence_sum": float(state["confidence_sum"]),
+            "last_prediction": state.get("last_prediction"),
+        }
+
+    @staticmethod
+    def _write_state(path, state: dict):
+        """Écriture atomique (fichier temporaire propre au processus)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _locked(self):
+        """Verrou de fichier partagé par les workers (fusion des snapshots)"""
+        lock_file = open(f"{self.snapshot_path}.lock", 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def save_snapshot(self):
+        """Écrit de façon atomique les prédictions de ce worker depuis son démarrage"""
+        with self._lock:
+            base = self._base
+            class_counts = {
+                class_name: count - base["class_counts"].get(class_name, 0)
+                for class_name, count in self.class_counts.items()
+                if count != base["class_counts"].get(class_name, 0)
+            }
+            state = {
+                "total": self.total - base["total"],
+                "class_counts": class_counts,
+                "confidence_sum": self.confidence_sum - base["confidence_sum"],
+                "last_prediction": self.last_prediction if self.total != base["total"] else None,
+            }
+            self._dirty = False
+
+        self._write_state(self._worker_path(os.getpid()), state)
+        self._last_snapshot = time.monotonic()
+
+    def maybe_save_snapshot(self):
+        """Sauvegarde si l'agrégat a changé et que l'intervalle est écoulé"""
+        if self._dirty and time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+            try:
+                self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Erreur lors de la sauvegarde des statistiques: {e}")
+
+    def _set_state(self, state: dict):
+        with self._lock:
+            self.total = state["total"]
+            self.class_counts = dict(state["class_counts"])
+            self.confidence_sum = state["confidence_sum"]
+            self.last_prediction = state["last_prediction"]
+            self._base = {**state, "class_counts": dict(state["class_counts"])}
+
+    def load_snapshot(self) -> bool:
+        """
+        Recharge le snapshot de base et ceux des workers ; retourne False s'il est absent ou illisible
+
+        Les snapshots des processus terminés sont fusionnés dans la base puis supprimés.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return False
+        with self._locked():
+            try:
+                state = self._read_state(self.snapshot_path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"⚠️ Snapshot des statistiques illisible: {e}")
+                return False
+
+            merged = []
+            live_state = self._empty_state()
+            for pid, worker_file in self._worker_files().items():
+                try:
+                    worker_state = self._read_state(worker_file)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"⚠️ Snapshot du worker {pid} ignoré: {e}")
+                    continue
+                if pid != os.getpid() and self._alive(pid):
+                    live_state = self._merge(live_state, worker_state)
+                else:
+                    state = self._merge(state, worker_state)
+                    merged.append(worker_file)
+            if merged:
+                self._write_state(self.snapshot_path, state)
+                for worker_file in merged:
+                    worker_file.unlink(missing_ok=True)
+
+        self._set_state(self._merge(state, live_state))
+        return True
+
+    def rebuild(self, store: PredictionStore):
+        """Reconstruit l'agrégat à partir de tout le log et l'écrit comme snapshot de base"""
+        aggregate = store.aggregate()
+        last = aggregate["last_prediction"]
+        state = {
+            "total": aggregate["total"],
+            "class_counts": aggregate["class_counts"],
+            "confidence_sum": aggregate["confidence_sum"],
+            "last_prediction": self._record_to_dict(last) if last is not None else None,
+        }
+        with self._locked():
+            self._write_state(self.snapshot_path, state)
+            # Le log contient déjà les prédictions des anciens snapshots de workers
+            for pid, worker_file in self._worker_files().items():
+                if pid == os.getpid() or not self._alive(pid):
+                    worker_file.unlink(missing_ok=True)
+        self._set_state(state)
+
+    @classmethod
+    def load_or_rebuild(cls, snapshot_path: str, store: PredictionStore, **kwargs) -> "RunningPredictionStats":
+        """Charge le snapshot, ou reconstruit depuis le log s'il manque"""
+        stats = cls(snapshot_path, **kwargs)
+        if stats.load_snapshot():
+            logger.info(f"📊 Statistiques rechargées depuis le snapshot ({stats.total} prédictions)")
+        else:
+            stats.rebuild(store)
+            logger.info(f"📊 Statistiques reconstruites depuis le log ({stats.total} prédictions)")
+        return stats
@@ -0,0 +1,257 @@
+# api/reference.py
+"""
+Données de référence du monitoring et leur profil précalculé
+
+La référence est construite depuis data/Iris.csv (colonnes renommées comme
+dans l'API, espèce convertie en classe numérique) et écrite sous deux formes :
+- data/reference_data.csv : les lignes, pour les rapports Evidently
+- data/reference_profile.npz : le profil NumPy utilisé par le drift en
+  streaming (grille de bins et histogramme, quantiles, moyenne, variance,
+  minimum et maximum de chaque colonne, fréquence de chaque classe et
+  histogrammes de chaque colonne par classe)
+
+Le profil contient l'empreinte SHA-256 du CSV dont il est issu. L'API le
+charge une seule fois et ne le recalcule (puis le réécrit) que si le CSV
+change ou si le profil manque. La vérification ne coûte qu'un os.stat tant
+que le fichier ne bouge pas (voir file_digest).
+
+Génération (remplace data/generate_reference_data.py) :
+    python -m api.reference [--source data/Iris.csv] [--output data/reference_data.csv]
+"""
+import argparse
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    FEATURE_COLUMNS, IRIS_CSV_COLUMNS, IRIS_SOURCE_PATH, REFERENCE_DATA_PATH, REFERENCE_PROFILE_PATH
+)
+from .report_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+# Mapping des espèces vers des valeurs numériques
+SPECIES_MAP = {
+    'Iris-setosa': 0,
+    'Iris-versicolor': 1,
+    'Iris-virginica': 2
+}
+
+REFERENCE_COLUMNS = [*FEATURE_COLUMNS, 'prediction', 'prediction_name']
+
+# Version du contenu du .npz : un profil d'une autre version est recalculé
+PROFILE_FORMAT = 2
+
+
+# ========== GÉNÉRATION ==========
+def build_reference(source=IRIS_SOURCE_PATH) -> pd.DataFrame:
+    """Données de référence construites depuis le CSV d'origine (data/Iris.csv)"""
+    df = pd.read_csv(source).rename(columns=IRIS_CSV_COLUMNS)
+    df['prediction'] = df['prediction_name'].map(SPECIES_MAP)
+    return df[REFERENCE_COLUMNS]
+
+
+class ReferenceProfile:
+    """
+    Statistiques de référence de chaque colonne, calculées en une passe vectorisée
+
+    Les tableaux sont indexés par colonne (une ligne par colonne de `columns`) ;
+    l'histogramme a n_bins bins finis plus un bin de débordement de chaque côté.
+    """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+        self.format = int(arrays.get("format", 1))
+        self.columns = [str(c) for c in arrays["columns"]]
+        self.digest = str(arrays["source_sha256"])
+        self.n = int(arrays["n"])
+        self.levels = arrays["levels"]
+        self._index = {column: i for i, column in enumerate(self.columns)}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=FEATURE_COLUMNS, n_bins: int = 100,
+                   n_quantiles: int = 101, digest: str = "") -> "ReferenceProfile":
+        """
+        Args:
+            df: Données de référence
+            columns: Colonnes numériques profilées
+            n_bins: Nombre de bins finis de chaque histogramme
+            n_quantiles: Nombre de niveaux de quantiles (0 à 1)
+            digest: Empreinte du fichier source
+        """
+        X = df[list(columns)].to_numpy(dtype=np.float64)
+        low, high = X.min(axis=0), X.max(axis=0)
+        margin = 0.1 * (high - low)
+        margin[margin == 0] = 1.0
+
+        # Grille fixe par colonne, décalée pour compter tous les bins en un seul bincount
+        edges = np.linspace(low - margin, high + margin, n_bins + 1, axis=1)
+        n_slots = n_bins + 2
+        slots = np.column_stack([np.searchsorted(edges[j], X[:, j], side='right') for j in range(len(columns))])
+        counts = np.bincount(
+            (slots + np.arange(len(columns)) * n_slots).ravel(), minlength=len(columns) * n_slots
+        ).reshape(len(columns), n_slots)
+
+        levels = np.linspace(0.0, 1.0, n_quantiles)
+        arrays = {
+            "format": np.array(PROFILE_FORMAT),
+            "columns": np.array(columns),
+            "source_sha256": np.array(digest),
+            "n": np.array(len(X)),
+            "levels": levels,
+            "edges": edges,
+            "probabilities": counts / len(X),
+            "quantiles": np.quantile(X, levels, axis=0).T,
+            "mean": X.mean(axis=0),
+            "var": X.var(axis=0),
+            "min": low,
+            "max": high,
+        }
+        if "prediction_name" in df:
+            # Histogrammes par classe : un seul bincount sur (classe, colonne, bin)
+            names, labels = np.unique(df["prediction_name"].astype(str).to_numpy(), return_inverse=True)
+            n_classes = len(names)
+            class_counts = np.bincount(
+                ((labels[:, None] * len(columns) + np.arange(len(columns))) * n_slots + slots).ravel(),
+                minlength=n_classes * len(columns) * n_slots
+            ).reshape(n_classes, len(columns), n_slots)
+            class_n = np.bincount(labels, minlength=n_classes)
+            arrays["classes"] = names
+            arrays["class_n"] = class_n
+            arrays["priors"] = class_n / len(X)
+            arrays["class_probabilities"] = class_counts / class_n[:, None, None]
+            # Code numérique de chaque classe (colonne prediction), accepté comme alias
+            if "prediction" in df:
+                codes = df.groupby(labels)["prediction"].first()
+                arrays["class_codes"] = np.array([str(codes[k]) for k in range(n_classes)])
+        return cls(arrays)
+
+    @classmethod
+    def load(cls, path) -> "ReferenceProfile":
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def save(self, path):
+        """Écriture atomique du fichier .npz"""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **self.arrays)
+        os.replace(tmp_path, path)
+
+    def column(self, name: str) -> dict:
+        """edges, probabilities, quantiles, mean, var, min et max d'une colonne"""
+        i = self._index[name]
+        return {
+            key: self.arrays[key][i]
+            for key in ("edges", "probabilities", "quantiles", "mean", "var", "min", "max")
+        }
+
+    @property
+    def classes(self) -> list:
+        """Classes de la référence (prediction_name), dans l'ordre des tableaux par classe"""
+        return [str(c) for c in self.arrays.get("classes", [])]
+
+    @property
+    def class_priors(self) -> dict:
+        """Fréquence de chaque classe (prediction_name) dans la référence"""
+        return {c: float(p) for c, p in zip(self.classes, self.arrays.get("priors", []))}
+
+    def class_probabilities(self, columns) -> np.ndarray:
+        """Histogrammes par classe des colonnes demandées (classes × colonnes × bins)"""
+        return self.arrays["class_probabilities"][:, [self._index[c] for c in columns]]
+
+    def class_index(self) -> dict:
+        """{libellé: indice de classe}, codes numériques de la colonne prediction compris"""
+        index = {name: k for k, name in enumerate(self.classes)}
+        for k, code in enumerate(self.arrays.get("class_codes", [])):
+            index.setdefault(str(code), k)
+        return index
+
+
+def generate_reference(source=IRIS_SOURCE_PATH, output=REFERENCE_DATA_PATH,
+                       profile_path=REFERENCE_PROFILE_PATH) -> pd.DataFrame:
+    """Écrit le CSV de référence et son profil"""
+    df = build_reference(source)
+    df.to_csv(output, index=False)
+    ReferenceProfile.from_frame(df, digest=file_digest(output)).save(profile_path)
+    return df
+
+
+# ========== CHARGEMENT (API) ==========
+# Objets chargés : {chemin du CSV: (empreinte, objet)}
+_frames = {}
+_profiles = {}
+_lock = threading.Lock()
+
+
+def load_reference_data(path=REFERENCE_DATA_PATH) -> pd.DataFrame:
+    """
+    Données de référence, relues seulement si le fichier a changé
+
+    Le DataFrame est partagé entre les appels : ne pas le modifier.
+    """
+    digest = file_digest(path)
+    with _lock:
+        cached = _frames.get(str(path))
+        if cached is None or cached[0] != digest:
+            cached = (digest, pd.read_csv(path))
+            _frames[str(path)] = cached
+        return cached[1]
+
+
+def load_reference_profile(path=REFERENCE_DATA_PATH, profile_path=REFERENCE_PROFILE_PATH) -> ReferenceProfile:
+    """
+    Profil de la référence, recalculé seulement si le CSV a changé
+
+    Le même objet est renvoyé tant que l'empreinte du CSV ne change pas :
+    comparer avec `is` suffit pour détecter un changement de référence.
+    """
+    digest = file_digest(path)
+    with _lock:
+        cached = _profiles.get(str(path))
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+
+    profile = None
+    try:
+        profile = ReferenceProfile.load(profile_path)
+    except (OSError, KeyError, ValueError):
+        pass
+    if profile is None or profile.digest != digest or profile.format != PROFILE_FORMAT:
+        logger.info(f"📐 Calcul du profil de référence ({path})")
+        profile = ReferenceProfile.from_frame(load_reference_data(path), digest=digest)
+        try:
+            profile.save(profile_path)
+        except OSError as e:
+            logger.warning(f"Profil de référence non enregistré ({profile_path}): {e}")
+
+    with _lock:
+        cached = _profiles.get(str(path))
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        _profiles[str(path)] = (digest, profile)
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère les données de référence et leur profil")
+    parser.add_argument("--source", default=IRIS_SOURCE_PATH, help="CSV d'origine (colonnes de data/Iris.csv)")
+    parser.add_argument("--output", default=REFERENCE_DATA_PATH, help="CSV de référence écrit")
+    parser.add_argument("--profile", default=REFERENCE_PROFILE_PATH, help="Profil .npz écrit")
+    args = parser.parse_args(argv)
+
+    df = generate_reference(args.source, args.output, args.profile)
+    print(f"✅ Fichier de référence créé : {args.output}")
+    print(f"✅ Profil de référence créé : {args.profile}")
+    print(f"📊 Nombre de lignes : {len(df)}")
+    print("\n📋 Aperçu :")
+    print(df.head())
+
+
+if __name__ == "__main__":
+    main()
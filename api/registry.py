@@ -0,0 +1,323 @@
+# api/registry.py
+"""
+Registre des modèles servis par l'API
+
+Chaque sous-dossier de models/ contenant <nom>/<nom>.pkl est un modèle
+servable (random_forest_classifier, decision_tree_classifier, ...). Les
+modèles sont chargés à la demande, hors de la boucle asyncio, chacun avec
+son moteur d'inférence et son micro-batcher ; le modèle par défaut est
+chargé dès le démarrage.
+
+- Version : empreinte du fichier du modèle. Une requête choisit un modèle
+  par nom et peut exiger une version précise.
+- Rechargement à chaud : quand l'artefact change sur disque (ou sur
+  demande), la nouvelle version est chargée et vérifiée à côté de
+  l'ancienne, puis substituée en une seule affectation. Les requêtes en
+  cours terminent sur l'ancienne version, libérée une fois inactive.
+- Budget mémoire : au-delà du budget, les modèles inactifs les moins
+  récemment utilisés (hors modèle par défaut) sont déchargés.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from .batching import MicroBatcher
+from .config import FEATURE_COLUMNS, REFERENCE_DATA_PATH
+from .inference import InferenceEngine
+from .reference import load_reference_data
+from .report_cache import file_digest
+from .monitoring_prometheus import MODELS_LOADED, MODEL_MEMORY_BYTES, MODEL_RELOADS
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotFound(Exception):
+    """Levée quand le modèle (ou la version) demandé n'existe pas"""
+
+
+class IncompatibleModel(Exception):
+    """Levée quand un modèle n'attend pas les 4 caractéristiques de l'API"""
+
+
+class LoadedModel:
+    """Une version chargée d'un modèle et son micro-batcher"""
+
+    def __init__(self, name: str, version: str, path: Path, engine: InferenceEngine, size_bytes: int):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.engine = engine
+        self.size_bytes = size_bytes
+        self.batcher = None
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    @property
+    def label(self) -> str:
+        """Nom court du type de modèle, enregistré dans le log (ex: 'randomforest')"""
+        return type(self.engine.model).__name__.replace("Classifier", "").lower()
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "model_type": type(self.engine.model).__name__,
+            "inference_mode": self.engine.mode,
+            "size_bytes": self.size_bytes,
+            "loaded_at": self.loaded_at,
+            "in_flight": self.in_flight,
+        }
+
+
+class ModelRegistry:
+    """Découverte, chargement paresseux et substitution à chaud des modèles"""
+
+    def __init__(self, models_dir: str, default_model: str, mode: str = "sklearn", executor=None,
+                 micro_batching: bool = True, max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                 memory_budget_mb: float = 512.0, mmap_mode: str = None,
+                 reference_data_path: str = REFERENCE_DATA_PATH):
+        """
+        Args:
+            models_dir: Dossier contenant un sous-dossier par modèle
+            default_model: Modèle utilisé quand la requête n'en précise pas
+            mode: Mode d'inférence demandé ("sklearn" ou "compiled")
+            executor: Pool d'inférence (peut être attaché après le chargement du modèle par défaut)
+            micro_batching: Crée un micro-batcher par modèle chargé
+            max_batch_size: Nombre maximal de lignes par micro-lot
+            max_wait_ms: Attente maximale (en ms) avant d'évaluer un micro-lot incomplet
+            memory_budget_mb: Mémoire maximale des modèles chargés
+            mmap_mode: Mode mmap de joblib.load pour les tableaux des artefacts (None = en mémoire)
+            reference_data_path: Données de référence sur lesquelles le mode compilé est vérifié
+        """
+        self.models_dir = Path(models_dir)
+        self.default_model = default_model
+        self.mode = mode
+        self.executor = executor
+        self.micro_batching = micro_batching
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.mmap_mode = mmap_mode
+        self.reference_data_path = reference_data_path
+        self._artifacts = {}
+        self._models = {}
+        self._locks = {}
+        self._retiring = set()
+        self._watch_task = None
+        self._reload_callbacks = []
+
+    def add_reload_callback(self, callback):
+        """Abonne callback(name) à chaque substitution d'une nouvelle version"""
+        self._reload_callbacks.append(callback)
+
+    # ========== DÉCOUVERTE ==========
+    def discover(self) -> dict:
+        """Recherche les modèles disponibles : {nom: chemin de l'artefact}"""
+        artifacts = {}
+        if self.models_dir.is_dir():
+            for directory in sorted(self.models_dir.iterdir()):
+                path = directory / f"{directory.name}.pkl"
+                if path.is_file():
+                    artifacts[directory.name] = path
+        self._artifacts = artifacts
+        return dict(artifacts)
+
+    def available(self) -> list:
+        """Modèles disponibles, avec la version chargée le cas échéant"""
+        self.discover()
+        return [
+            {
+                "name": name,
+                "default": name == self.default_model,
+                "loaded": name in self._models,
+                **(self._models[name].info() if name in self._models else {}),
+            }
+            for name in self._artifacts
+        ]
+
+    @property
+    def default(self) -> LoadedModel:
+        """Version chargée du modèle par défaut (None avant le démarrage)"""
+        return self._models.get(self.default_model)
+
+    # ========== CHARGEMENT ==========
+    def _build(self, name: str, path: Path) -> LoadedModel:
+        """Charge et vérifie un artefact (exécuté hors de la boucle asyncio)"""
+        version = file_digest(path)[:12]
+        model = joblib.load(path, mmap_mode=self.mmap_mode)
+
+        n_features = getattr(model, "n_features_in_", None)
+        if n_features != len(FEATURE_COLUMNS):
+            raise IncompatibleModel(
+                f"Le modèle {name} attend {n_features} caractéristiques au lieu de {len(FEATURE_COLUMNS)}"
+            )
+
+        engine = InferenceEngine(model, mode=self.mode, source=str(path), version=version)
+        if engine.mode == "compiled" and os.path.isfile(self.reference_data_path):
+            reference = load_reference_data(self.reference_data_path)
+            if not engine.verify(reference[FEATURE_COLUMNS].to_numpy(dtype=np.float64)):
+                logger.warning(f"⚠️ Mode compilé divergent pour {name}, retour au mode sklearn")
+                engine = InferenceEngine(model, mode="sklearn", source=str(path), version=version)
+
+        return LoadedModel(name, version, path, engine, os.path.getsize(path))
+
+    async def _start(self, loaded: LoadedModel):
+        if self.micro_batching:
+            engine = loaded.engine
+            loaded.batcher = MicroBatcher(
+                lambda X: self.executor.run(X, engine),
+                max_batch_size=self.max_batch_size,
+                max_wait_ms=self.max_wait_ms
+            )
+            await loaded.batcher.start()
+
+    async def load(self, name: str, force: bool = False) -> LoadedModel:
+        """
+        Charge un modèle, ou le recharge si son artefact a changé
+
+        Le chargement est single-flight par modèle. La nouvelle version ne
+        remplace l'ancienne qu'une fois prête ; en cas d'échec, l'ancienne
+        reste servie.
+        """
+        if name not in self._artifacts:
+            self.discover()
+        if name not in self._artifacts:
+            raise ModelNotFound(f"Modèle inconnu: {name}")
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            path = self._artifacts[name]
+            current = self._models.get(name)
+            if current is not None and not force and file_digest(path)[:12] == current.version:
+                return current
+
+            try:
+                loaded = await asyncio.to_thread(self._build, name, path)
+                await self._start(loaded)
+            except Exception:
+                MODEL_RELOADS.labels(model_name=name, status="error").inc()
+                raise
+
+            # Substitution atomique : les nouvelles requêtes voient la nouvelle version
+            self._models[name] = loaded
+            MODEL_RELOADS.labels(model_name=name, status="success").inc()
+            if current is not None:
+                logger.info(f"🔁 Modèle {name} substitué: {current.version} -> {loaded.version}")
+                self._retire(current)
+                for callback in self._reload_callbacks:
+                    try:
+                        callback(name)
+                    except Exception as e:
+                        logger.error(f"Erreur dans un callback de rechargement: {e}")
+            else:
+                logger.info(f"✅ Modèle {name} chargé (version {loaded.version})")
+
+            self._enforce_budget(keep=loaded)
+            return loaded
+
+    async def get(self, name: str = None, version: str = None) -> LoadedModel:
+        """
+        Retourne la version servie d'un modèle (chargée si besoin)
+
+        Raises:
+            ModelNotFound: modèle inconnu ou version non disponible
+            IncompatibleModel: modèle non servable par l'API
+        """
+        name = name or self.default_model
+        loaded = self._models.get(name)
+        if loaded is None or (version is not None and version != loaded.version):
+            # Une version différente est peut-être déjà sur disque
+            loaded = await self.load(name)
+        if version is not None and version != loaded.version:
+            raise ModelNotFound(
+                f"Version {version} du modèle {name} non disponible (version servie: {loaded.version})"
+            )
+        return loaded
+
+    @asynccontextmanager
+    async def acquire(self, name: str = None, version: str = None):
+        """Réserve un modèle pour la durée d'une requête (il n'est pas libéré entre-temps)"""
+        loaded = await self.get(name, version)
+        loaded.in_flight += 1
+        loaded.idle.clear()
+        loaded.last_used = time.monotonic()
+        try:
+            yield loaded
+        finally:
+            loaded.in_flight -= 1
+            if loaded.in_flight == 0:
+                loaded.idle.set()
+
+    # ========== DÉCHARGEMENT ==========
+    def _retire(self, loaded: LoadedModel):
+        """Libère une version une fois ses requêtes en cours terminées"""
+        task = asyncio.create_task(self._drain(loaded))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+        self._update_gauges()
+
+    async def _drain(self, loaded: LoadedModel):
+        await loaded.idle.wait()
+        if loaded.batcher is not None:
+            await loaded.batcher.stop()
+        logger.info(f"🗑️ Modèle {loaded.name} (version {loaded.version}) déchargé")
+
+    def _enforce_budget(self, keep: LoadedModel = None):
+        """Décharge les modèles inactifs les moins récemment utilisés au-delà du budget"""
+        total = sum(m.size_bytes for m in self._models.values())
+        for loaded in sorted(self._models.values(), key=lambda m: m.last_used):
+            if total <= self.memory_budget:
+                break
+            if loaded is keep or loaded.name == self.default_model or loaded.in_flight:
+                continue
+            del self._models[loaded.name]
+            total -= loaded.size_bytes
+            self._retire(loaded)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        MODELS_LOADED.set(len(self._models))
+        MODEL_MEMORY_BYTES.set(sum(m.size_bytes for m in self._models.values()))
+
+    # ========== SURVEILLANCE DES ARTEFACTS ==========
+    def start_watching(self, interval: float):
+        """Recharge à chaud les modèles chargés dont l'artefact a changé"""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.discover()
+            for name in list(self._models):
+                if name not in self._artifacts:
+                    continue
+                try:
+                    await self.load(name)
+                except Exception as e:
+                    logger.error(f"Erreur lors du rechargement du modèle {name}: {e}")
+
+    async def stop(self):
+        """Arrête la surveillance et décharge tous les modèles"""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+        models, self._models = list(self._models.values()), {}
+        for loaded in models:
+            self._retire(loaded)
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
@@ -0,0 +1,181 @@
+# api/report_cache.py
+"""
+Cache des rapports HTML Evidently
+
+Un rapport n'est régénéré que si les données changent : la clé combine
+l'empreinte du fichier de référence, la fenêtre des données courantes et
+leur version (position de fin du log ou dernière partition ; période pour
+une fenêtre en temps, voir WindowSpec.cache_key). La génération est
+"single-flight" par type de rapport : des lecteurs simultanés attendent
+le même calcul au lieu de le relancer. Chaque version est écrite dans un
+fichier distinct (écriture atomique), si bien que deux lecteurs ne se
+disputent jamais le même fichier. La clé sert aussi d'ETag HTTP.
+
+Le cache garde au plus max_entries rapports (un par type et par fenêtre,
+fenêtres ad hoc comprises) : au-delà, le moins récemment servi est retiré
+et ses fichiers supprimés.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from datetime import datetime
+
+from .storage import PredictionStore
+from .windows import WindowSpec, default_window
+
+logger = logging.getLogger(__name__)
+
+
+# Empreintes déjà calculées : {chemin: ((taille, mtime), empreinte)}
+_digests = {}
+
+
+def file_digest(path: Path) -> str:
+    """Empreinte SHA-256 d'un fichier, recalculée seulement s'il a changé"""
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _digests.get(str(path))
+    if cached is None or cached[0] != signature:
+        with open(path, 'rb') as f:
+            cached = (signature, hashlib.sha256(f.read()).hexdigest())
+        _digests[str(path)] = cached
+    return cached[1]
+
+
+class ReportCache:
+    """Rapports HTML mis en cache par version des données"""
+
+    def __init__(self, reports_dir: Path, reference_path: Path, store: PredictionStore, generators: dict,
+                 max_entries: int = 32):
+        """
+        Args:
+            reports_dir: Dossier des rapports générés
+            reference_path: Fichier des données de référence
+            store: Stockage du log des prédictions (fournit la version courante)
+            generators: {type de rapport: fonction(report_path, window) -> chemin}
+            max_entries: Nombre maximal de rapports en cache (type, fenêtre)
+        """
+        self.reports_dir = Path(reports_dir)
+        self.reference_path = Path(reference_path)
+        self.store = store
+        self.generators = generators
+        self.max_entries = max_entries
+        # {(type, fenêtre): (clé, chemin)}, du moins au plus récemment servi
+        self._entries = OrderedDict()
+        self._retired = {}
+        self._entries_lock = threading.Lock()
+        self._locks = {kind: threading.Lock() for kind in generators}
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def key(self, kind: str, window: WindowSpec = None) -> str:
+        """Clé (et ETag) du rapport pour les données actuelles de la fenêtre"""
+        window = window or default_window()
+        data_key = window.cache_key(self.store.version(), datetime.now())
+        raw = f"{kind}:{file_digest(self.reference_path)}:{data_key}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def cached(self, entry_key: tuple, key: str):
+        """Chemin du rapport en cache pour cette clé, ou None"""
+        with self._entries_lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+        if entry is not None and entry[0] == key and entry[1].exists():
+            return entry[1]
+        return None
+
+    def _store(self, entry_key: tuple, key: str, path: Path):
+        """Enregistre un nouveau rapport et retire les plus anciens au-delà de max_entries"""
+        obsolete = []
+        with self._entries_lock:
+            # La version précédente est conservée pour les lecteurs en cours ;
+            # seule l'avant-dernière est supprimée
+            previous = self._entries.get(entry_key)
+            self._entries[entry_key] = (key, path)
+            self._entries.move_to_end(entry_key)
+            if previous is not None and previous[1] != path:
+                retired = self._retired.get(entry_key)
+                if retired is not None and retired != path:
+                    obsolete.append(retired)
+                self._retired[entry_key] = previous[1]
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, (_, evicted_path) = self._entries.popitem(last=False)
+                obsolete.append(evicted_path)
+                retired = self._retired.pop(evicted_key, None)
+                if retired is not None:
+                    obsolete.append(retired)
+        for obsolete_path in obsolete:
+            obsolete_path.unlink(missing_ok=True)
+
+    def get(self, kind: str, window: WindowSpec = None):
+        """
+        Retourne le rapport à jour (le génère si nécessaire)
+
+        Args:
+            kind: Type de rapport
+            window: Fenêtre des données courantes (DEFAULT_MONITORING_WINDOW par défaut)
+
+        Returns:
+            (etag, chemin du fichier HTML)
+        """
+        window = window or default_window()
+        # Un rapport en cache par type et par fenêtre
+        entry_key = (kind, window.name)
+        key = self.key(kind, window)
+        path = self.cached(entry_key, key)
+        if path is not None:
+            return key, path
+
+        with self._locks[kind]:
+            # Un autre lecteur a pu générer le rapport pendant l'attente
+            key = self.key(kind, window)
+            path = self.cached(entry_key, key)
+            if path is not None:
+                return key, path
+
+            self.reports_dir.mkdir(exist_ok=True)
+            path = self.reports_dir / f"{kind}-{key}.html"
+            tmp_path = self.reports_dir / f".{kind}-{key}.{os.getpid()}.html.tmp"
+            try:
+                self.generators[kind](tmp_path, window)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            os.replace(tmp_path, path)
+            self._store(entry_key, key, path)
+            return key, path
+
+    def prerender(self):
+        """Génère à l'avance tous les rapports dont les données ont changé"""
+        for kind in self.generators:
+            try:
+                self.get(kind)
+            except Exception as e:
+                logger.error(f"Erreur lors du pré-rendu du rapport {kind}: {e}")
+
+    def start_prerender(self, interval: float):
+        """Démarre un thread qui pré-rend les rapports toutes les `interval` secondes"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+
+        def run():
+            while not self._stopping.is_set():
+                self.prerender()
+                self._stopping.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="report-prerender", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread de pré-rendu"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
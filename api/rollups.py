@@ -0,0 +1,270 @@
+# api/rollups.py
+"""
+Agrégats de l'historique des prédictions (par minute et par heure)
+
+Les prédictions brutes ne sont gardées que LOG_RETENTION_DAYS jours ; pour
+les statistiques sur de longues périodes et les tableaux de bord, chaque
+minute et chaque heure est résumée dans une base SQLite séparée
+(logfiles/rollups.sqlite) : nombre de prédictions, répartition des
+classes, confiance moyenne, moyenne et quantiles (p05, p50, p95) de chaque
+caractéristique.
+
+La mise à jour est appelée par le thread écrivain du log après chaque
+écriture (au plus toutes les `interval` secondes). Elle relit les
+prédictions brutes depuis le début de l'heure de la dernière minute
+agrégée et remplace les périodes concernées : l'opération est idempotente,
+plusieurs workers peuvent donc la lancer sans se coordonner. Seules les
+minutes terminées depuis plus de `delay` secondes sont agrégées, pour
+laisser aux autres workers le temps d'écrire leurs buffers.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from .config import FEATURE_COLUMNS
+from .storage import LOG_COLUMNS, PredictionStore
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {"minute": "min", "hour": "h"}
+QUANTILES = {"p05": 0.05, "p50": 0.5, "p95": 0.95}
+
+# Colonnes statistiques de chaque caractéristique (ex: petal_length_p95)
+FEATURE_STAT_COLUMNS = [
+    f"{feature}_{stat}" for feature in FEATURE_COLUMNS for stat in ("mean", *QUANTILES)
+]
+ROLLUP_COLUMNS = [
+    "granularity", "period_start", "count", "confidence_sum",
+    "class_counts", "name_counts", *FEATURE_STAT_COLUMNS
+]
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class PredictionRollups:
+    """Agrégats par minute et par heure, stockés dans une base SQLite"""
+
+    def __init__(self, path: str, store: PredictionStore, interval: float = 60.0, delay: float = 10.0,
+                 minute_retention_days: float = 7, hour_retention_days: float = 365):
+        """
+        Args:
+            path: Fichier de la base des agrégats
+            store: Stockage des prédictions brutes
+            interval: Délai minimal (en secondes) entre deux mises à jour
+            delay: Ancienneté minimale (en secondes) d'une minute terminée avant d'être agrégée
+            minute_retention_days: Conservation des agrégats par minute (0 = tout garder)
+            hour_retention_days: Conservation des agrégats par heure (0 = tout garder)
+        """
+        self.path = path
+        self.store = store
+        self.interval = interval
+        self.delay = delay
+        self.retention = {"minute": minute_retention_days, "hour": hour_retention_days}
+        self._local = threading.local()
+        self._last_update = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def initialize(self):
+        """Crée la base si besoin"""
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            feature_columns = ", ".join(f"{column} REAL" for column in FEATURE_STAT_COLUMNS)
+            connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS rollups (
+                    granularity TEXT NOT NULL,
+                    period_start TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    confidence_sum REAL NOT NULL,
+                    class_counts TEXT NOT NULL,
+                    name_counts TEXT NOT NULL,
+                    {feature_columns},
+                    PRIMARY KEY (granularity, period_start)
+                ) WITHOUT ROWID
+            """)
+
+    # ========== MISE À JOUR ==========
+    def _last_period(self, granularity: str):
+        row = self._connection().execute(
+            "SELECT MAX(period_start) FROM rollups WHERE granularity = ?", (granularity,)
+        ).fetchone()
+        return datetime.strptime(row[0], TIME_FORMAT) if row[0] else None
+
+    @staticmethod
+    def _summarize(df: pd.DataFrame, granularity: str) -> list:
+        """Une ligne de ROLLUP_COLUMNS par période présente dans df"""
+        periods = df["timestamp"].dt.floor(GRANULARITIES[granularity])
+        grouped = df.groupby(periods)
+        features = grouped[FEATURE_COLUMNS]
+        means = features.mean()
+        quantiles = {name: features.quantile(q) for name, q in QUANTILES.items()}
+        counts = grouped.size()
+        confidence_sums = grouped["confidence"].sum()
+        class_counts = df.groupby([periods, df["prediction"].astype(str)]).size()
+        name_counts = df.groupby([periods, df["prediction_name"].astype(str)]).size()
+
+        rows = []
+        for period in counts.index:
+            feature_stats = []
+            for feature in FEATURE_COLUMNS:
+                feature_stats.append(float(means.at[period, feature]))
+                feature_stats.extend(float(quantiles[name].at[period, feature]) for name in QUANTILES)
+            rows.append((
+                granularity,
+                period.strftime(TIME_FORMAT),
+                int(counts[period]),
+                float(confidence_sums[period]),
+                json.dumps({str(k): int(v) for k, v in class_counts[period].items()}),
+                json.dumps({str(k): int(v) for k, v in name_counts[period].items()}),
+                *feature_stats,
+            ))
+        return rows
+
+    def update(self) -> int:
+        """
+        Agrège les minutes terminées (et leurs heures) depuis la dernière mise à jour
+
+        Returns:
+            Nombre de périodes écrites
+        """
+        until = (datetime.now() - timedelta(seconds=self.delay)).replace(second=0, microsecond=0)
+        last_minute = self._last_period("minute")
+        # Heure de la dernière minute agrégée relue en entier : quantiles horaires exacts
+        since = last_minute.replace(minute=0) if last_minute is not None else None
+        if since is not None and since >= until:
+            return 0
+
+        df = self.store.read(
+            columns=["timestamp", *FEATURE_COLUMNS, "prediction", "prediction_name", "confidence"],
+            since=since,
+            until=until
+        )
+        if df.empty:
+            return 0
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+
+        rows = self._summarize(df, "minute") + self._summarize(df, "hour")
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO rollups ({', '.join(ROLLUP_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(ROLLUP_COLUMNS))})",
+                rows
+            )
+        self._prune()
+        return len(rows)
+
+    def maybe_update(self):
+        """Met à jour si l'intervalle est écoulé (callback du thread écrivain du log)"""
+        if time.monotonic() - self._last_update < self.interval:
+            return
+        self._last_update = time.monotonic()
+        try:
+            written = self.update()
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour des agrégats: {e}")
+            return
+        if written:
+            logger.debug(f"{written} période(s) agrégée(s)")
+
+    def _prune(self):
+        """Supprime les agrégats au-delà de leur durée de conservation"""
+        connection = self._connection()
+        with connection:
+            for granularity, days in self.retention.items():
+                if days:
+                    cutoff = datetime.now() - timedelta(days=days)
+                    connection.execute(
+                        "DELETE FROM rollups WHERE granularity = ? AND period_start < ?",
+                        (granularity, cutoff.strftime(TIME_FORMAT))
+                    )
+
+    # ========== LECTURE ==========
+    def history(self, granularity: str, since: datetime, until: datetime = None) -> list:
+        """Agrégats d'une plage de temps, du plus ancien au plus récent"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularité inconnue: {granularity}")
+        until = until or datetime.now()
+        cursor = self._connection().execute(
+            f"SELECT {', '.join(ROLLUP_COLUMNS[1:])} FROM rollups "
+            f"WHERE granularity = ? AND period_start >= ? AND period_start < ? ORDER BY period_start",
+            (granularity, since.strftime(TIME_FORMAT), until.strftime(TIME_FORMAT))
+        )
+        history = []
+        for row in cursor:
+            entry = dict(zip(ROLLUP_COLUMNS[1:], row))
+            entry["class_counts"] = json.loads(entry["class_counts"])
+            entry["name_counts"] = json.loads(entry["name_counts"])
+            entry["confidence_mean"] = entry["confidence_sum"] / entry["count"]
+            history.append(entry)
+        return history
+
+    def _sum(self, granularity: str, since: datetime, until: datetime) -> dict:
+        """Somme des agrégats d'une granularité sur [since, until)"""
+        connection = self._connection()
+        params = (granularity, since.strftime(TIME_FORMAT), until.strftime(TIME_FORMAT))
+        where = "WHERE granularity = ? AND period_start >= ? AND period_start < ?"
+        total, confidence_sum = connection.execute(
+            f"SELECT COALESCE(SUM(count), 0), COALESCE(SUM(confidence_sum), 0) FROM rollups {where}", params
+        ).fetchone()
+        name_counts = dict(connection.execute(
+            f"SELECT key, SUM(value) FROM rollups, json_each(rollups.name_counts) {where} GROUP BY key", params
+        ).fetchall())
+        return {"total": total, "confidence_sum": confidence_sum, "class_counts": name_counts}
+
+    def aggregate(self, since: datetime) -> dict:
+        """
+        Même résultat que PredictionStore.aggregate(since), à la minute près
+
+        Les heures complètes viennent des agrégats horaires, les minutes en
+        bordure des agrégats par minute, et seules les prédictions pas encore
+        agrégées sont lues dans le stockage brut.
+        """
+        since = since.replace(second=0, microsecond=0)
+        last_minute = self._last_period("minute")
+        if last_minute is None or last_minute < since:
+            return self.store.aggregate(since=since)
+        rolled_until = last_minute + timedelta(minutes=1)
+
+        first_hour = since if since.minute == 0 else since.replace(minute=0) + timedelta(hours=1)
+        last_hour = rolled_until.replace(minute=0)
+        if first_hour < last_hour:
+            parts = [
+                self._sum("minute", since, first_hour),
+                self._sum("hour", first_hour, last_hour),
+                self._sum("minute", last_hour, rolled_until),
+            ]
+        else:
+            parts = [self._sum("minute", since, rolled_until)]
+        recent = self.store.aggregate(since=rolled_until)
+        parts.append(recent)
+
+        last_prediction = recent["last_prediction"]
+        if last_prediction is None:
+            # Rien de neuf depuis la dernière minute agrégée : dernière ligne du log
+            last = self.store.read(limit=1)
+            if len(last) and pd.Timestamp(last["timestamp"].iloc[-1]) >= since:
+                last_prediction = tuple(last.iloc[-1][LOG_COLUMNS])
+
+        class_counts = {}
+        for part in parts:
+            for name, count in part["class_counts"].items():
+                class_counts[name] = class_counts.get(name, 0) + int(count)
+        return {
+            "total": sum(int(part["total"]) for part in parts),
+            "class_counts": class_counts,
+            "confidence_sum": sum(float(part["confidence_sum"]) for part in parts),
+            "last_prediction": last_prediction,
+        }
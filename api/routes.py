@@ -1,21 +1,36 @@
 # api/routes.py
-from fastapi import APIRouter, HTTPException
-import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import joblib
 import logging
-import os
+import random
+from typing import Optional
 from .schema import (
     IrisFeatures, PredictionResponse, ModelInfoResponse, 
-    HealthResponse, PredictionStatsResponse, SampleDataResponse
+    HealthResponse, PredictionStatsResponse, SampleDataResponse,
+    BatchPredictionRequest, BatchPredictionResponse
 )
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pathlib import Path
-from .monitoring_evidently import (
-    generate_data_drift_report,
-    generate_data_summary_report,
-    update_prometheus_drift_metrics
+from .codecs import (
+    request_format, response_format, decode_features, decode_batch,
+    prediction_payload, encode, encode_probabilities, openapi_request_body,
+    UnsupportedMediaType, InvalidPayload
+)
+from .stream_scoring import ChunkReader, score_stream, spool_body, iter_spool, stream_format, NDJSON
+from .monitoring_prometheus import record_batch_predictions, StageTimer, REQUEST_START_KEY
+from .executor import ExecutorSaturated
+from .registry import ModelNotFound, IncompatibleModel
+from .prediction_stats import RunningPredictionStats
+from .storage import get_prediction_store
+from .windows import EmptyWindow, InvalidWindow, WindowSpec, default_window, get_windows, resolve_window
+from .config import (
+    DRIFT_METRICS_SOURCE, SERVER_TIMING_SAMPLE_RATE, STREAM_CHUNK_SIZE, STREAM_SPOOL_MEMORY_MB,
+    PREDICTION_CACHE_MAX_BATCH
 )
 
 logger = logging.getLogger(__name__)
@@ -29,71 +44,313 @@ model_metadata = {}
 model_scaler_X = None
 model_scaler_y = None
 PREDICTIONS_LOG = None
+model_registry = None
+inference_executor = None
+prediction_cache = None
+prediction_logger = None
+running_stats = None
+drift_engine = None
+drift_scheduler = None
+report_cache = None
+prediction_rollups = None
 
-@router.post("/predict", response_model=PredictionResponse)
-async def predict(features: IrisFeatures):
+@router.post(
+    "/predict",
+    response_model=PredictionResponse,
+    openapi_extra=openapi_request_body(IrisFeatures)
+)
+async def predict(
+    request: Request,
+    response: Response,
+    model_name: Optional[str] = Query(None, alias="model", description="Modèle à utiliser (défaut: DEFAULT_MODEL)"),
+    model_version: Optional[str] = Query(None, alias="version", description="Version exigée du modèle"),
+    lean: bool = Query(False, description="Réponse JSON construite sans PredictionResponse (même contenu)")
+):
     """
     Effectue une prédiction sur les caractéristiques d'une fleur Iris
-    """
 
+    Corps JSON, msgpack ou float32 binaire (voir api/codecs.py) ; le format
+    de la réponse suit l'en-tête Accept, sinon celui de la requête.
+    """
+    # Durée de chaque étape (la validation inclut la lecture et le parsing du corps)
+    timer = StageTimer("/predict", request.scope.get(REQUEST_START_KEY))
+    row, response_fmt = await _decode_body(request, decode_features, lean)
+    timer.mark("validation")
        
-    if model is None:
+    if model_registry is None:
         raise HTTPException(status_code=500, detail="Modèle non chargé")
     
     try:
-        # Préparation des données
-        input_data = pd.DataFrame([[
-            features.sepal_length,
-            features.sepal_width,
-            features.petal_length,
-            features.petal_width
-        ]])
+        # Le modèle reste réservé jusqu'à la fin de la requête (même en cas de rechargement)
+        async with model_registry.acquire(model_name, model_version) as loaded:
+            # Entrée déjà vue : pas d'évaluation de la forêt
+            probabilities = None
+            if prediction_cache is not None:
+                probabilities = prediction_cache.get(loaded.name, loaded.version, row)
+            timer.mark("cache")
 
-        
-        
-        # Prédiction
-        prediction = model.predict(input_data)[0]
-        
-        probabilities = model.predict_proba(input_data)[0]
-        confidence = np.max(probabilities)
-        prediction_name = 'randomforest'
+            if probabilities is None:
+                if loaded.batcher is not None:
+                    # Regroupement avec les requêtes concurrentes (un seul predict_proba)
+                    probabilities = await loaded.batcher.submit(row)
+                else:
+                    # Prédiction dans le pool d'inférence (hors boucle asyncio)
+                    probabilities = (await inference_executor.run(np.array([row]), loaded.engine))[0]
+
+                if prediction_cache is not None:
+                    prediction_cache.put(loaded.name, loaded.version, row, probabilities)
+                timer.mark("inference")
+
+        prediction, confidence = loaded.engine.decide(probabilities)
+        prediction_name = loaded.label
+        timer.mark("decide")
         
         # Enregistrement de logfiles
-        await log_prediction(features, prediction, prediction_name, confidence)
+        await log_prediction(row, prediction, prediction_name, confidence)
+        timer.mark("log")
         
-        return PredictionResponse(
-            prediction=str(prediction),
-            prediction_name=prediction_name,
-            probabilities=[float(p) for p in probabilities],
-            confidence=float(confidence),
-            model_version="1.0.0"
-        )
+        if response_fmt == "binary":
+            result = encode_probabilities(probabilities, loaded.engine.classes_, loaded.name, loaded.version)
+        elif response_fmt != "model":
+            result = encode(prediction_payload(
+                prediction, prediction_name, probabilities, confidence, loaded.version, loaded.name
+            ), response_fmt)
+        else:
+            result = PredictionResponse(
+                prediction=str(prediction),
+                prediction_name=prediction_name,
+                probabilities=[float(p) for p in probabilities],
+                confidence=float(confidence),
+                model_version=loaded.version,
+                model_name=loaded.name
+            )
+        timer.mark("response")
+
+        timer.observe()
+        if SERVER_TIMING_SAMPLE_RATE and random.random() < SERVER_TIMING_SAMPLE_RATE:
+            # Une réponse déjà encodée ne reprend pas les en-têtes de `response`
+            (result if isinstance(result, Response) else response).headers["Server-Timing"] = timer.server_timing()
+        return result
         
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IncompatibleModel as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de la prédiction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def log_prediction(features: IrisFeatures, prediction: int, prediction_name: str, confidence: float):
+@router.post(
+    "/predict/batch",
+    response_model=BatchPredictionResponse,
+    openapi_extra=openapi_request_body(BatchPredictionRequest)
+)
+async def predict_batch(
+    request: Request,
+    response: Response,
+    model_name: Optional[str] = Query(None, alias="model", description="Modèle à utiliser (défaut: DEFAULT_MODEL)"),
+    model_version: Optional[str] = Query(None, alias="version", description="Version exigée du modèle"),
+    lean: bool = Query(False, description="Réponse JSON construite sans PredictionResponse (même contenu)")
+):
+    """
+    Effectue les prédictions d'un lot de fleurs en un seul passage du modèle
+
+    Corps JSON, msgpack ou float32 binaire N×4 (voir api/codecs.py) ; le
+    format de la réponse suit l'en-tête Accept, sinon celui de la requête.
+    """
+    timer = StageTimer("/predict/batch", request.scope.get(REQUEST_START_KEY))
+    # Un seul tableau et un seul predict_proba pour tout le lot
+    X, response_fmt = await _decode_body(request, decode_batch, lean)
+    timer.mark("validation")
+
+    if model_registry is None:
+        raise HTTPException(status_code=500, detail="Modèle non chargé")
+
+    try:
+        async with model_registry.acquire(model_name, model_version) as loaded:
+            if prediction_cache is None or len(X) > PREDICTION_CACHE_MAX_BATCH:
+                # Gros lot : pas de consultation ligne par ligne sur la boucle asyncio
+                probabilities = await inference_executor.run(X, loaded.engine)
+            else:
+                # Seules les lignes absentes du cache sont évaluées
+                cached, missing = prediction_cache.get_many(loaded.name, loaded.version, X)
+                if missing:
+                    computed = await inference_executor.run(X[missing], loaded.engine)
+                    prediction_cache.put_many(loaded.name, loaded.version, X[missing], computed)
+                    for i, row_probabilities in zip(missing, computed):
+                        cached[i] = row_probabilities
+                probabilities = np.array(cached)
+        timer.mark("inference")
+
+        # La classe prédite est déduite des probabilités (pas de second passage)
+        predictions, confidences = loaded.engine.decide(probabilities)
+        prediction_name = loaded.label
+        timer.mark("decide")
+
+        # Enregistrement de logfiles et métriques en une seule fois
+        await log_predictions_batch(X, predictions, prediction_name, confidences)
+        record_batch_predictions(predictions, confidences)
+        timer.mark("log")
+
+        if response_fmt == "binary":
+            result = encode_probabilities(probabilities, loaded.engine.classes_, loaded.name, loaded.version)
+        elif response_fmt != "model":
+            result = encode({
+                "predictions": [
+                    prediction_payload(
+                        prediction, prediction_name, row, confidence, loaded.version, loaded.name
+                    )
+                    for prediction, row, confidence in zip(predictions, probabilities, confidences)
+                ],
+                "count": len(predictions)
+            }, response_fmt)
+        else:
+            result = BatchPredictionResponse(
+                predictions=[
+                    PredictionResponse(
+                        prediction=str(prediction),
+                        prediction_name=prediction_name,
+                        probabilities=row.tolist(),
+                        confidence=float(confidence),
+                        model_version=loaded.version,
+                        model_name=loaded.name
+                    )
+                    for prediction, row, confidence in zip(predictions, probabilities, confidences)
+                ],
+                count=len(predictions)
+            )
+        timer.mark("response")
+
+        timer.observe()
+        if SERVER_TIMING_SAMPLE_RATE and random.random() < SERVER_TIMING_SAMPLE_RATE:
+            (result if isinstance(result, Response) else response).headers["Server-Timing"] = timer.server_timing()
+        return result
+
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IncompatibleModel as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la prédiction batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post(
+    "/predict/stream",
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "text/csv": {"schema": {"type": "string", "format": "binary"}},
+                NDJSON: {"schema": {"type": "string", "format": "binary"}},
+            }
+        }
+    }
+)
+async def predict_stream(
+    request: Request,
+    model_name: Optional[str] = Query(None, alias="model", description="Modèle à utiliser (défaut: DEFAULT_MODEL)"),
+    model_version: Optional[str] = Query(None, alias="version", description="Version exigée du modèle")
+):
+    """
+    Évalue un gros fichier CSV ou NDJSON envoyé en flux
+
+    Colonnes de data/Iris.csv ou de l'API ; le fichier est évalué par blocs
+    de STREAM_CHUNK_SIZE lignes et les résultats sont renvoyés en NDJSON
+    pendant la lecture (voir api/stream_scoring.py).
+    """
+    if model_registry is None:
+        raise HTTPException(status_code=500, detail="Modèle non chargé")
+
+    # Erreurs de format et de modèle signalées avant le début de la réponse
+    try:
+        body_format = stream_format(request.headers.get("content-type"))
+        loaded = await model_registry.get(model_name, model_version)
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IncompatibleModel as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Corps entièrement reçu avant la réponse : après son début, les messages
+    # de la requête sont consommés par la détection de déconnexion de Starlette
+    spool = await spool_body(request.stream(), int(STREAM_SPOOL_MEMORY_MB * 1024 * 1024))
+    try:
+        reader = ChunkReader(iter_spool(spool), body_format, STREAM_CHUNK_SIZE)
+        await reader.read_header()
+    except InvalidPayload as e:
+        spool.close()
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async def results():
+        try:
+            # Modèle réservé jusqu'à la fin du flux
+            async with model_registry.acquire(loaded.name, model_version) as reserved:
+                async for data in score_stream(reader, reserved, inference_executor):
+                    yield data
+        finally:
+            spool.close()
+
+    return StreamingResponse(
+        results(),
+        media_type=NDJSON,
+        headers={"X-Model-Name": loaded.name, "X-Model-Version": loaded.version}
+    )
+
+async def _decode_body(request: Request, decode, lean: bool):
+    """
+    Lit et décode le corps selon son Content-Type
+
+    Returns:
+        (caractéristiques décodées, format de la réponse)
+    """
+    try:
+        body_format = request_format(request.headers.get("content-type"))
+        return decode(await request.body(), body_format), response_format(
+            request.headers.get("accept"), body_format, lean
+        )
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except InvalidPayload as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValidationError as e:
+        # Même réponse 422 que la validation automatique de FastAPI
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+
+async def log_prediction(row: list, prediction: int, prediction_name: str, confidence: float):
     """Enregistre les prédictions pour le monitoring"""
     try:
-        new_log = pd.DataFrame([{
-            'timestamp': datetime.now(),
-            'sepal_length': features.sepal_length,
-            'sepal_width': features.sepal_width,
-            'petal_length': features.petal_length,
-            'petal_width': features.petal_width,
-            'prediction': prediction,
-            'prediction_name': prediction_name,
-            'confidence': confidence
-        }])
-        
-        # Ajout au fichier de log (version asynchrone)
-        new_log.to_csv(PREDICTIONS_LOG, mode='a', header=False, index=False)
-        logger.info(f"Prédiction enregistrée: {prediction_name} (confiance: {confidence:.3f})")
+        # Ajout au buffer du log (écrit sur disque par le thread écrivain)
+        prediction_logger.append((
+            datetime.now(),
+            *row,
+            prediction,
+            prediction_name,
+            float(confidence)
+        ))
+        logger.debug(f"Prédiction enregistrée: {prediction_name} (confiance: {confidence:.3f})")
         
     except Exception as e:
         logger.error(f"Erreur lors de l'enregistrement du log: {e}")
 
+async def log_predictions_batch(X: np.ndarray, predictions, prediction_name: str, confidences):
+    """Enregistre un lot de prédictions en un seul ajout au buffer du log"""
+    try:
+        timestamp = datetime.now()
+        prediction_logger.extend(
+            (timestamp, *row, prediction, prediction_name, confidence)
+            for row, prediction, confidence in zip(X.tolist(), predictions, confidences.tolist())
+        )
+        logger.debug(f"{len(X)} prédictions enregistrées ({prediction_name})")
+
+    except Exception as e:
+        logger.error(f"Erreur lors de l'enregistrement du log: {e}")
+
 @router.get("/model-info", response_model=ModelInfoResponse)
 async def model_info():
     """Retourne les informations du modèle"""
@@ -110,6 +367,30 @@ async def model_info():
         model_loaded=model is not None
     )
 
+@router.get("/models", tags=["Models"])
+async def list_models():
+    """Liste les modèles disponibles et les versions chargées"""
+    return {"default": model_registry.default_model, "models": model_registry.available()}
+
+@router.post("/models/{name}/reload", tags=["Models"])
+async def reload_model(name: str):
+    """
+    Recharge un modèle depuis son artefact, sans interrompre les requêtes en cours
+
+    La nouvelle version n'est servie qu'une fois chargée ; les requêtes
+    déjà commencées terminent sur l'ancienne.
+    """
+    try:
+        loaded = await model_registry.load(name, force=True)
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IncompatibleModel as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors du rechargement du modèle {name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "reloaded", **loaded.info()}
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     return HealthResponse(
@@ -128,8 +409,12 @@ async def root():
             "health": "/health",
             "model_info": "/model-info",
             "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_stream": "/predict/stream",
+            "models": "/models",
             "sample": "/generate-sample",
-            "stats": "/prediction-stats"
+            "stats": "/prediction-stats",
+            "history": "/prediction-history"
         }
     }
 
@@ -158,62 +443,116 @@ async def generate_sample():
     )
 
 @router.get("/prediction-stats", response_model=PredictionStatsResponse)
-async def prediction_stats():
+async def prediction_stats(
+    window_minutes: Optional[float] = Query(
+        None, gt=0, description="Limiter aux prédictions des N dernières minutes (ex: 60)"
+    )
+):
     """Retourne les statistiques des prédictions récentes"""
     try:
-        if os.path.exists(PREDICTIONS_LOG):
-            df = pd.read_csv(PREDICTIONS_LOG)
-            last_prediction = df.iloc[-1].to_dict() if len(df) > 0 else None
-            
-            return PredictionStatsResponse(
-                total_predictions=len(df),
-                class_distribution=df['prediction_name'].value_counts().to_dict(),
-                average_confidence=float(df['confidence'].mean()) if len(df) > 0 else 0.0,
-                last_prediction=last_prediction
-            )
-        else:
-            return PredictionStatsResponse(
-                total_predictions=0,
-                class_distribution={},
-                average_confidence=0.0
-            )
+        if window_minutes is not None:
+            # Longues périodes : agrégats par heure/minute, sinon requête sur le log brut
+            since = datetime.now() - timedelta(minutes=window_minutes)
+            source = prediction_rollups if prediction_rollups is not None else get_prediction_store()
+            summary = await run_in_threadpool(RunningPredictionStats.window_summary, source, since)
+            return PredictionStatsResponse(**summary)
+
+        # Agrégat maintenu à chaque prédiction : O(1) quelle que soit la taille du log
+        return PredictionStatsResponse(**running_stats.summary())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des stats: {e}")
     
+@router.get("/prediction-history", tags=["Monitoring"])
+async def prediction_history(
+    granularity: str = Query("hour", pattern="^(minute|hour)$", description="minute ou hour"),
+    hours: float = Query(24, gt=0, description="Profondeur de l'historique (en heures)")
+):
+    """
+    Historique agrégé des prédictions (pour les tableaux de bord)
+
+    Nombre de prédictions, répartition des classes, confiance moyenne,
+    moyenne et quantiles des caractéristiques par minute ou par heure,
+    lus dans les agrégats et non dans le log brut.
+    """
+    if prediction_rollups is None:
+        raise HTTPException(status_code=404, detail="Agrégats désactivés (ROLLUP_INTERVAL=0)")
+    since = datetime.now() - timedelta(hours=hours)
+    history = await run_in_threadpool(prediction_rollups.history, granularity, since)
+    return {"granularity": granularity, "since": since.isoformat(), "periods": history}
+
+def _report_window(window: Optional[str], window_type: Optional[str], window_size: Optional[float]):
+    """Fenêtre demandée par les paramètres d'une route /evidently/* (400 si invalide)"""
+    try:
+        return resolve_window(window, window_type, window_size)
+    except InvalidWindow as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/evidently/windows", tags=["Monitoring"])
+async def get_monitoring_windows():
+    """Fenêtres de données courantes configurées (MONITORING_WINDOWS)"""
+    return {
+        "default": default_window().name,
+        "windows": [window.describe() for window in get_windows().values()]
+    }
+
+
 @router.get("/evidently/drift", tags=["Monitoring"], response_class=HTMLResponse)
-async def get_drift_report():
+async def get_drift_report(
+    request: Request,
+    window: Optional[str] = Query(None, description="Nom d'une fenêtre configurée (voir /evidently/windows)"),
+    window_type: Optional[str] = Query(None, description="Fenêtre ad hoc : count, sliding ou tumbling"),
+    window_size: Optional[float] = Query(None, gt=0, description="Lignes (count) ou secondes (sliding, tumbling)")
+):
     """
-    Génère et retourne le rapport Evidently de Data Drift
+    Retourne le rapport Evidently de Data Drift
     Compare les données de production avec les données de référence
+
+    Les données courantes sont celles de la fenêtre demandée (par défaut
+    DEFAULT_MONITORING_WINDOW). Le rapport n'est régénéré que si les
+    données ont changé (ETag / If-None-Match). Une fenêtre sans prédiction
+    renvoie une page "aucune donnée" (200, non mise en cache).
     """
-    try:
-        # Générer le rapport
-        report_path = generate_data_drift_report()
-        
-        # Lire le contenu HTML
-        with open(report_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        return HTMLResponse(content=html_content)
-    except Exception as e:
-        return HTMLResponse(content=f"<h1>Error</h1><p>{str(e)}</p>", status_code=500)
+    return await _cached_report(request, "drift", _report_window(window, window_type, window_size))
 
 
 @router.get("/evidently/summary", tags=["Monitoring"], response_class=HTMLResponse)
-async def get_summary_report():
+async def get_summary_report(
+    request: Request,
+    window: Optional[str] = Query(None, description="Nom d'une fenêtre configurée (voir /evidently/windows)"),
+    window_type: Optional[str] = Query(None, description="Fenêtre ad hoc : count, sliding ou tumbling"),
+    window_size: Optional[float] = Query(None, gt=0, description="Lignes (count) ou secondes (sliding, tumbling)")
+):
     """
-    Génère et retourne le rapport Evidently de Data Summary
+    Retourne le rapport Evidently de Data Summary
     Analyse la qualité et les statistiques des données
+
+    Les données courantes sont celles de la fenêtre demandée (par défaut
+    DEFAULT_MONITORING_WINDOW). Le rapport n'est régénéré que si les
+    données ont changé (ETag / If-None-Match). Une fenêtre sans prédiction
+    renvoie une page "aucune donnée" (200, non mise en cache).
     """
+    return await _cached_report(request, "summary", _report_window(window, window_type, window_size))
+
+
+async def _cached_report(request: Request, kind: str, window: WindowSpec = None):
+    """Sert un rapport depuis le cache (génération hors de la boucle asyncio)"""
     try:
-        # Générer le rapport
-        report_path = generate_data_summary_report()
+        etag = f'"{await run_in_threadpool(report_cache.key, kind, window)}"'
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag})
 
-        # Lire le contenu HTML
-        with open(report_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
+        # Générer le rapport (ou le reprendre du cache) puis lire le contenu HTML
+        key, report_path = await run_in_threadpool(report_cache.get, kind, window)
+        html_content = await run_in_threadpool(report_path.read_text, encoding='utf-8')
 
-        return HTMLResponse(content=html_content)
+        return HTMLResponse(content=html_content, headers={"ETag": f'"{key}"'})
+    except EmptyWindow as e:
+        # Fenêtre vide (ex: aucune prédiction dans l'heure écoulée) : pas de rapport à servir
+        return HTMLResponse(
+            content=f"<h1>Aucune donnée</h1><p>{str(e)}</p>",
+            headers={"Cache-Control": "no-store", "X-Report-Status": "no-data"}
+        )
     except Exception as e:
         return HTMLResponse(content=f"<h1>Error</h1><p>{str(e)}</p>", status_code=500)
 
@@ -221,29 +560,62 @@ async def get_summary_report():
 @router.post("/evidently/update-metrics", tags=["Monitoring"])
 async def update_evidently_metrics():
     """
-    Met à jour les métriques Prometheus avec les données Evidently
-
-    Cette fonction analyse les données de drift et met à jour les métriques
-    Prometheus qui seront ensuite scrapées et affichées dans Grafana.
+    Déclenche un rafraîchissement des métriques Prometheus de drift
 
-    Appelez cet endpoint périodiquement (ex: toutes les 15 minutes) pour
-    maintenir les métriques à jour.
+    Les métriques sont recalculées en tâche de fond par le scheduler de
+    l'application (voir DRIFT_UPDATE_INTERVAL) : cet endpoint ne fait que
+    demander une exécution anticipée et retourne le dernier résultat connu.
+    Si un calcul est déjà en cours, aucun second calcul n'est lancé.
     """
-    try:
-        summary = update_prometheus_drift_metrics()
-        return {
-            "status": "success",
-            "message": "Métriques Prometheus mises à jour",
-            "summary": summary
-        }
-    except Exception as e:
-        logger.error(f"Erreur lors de la mise à jour des métriques: {e}")
-        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+    triggered = drift_scheduler.trigger()
+    return _drift_scheduler_status(
+        "triggered" if triggered else "running",
+        "Mise à jour des métriques Prometheus demandée" if triggered
+        else "Mise à jour des métriques Prometheus déjà en cours"
+    )
+
+
+@router.get("/evidently/update-metrics", tags=["Monitoring"])
+async def get_evidently_metrics():
+    """Retourne le résultat de la dernière mise à jour des métriques de drift"""
+    return _drift_scheduler_status(
+        "running" if drift_scheduler.running else "idle",
+        "Dernières métriques Prometheus publiées"
+    )
+
+
+def _drift_scheduler_status(status: str, message: str) -> dict:
+    last_run_at = drift_scheduler.last_run_at
+    return {
+        "status": status,
+        "message": message,
+        "source": DRIFT_METRICS_SOURCE,
+        "last_run": datetime.fromtimestamp(last_run_at).isoformat() if last_run_at else None,
+        "staleness_seconds": drift_scheduler.staleness() if last_run_at else None,
+        "last_error": drift_scheduler.last_error,
+        "summary": drift_scheduler.last_result
+    }
 
-def set_model_globals(model_instance, model_scaler_X_instance, model_scaler_y_instance, predictions_log_path):
+def set_model_globals(model_instance, model_scaler_X_instance, model_scaler_y_instance, predictions_log_path,
+                      registry_instance=None, executor_instance=None,
+                      prediction_logger_instance=None, prediction_stats_instance=None,
+                      drift_engine_instance=None, drift_scheduler_instance=None,
+                      report_cache_instance=None, prediction_cache_instance=None,
+                      prediction_rollups_instance=None):
     """Fonction pour injecter les variables globales depuis app.py"""
-    global model, PREDICTIONS_LOG, model_scaler_X, model_scaler_y
+    global model, PREDICTIONS_LOG, model_scaler_X, model_scaler_y, model_registry, inference_executor
+    global prediction_logger, running_stats, drift_engine, drift_scheduler, report_cache, prediction_cache
+    global prediction_rollups
+    prediction_rollups = prediction_rollups_instance
+    report_cache = report_cache_instance
+    prediction_cache = prediction_cache_instance
+    drift_engine = drift_engine_instance
+    drift_scheduler = drift_scheduler_instance
+    prediction_logger = prediction_logger_instance
+    running_stats = prediction_stats_instance
     model = model_instance
+    model_registry = registry_instance
+    inference_executor = executor_instance
     model_scaler_X = model_scaler_X_instance
     model_scaler_y = model_scaler_y_instance
     PREDICTIONS_LOG = predictions_log_path
\ No newline at end of file
@@ -0,0 +1,197 @@
+# api/scheduler.py
+"""
+Rafraîchissement planifié des métriques de drift
+
+Un thread dédié recalcule les métriques de drift à intervalle régulier
+(démarré dans le lifespan de l'application). Les exécutions sont
+"single-flight" : si un calcul est déjà en cours, une nouvelle demande
+ne lance pas de second calcul en parallèle.
+
+Avec plusieurs workers, une tâche coûteuse commune à tous (ex: métriques
+par fenêtre relues dans le log partagé) passe par un SharedIntervalGate :
+un seul processus l'exécute par intervalle, les autres la sautent.
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+
+from .monitoring_prometheus import (
+    DRIFT_UPDATE_DURATION,
+    DRIFT_UPDATE_ERRORS,
+    DRIFT_LAST_UPDATE_TIMESTAMP,
+    DRIFT_METRICS_STALENESS,
+    MULTIPROCESS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SharedIntervalGate:
+    """Exécution d'une tâche par un seul processus par intervalle (verrou de fichier)"""
+
+    def __init__(self, path: str, interval: float):
+        """
+        Args:
+            path: Fichier verrouillé, contenant la date de la dernière exécution
+            interval: Délai (en secondes) entre deux exécutions, tous processus confondus
+        """
+        self.path = path
+        self.interval = interval
+
+    def run(self, job):
+        """
+        Exécute job() si aucun processus ne l'a fait depuis la moitié de l'intervalle
+
+        La moitié de l'intervalle absorbe le décalage entre les horloges des
+        schedulers des workers : la tâche est exécutée entre une et deux fois
+        par intervalle au lieu d'une fois par worker.
+
+        Returns:
+            (True, résultat) si la tâche a été exécutée, (False, None) sinon
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'a+', encoding='utf-8') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Un autre worker exécute la tâche en ce moment
+                return False, None
+            try:
+                f.seek(0)
+                try:
+                    last_run = float(f.read().strip() or 0)
+                except ValueError:
+                    last_run = 0.0
+                if time.time() - last_run < self.interval / 2:
+                    return False, None
+
+                result = job()
+                f.seek(0)
+                f.truncate()
+                f.write(str(time.time()))
+                f.flush()
+                return True, result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class DriftMetricsScheduler:
+    """Exécute périodiquement une tâche de mise à jour des métriques de drift"""
+
+    def __init__(self, job, interval: float, name: str = "drift"):
+        """
+        Args:
+            job: Fonction sans argument qui met à jour les métriques et retourne un résumé
+            interval: Délai (en secondes) entre deux exécutions
+            name: Nom de la tâche (logs)
+        """
+        self.job = job
+        self.interval = interval
+        self.name = name
+        self.last_result = None
+        self.last_error = None
+        self.last_run_at = None
+        self._running = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._callbacks = []
+
+        # En mode multiprocess, les valeurs calculées à la collecte ne sont pas
+        # exportées : l'ancienneté est alors publiée par le thread (voir _run)
+        if not MULTIPROCESS:
+            DRIFT_METRICS_STALENESS.set_function(self.staleness)
+
+    def add_callback(self, callback):
+        """Abonne callback(result) à chaque exécution réussie"""
+        self._callbacks.append(callback)
+
+    def start(self):
+        """Démarre le thread (première exécution immédiate)"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.name}-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread en laissant l'exécution en cours se terminer"""
+        if self._thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def trigger(self) -> bool:
+        """
+        Demande une exécution immédiate sans attendre son résultat
+
+        Returns:
+            False si une exécution est déjà en cours (elle n'est pas dupliquée)
+        """
+        if self.running:
+            return False
+        self._wakeup.set()
+        return True
+
+    def staleness(self) -> float:
+        """Ancienneté (en secondes) des dernières métriques publiées"""
+        if self.last_run_at is None:
+            return float("inf")
+        return time.time() - self.last_run_at
+
+    def run_once(self):
+        """Exécute la tâche, sauf si une exécution est déjà en cours"""
+        if not self._running.acquire(blocking=False):
+            return self.last_result
+
+        start_time = time.perf_counter()
+        try:
+            result = self.job()
+        except Exception as e:
+            DRIFT_UPDATE_ERRORS.inc()
+            self.last_error = str(e)
+            logger.error(f"Erreur lors de la mise à jour des métriques de drift: {e}")
+            return self.last_result
+        finally:
+            DRIFT_UPDATE_DURATION.observe(time.perf_counter() - start_time)
+            self._running.release()
+
+        self.last_result = result
+        self.last_error = None
+        self.last_run_at = time.time()
+        DRIFT_LAST_UPDATE_TIMESTAMP.set(self.last_run_at)
+
+        for callback in self._callbacks:
+            try:
+                callback(result)
+            except Exception as e:
+                logger.error(f"Erreur dans un callback du scheduler: {e}")
+        return result
+
+    def _run(self):
+        while not self._stopping:
+            self.run_once()
+            if MULTIPROCESS:
+                self._wait_publishing_staleness()
+            else:
+                self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def _wait_publishing_staleness(self):
+        """Attend la prochaine exécution en publiant l'ancienneté chaque seconde"""
+        deadline = time.monotonic() + self.interval
+        while not self._stopping and not self._wakeup.is_set():
+            DRIFT_METRICS_STALENESS.set(self.staleness())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._wakeup.wait(min(remaining, 1.0))
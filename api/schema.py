@@ -1,6 +1,6 @@
 # api/schema.py
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
 
 class IrisFeatures(BaseModel):
     sepal_length: float
@@ -14,6 +14,40 @@ class PredictionResponse(BaseModel):
     probabilities: List[float]
     confidence: float
     model_version: str
+    model_name: str = None
+
+class BatchPredictionRequest(BaseModel):
+    """
+    Lot de fleurs à classer en un seul appel
+
+    Deux formats acceptés (un seul à la fois, au moins une ligne) :
+    - instances : liste d'objets IrisFeatures
+    - data : matrice N×4 (sepal_length, sepal_width, petal_length, petal_width),
+      directement convertible en tableau NumPy
+    """
+    instances: Optional[List[IrisFeatures]] = Field(None, min_length=1)
+    data: Optional[List[List[float]]] = Field(None, min_length=1)
+
+    @model_validator(mode="after")
+    def check_payload(self):
+        if (self.instances is None) == (self.data is None):
+            raise ValueError("Fournir exactement un des champs 'instances' ou 'data'")
+        if self.data is not None and any(len(row) != 4 for row in self.data):
+            raise ValueError("Chaque ligne de 'data' doit contenir 4 valeurs")
+        return self
+
+    def to_rows(self) -> List[List[float]]:
+        """Retourne le lot sous forme de lignes N×4"""
+        if self.data is not None:
+            return self.data
+        return [
+            [f.sepal_length, f.sepal_width, f.petal_length, f.petal_width]
+            for f in self.instances
+        ]
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse]
+    count: int
 
 class ModelInfoResponse(BaseModel):
     model_type: str
@@ -0,0 +1,850 @@
+# api/storage.py
+"""
+Backends de stockage du log des prédictions
+
+- "csv"     : un fichier CSV courant (comportement historique), archivé
+              en gzip au-delà d'une taille ou d'un âge maximal
+- "parquet" : fichiers Parquet partitionnés par heure
+              (logfiles/predictions/date=YYYY-MM-DD/hour=HH/part-*.parquet)
+              avec compaction des heures terminées
+- "sqlite"  : table SQLite en mode WAL (logfiles/predictions.sqlite),
+              indexée sur l'horodatage et la classe prédite
+
+Les lecteurs (statistiques, monitoring Evidently) ne chargent que les
+colonnes et la plage de temps dont ils ont besoin. Au-delà de la durée de
+rétention, les prédictions brutes sont supprimées (apply_retention) ;
+l'historique long est conservé sous forme d'agrégats (api/rollups.py).
+"""
+import csv
+import fcntl
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Colonnes du log des prédictions (dans l'ordre)
+LOG_COLUMNS = [
+    'timestamp', 'sepal_length', 'sepal_width',
+    'petal_length', 'petal_width', 'prediction',
+    'prediction_name', 'confidence'
+]
+
+# Types des colonnes relues d'un CSV (prediction reste inférée : classes entières
+# ou libellés). Sans types explicites, un fichier vide (en-tête seul, juste après
+# une rotation) est lu en object et contamine les colonnes à la concaténation.
+CSV_DTYPES = {
+    'timestamp': str,
+    'sepal_length': 'float64',
+    'sepal_width': 'float64',
+    'petal_length': 'float64',
+    'petal_width': 'float64',
+    'prediction_name': str,
+    'confidence': 'float64',
+}
+
+
+class PredictionStore:
+    """Interface commune des backends de stockage des prédictions"""
+
+    def initialize(self):
+        """Crée le stockage s'il n'existe pas encore"""
+        raise NotImplementedError
+
+    def append(self, records):
+        """Ajoute des prédictions (tuples dans l'ordre de LOG_COLUMNS)"""
+        raise NotImplementedError
+
+    def read(self, columns=None, since=None, until=None, limit=None) -> pd.DataFrame:
+        """
+        Lit les prédictions
+
+        Args:
+            columns: Colonnes à charger (toutes par défaut)
+            since: Ne garder que les prédictions à partir de cette date
+            until: Ne garder que les prédictions avant cette date
+            limit: Ne garder que les N prédictions les plus récentes
+        """
+        raise NotImplementedError
+
+    def compact(self) -> int:
+        """Regroupe les petits fichiers ; retourne le nombre de partitions compactées"""
+        return 0
+
+    def rotate(self) -> bool:
+        """Archive le stockage courant s'il est trop gros ou trop ancien ; retourne True si archivé"""
+        return False
+
+    def apply_retention(self, cutoff: datetime) -> int:
+        """Supprime les prédictions antérieures à cutoff ; retourne le nombre de fichiers/lignes supprimés"""
+        return 0
+
+    def aggregate(self, since=None, until=None) -> dict:
+        """
+        Agrégat des prédictions d'une plage de temps (tout le log par défaut)
+
+        Returns:
+            {"total", "class_counts" (par prediction_name), "confidence_sum",
+            "last_prediction" (tuple dans l'ordre de LOG_COLUMNS, ou None)}
+        """
+        df = self.read(since=since, until=until)
+        return {
+            "total": len(df),
+            "class_counts": {str(k): int(v) for k, v in df['prediction_name'].value_counts().items()},
+            "confidence_sum": float(df['confidence'].sum()) if len(df) else 0.0,
+            "last_prediction": tuple(df.iloc[-1][LOG_COLUMNS]) if len(df) else None,
+        }
+
+    def version(self) -> str:
+        """Identifiant qui change dès que de nouvelles prédictions sont écrites"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _filter(df: pd.DataFrame, columns, since, until, limit) -> pd.DataFrame:
+        """Applique la plage de temps, la limite et la sélection de colonnes"""
+        if since is not None or until is not None:
+            timestamps = pd.to_datetime(df['timestamp'])
+            mask = pd.Series(True, index=df.index)
+            if since is not None:
+                mask &= timestamps >= pd.Timestamp(since)
+            if until is not None:
+                mask &= timestamps < pd.Timestamp(until)
+            df = df[mask]
+        if limit is not None:
+            df = df.tail(limit)
+        if columns is not None:
+            df = df[list(columns)]
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def _needed_columns(columns, since, until):
+        if columns is None:
+            return None
+        needed = list(columns)
+        if (since is not None or until is not None) and 'timestamp' not in needed:
+            needed.append('timestamp')
+        return needed
+
+
+# ========== CSV ==========
+class CsvPredictionStore(PredictionStore):
+    """
+    Un fichier CSV courant, ajouts sous verrou de fichier
+
+    Au-delà de max_bytes ou de max_age secondes (depuis la création du fichier
+    courant ou la dernière rotation, date du fichier témoin <path>.started),
+    le fichier courant est archivé (archive_dir/<nom>-<date de fin>-<pid>.csv.gz) et
+    remplacé par un fichier vide. Les lectures bornées (limit, since)
+    complètent la fin du fichier courant avec les archives les plus récentes.
+
+    Une archive est un gzip à plusieurs membres (l'en-tête, puis un membre
+    par bloc de ARCHIVE_BLOCK_ROWS lignes), lisible d'un seul tenant par
+    gzip ou pandas. Son index (<archive>.idx, JSON) donne la position, la
+    première date et le nombre de lignes de chaque bloc : une lecture bornée
+    ne décompresse que les derniers blocs, pas toute l'archive.
+    """
+
+    # Microsecondes comprises : deux rotations dans la même seconde ne s'écrasent pas
+    ARCHIVE_TIME_FORMAT = "%Y%m%d-%H%M%S.%f"
+    ARCHIVE_BLOCK_ROWS = 20000
+    # Taille d'un fichier courant sans aucune ligne (en-tête seul)
+    HEADER_BYTES = len(",".join(LOG_COLUMNS)) + 1
+
+    def __init__(self, path: str, archive_dir: str = None, max_bytes: float = 0, max_age: float = 0):
+        """
+        Args:
+            path: Fichier CSV courant
+            archive_dir: Dossier des archives (à côté du fichier par défaut)
+            max_bytes: Taille déclenchant la rotation (0 = jamais)
+            max_age: Âge (en secondes) du fichier courant déclenchant la rotation (0 = jamais)
+        """
+        self.path = path
+        self.archive_dir = Path(archive_dir or os.path.join(os.path.dirname(path) or ".", "archive"))
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # (inode, horodatage de la première ligne) du fichier courant
+        self._first_row = None
+
+    @property
+    def _stem(self) -> str:
+        return Path(self.path).stem
+
+    @property
+    def _started_path(self) -> str:
+        return f"{self.path}.started"
+
+    def _mark_started(self, replace: bool = False):
+        """Date de début du fichier courant (création exclusive, ou remplacement après rotation)"""
+        try:
+            if replace:
+                Path(self._started_path).touch()
+            else:
+                open(self._started_path, 'x').close()
+        except FileExistsError:
+            pass
+
+    def initialize(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Un log existant sans témoin (version précédente) a son âge compté d'ici
+        self._mark_started()
+        if not os.path.exists(self.path):
+            # Création exclusive : plusieurs workers peuvent démarrer en même temps
+            try:
+                with open(self.path, 'x', encoding='utf-8') as f:
+                    pd.DataFrame(columns=LOG_COLUMNS).to_csv(f, index=False)
+            except FileExistsError:
+                return
+            logger.info("📝 Fichier de log des prédictions initialisé")
+
+    def append(self, records):
+        """Écrit un bloc de lignes en un seul appel, sous verrou de fichier"""
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        for timestamp, *values in records:
+            if isinstance(timestamp, datetime):
+                timestamp = timestamp.isoformat(sep=' ', timespec='microseconds')
+            writer.writerow([timestamp, *values])
+
+        while True:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Fichier archivé entre l'ouverture et le verrou : écrire dans le nouveau
+                    if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+                        continue
+                    f.write(output.getvalue())
+                    # Avant de rendre le verrou : une rotation ne doit pas archiver un fichier incomplet
+                    f.flush()
+                    return
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def version(self) -> str:
+        # Position de fin du fichier (les lignes ne sont qu'ajoutées)
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return "empty"
+        return f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}"
+
+    # ========== ARCHIVES ==========
+    def _archives(self) -> list:
+        """Archives triées de la plus ancienne à la plus récente"""
+        return sorted(self.archive_dir.glob(f"{self._stem}-*.csv.gz"))
+
+    def _archive_end(self, archive: Path) -> datetime:
+        """Date de la rotation (toutes les lignes de l'archive lui sont antérieures)"""
+        stamp = archive.name[len(self._stem) + 1:].split("-", 2)
+        # Archives des versions précédentes : date à la seconde
+        time_format = self.ARCHIVE_TIME_FORMAT if "." in stamp[1] else "%Y%m%d-%H%M%S"
+        return datetime.strptime(f"{stamp[0]}-{stamp[1]}", time_format)
+
+    def _first_timestamp(self):
+        """Horodatage de la première ligne du fichier courant (None s'il est vide)"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+        if self._first_row is not None and self._first_row[0] == inode:
+            return self._first_row[1]
+
+        with open(self.path, encoding='utf-8') as f:
+            f.readline()
+            line = f.readline()
+        if not line:
+            return None
+        self._first_row = (inode, pd.Timestamp(line.split(',', 1)[0]).to_pydatetime())
+        return self._first_row[1]
+
+    def _age(self) -> float:
+        """Secondes depuis la création du fichier courant ou la dernière rotation"""
+        try:
+            return time.time() - os.stat(self._started_path).st_mtime
+        except FileNotFoundError:
+            self._mark_started()
+            return 0.0
+
+    def _needs_rotation(self, size: int) -> bool:
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        # Un fichier sans aucune ligne n'est pas archivé, quel que soit son âge
+        return bool(self.max_age) and size > self.HEADER_BYTES and self._age() >= self.max_age
+
+    def rotate(self) -> bool:
+        """Archive le fichier courant en gzip s'il dépasse la taille ou l'âge maximal"""
+        if not (self.max_bytes or self.max_age):
+            return False
+        try:
+            if not self._needs_rotation(os.path.getsize(self.path)):
+                return False
+        except FileNotFoundError:
+            return False
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{self._stem}-{datetime.now():{self.ARCHIVE_TIME_FORMAT}}-{os.getpid()}.csv"
+        archive = self.archive_dir / name
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # Un autre processus a pu archiver le fichier pendant l'attente du verrou
+                if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+                    return False
+                if not self._needs_rotation(os.fstat(f.fileno()).st_size):
+                    return False
+                with open(tmp_path, 'w', encoding='utf-8') as new_file:
+                    pd.DataFrame(columns=LOG_COLUMNS).to_csv(new_file, index=False)
+                # Le chemin désigne toujours un fichier valide (lien puis remplacement atomique)
+                os.link(self.path, archive)
+                os.replace(tmp_path, self.path)
+                self._mark_started(replace=True)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+        # Compression hors verrou : les écrivains utilisent déjà le nouveau fichier
+        self._compress(archive, Path(f"{archive}.gz"))
+        archive.unlink()
+        logger.info(f"🗄️ Log des prédictions archivé: {archive.name}.gz")
+        return True
+
+    def _compress(self, source_path: Path, archive: Path):
+        """Écrit l'archive gzip par blocs de lignes, puis son index"""
+        blocks = []
+        tmp_path = f"{archive}.tmp"
+        with open(source_path, 'rb') as source, open(tmp_path, 'wb') as target:
+            header = source.readline()
+            target.write(gzip.compress(header))
+            while True:
+                lines = list(itertools.islice(source, self.ARCHIVE_BLOCK_ROWS))
+                if not lines:
+                    break
+                if not lines[-1].endswith(b'\n'):
+                    lines[-1] += b'\n'
+                offset = target.tell()
+                target.write(gzip.compress(b''.join(lines)))
+                first = lines[0].split(b',', 1)[0].decode('utf-8')
+                blocks.append([offset, target.tell() - offset, first, len(lines)])
+
+        # Index écrit avant l'archive : une archive visible a toujours son index
+        index_tmp = f"{archive}.idx.tmp"
+        with open(index_tmp, 'w', encoding='utf-8') as f:
+            json.dump({"header": header.decode('utf-8'), "blocks": blocks}, f)
+        os.replace(index_tmp, f"{archive}.idx")
+        os.replace(tmp_path, archive)
+
+    def apply_retention(self, cutoff: datetime) -> int:
+        """Supprime les archives dont toutes les lignes sont antérieures à cutoff"""
+        removed = 0
+        for archive in self._archives():
+            if self._archive_end(archive) >= cutoff:
+                break
+            archive.unlink(missing_ok=True)
+            Path(f"{archive}.idx").unlink(missing_ok=True)
+            removed += 1
+        if removed:
+            logger.info(f"🧹 {removed} archive(s) du log supprimée(s) (rétention)")
+        return removed
+
+    # ========== LECTURE ==========
+    def _read_archive(self, archive: Path, usecols, limit=None, since=None) -> pd.DataFrame:
+        """
+        Lignes d'une archive ; avec son index, seuls les blocs nécessaires sont décompressés
+
+        Args:
+            limit: Nombre de lignes les plus récentes à couvrir (lecture depuis la fin)
+            since: Date à partir de laquelle les lignes sont nécessaires
+        """
+        try:
+            with open(f"{archive}.idx", encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            # Archive sans index (version précédente) : lecture complète
+            return pd.read_csv(archive, usecols=usecols, dtype=CSV_DTYPES)
+
+        blocks = index["blocks"]
+        if since is not None:
+            # Dernier bloc commençant avant since, et tous les suivants
+            since_ts = pd.Timestamp(since)
+            start = 0
+            for i, block in enumerate(blocks):
+                if pd.Timestamp(block[2]) > since_ts:
+                    break
+                start = i
+            blocks = blocks[start:]
+        elif limit is not None:
+            start, n_rows = len(blocks), 0
+            while start > 0 and n_rows < limit:
+                start -= 1
+                n_rows += blocks[start][3]
+            blocks = blocks[start:]
+
+        parts = [index["header"].encode('utf-8')]
+        with open(archive, 'rb') as f:
+            for offset, length, _, _ in blocks:
+                f.seek(offset)
+                parts.append(gzip.decompress(f.read(length)))
+        return pd.read_csv(io.BytesIO(b''.join(parts)), usecols=usecols, dtype=CSV_DTYPES)
+
+    def read(self, columns=None, since=None, until=None, limit=None) -> pd.DataFrame:
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=columns or LOG_COLUMNS)
+
+        usecols = self._needed_columns(columns, since, until)
+        if limit is not None or since is not None:
+            # Lecture depuis la fin : coût proportionnel à la fenêtre, pas à l'historique
+            source = io.StringIO(tail_csv(self.path, limit=limit, since=since))
+        else:
+            source = self.path
+        frames = [pd.read_csv(source, usecols=usecols, dtype=CSV_DTYPES)]
+
+        # Archives nécessaires, de la plus récente à la plus ancienne
+        since_ts = pd.Timestamp(since) if since is not None else None
+        oldest = self._first_timestamp()
+        n_rows = len(frames[0])
+        for archive in reversed(self._archives()):
+            if limit is not None and since is None and n_rows >= limit:
+                break
+            if since_ts is not None and (
+                (oldest is not None and oldest < since_ts) or self._archive_end(archive) < since_ts
+            ):
+                break
+            frame = self._read_archive(
+                archive, usecols, limit=limit - n_rows if limit is not None else None, since=since
+            )
+            frames.insert(0, frame)
+            n_rows += len(frame)
+            if since_ts is not None and len(frame):
+                oldest = pd.Timestamp(frame['timestamp'].iloc[0])
+
+        # Les fichiers vides (en-tête seul) ne participent pas à la concaténation
+        non_empty = [frame for frame in frames if len(frame)]
+        if len(non_empty) > 1:
+            df = pd.concat(non_empty, ignore_index=True)
+        else:
+            df = non_empty[0] if non_empty else frames[-1]
+        return self._filter(df, columns, since, until, limit)
+
+
+def tail_csv(path: str, limit: int = None, since=None, block_size: int = 64 * 1024) -> str:
+    """
+    Lit la fin d'un CSV en remontant depuis la fin du fichier
+
+    Les lignes étant ajoutées dans l'ordre chronologique, la lecture s'arrête
+    dès que l'on a `limit` lignes, ou dès que la plus ancienne ligne lue est
+    antérieure à `since` (la première colonne est l'horodatage ISO).
+
+    Returns:
+        L'en-tête suivi des lignes retenues (texte CSV)
+    """
+    if since is not None:
+        since = pd.Timestamp(since).strftime('%Y-%m-%d %H:%M:%S.%f').encode()
+
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        position = f.seek(0, os.SEEK_END)
+
+        partial = b''
+        lines = []
+        while position > data_start:
+            read_size = min(block_size, position - data_start)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + partial
+
+            # La première ligne du bloc peut être incomplète : on la garde pour le bloc suivant
+            block_lines = block.split(b'\n')
+            partial = block_lines[0] if position > data_start else b''
+            complete = block_lines[1:] if position > data_start else block_lines
+            lines = [line for line in complete if line] + lines
+
+            if limit is not None and since is None and len(lines) >= limit:
+                break
+            if since is not None and lines and lines[0].split(b',', 1)[0] < since:
+                break
+
+        if limit is not None and since is None:
+            lines = lines[-limit:]
+        elif since is not None:
+            lines = [line for line in lines if line.split(b',', 1)[0] >= since]
+
+    return (header + b'\n'.join(lines) + (b'\n' if lines else b'')).decode('utf-8')
+
+
+# ========== PARQUET PARTITIONNÉ ==========
+class ParquetPredictionStore(PredictionStore):
+    """Fichiers Parquet partitionnés par heure, compactés une fois l'heure terminée"""
+
+    COMPACTED_NAME = "compacted.parquet"
+
+    def __init__(self, root: str):
+        # Dépendance optionnelle : uniquement requise pour ce backend
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.root = Path(root)
+        self.schema = pyarrow.schema([
+            ('timestamp', pyarrow.timestamp('us')),
+            ('sepal_length', pyarrow.float64()),
+            ('sepal_width', pyarrow.float64()),
+            ('petal_length', pyarrow.float64()),
+            ('petal_width', pyarrow.float64()),
+            ('prediction', pyarrow.string()),
+            ('prediction_name', pyarrow.string()),
+            ('confidence', pyarrow.float64()),
+        ])
+        self._sequence = 0
+
+    def initialize(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _partition_dir(self, timestamp: datetime) -> Path:
+        return self.root / f"date={timestamp:%Y-%m-%d}" / f"hour={timestamp:%H}"
+
+    @staticmethod
+    def _partition_start(partition: Path) -> datetime:
+        date = partition.parent.name.split("=", 1)[1]
+        hour = partition.name.split("=", 1)[1]
+        return datetime.strptime(f"{date} {hour}", "%Y-%m-%d %H")
+
+    def _partitions(self):
+        """Partitions horaires triées de la plus ancienne à la plus récente"""
+        return sorted(self.root.glob("date=*/hour=*"))
+
+    def version(self) -> str:
+        # Dernière partition et ses fichiers (un fichier par écriture)
+        partitions = self._partitions()
+        if not partitions:
+            return "empty"
+        latest = partitions[-1]
+        files = sorted(f.name for f in latest.glob("*.parquet"))
+        return f"{latest.parent.name}/{latest.name}/{len(files)}/{files[-1] if files else ''}"
+
+    def append(self, records):
+        by_hour = {}
+        for record in records:
+            timestamp = record[0]
+            if not isinstance(timestamp, datetime):
+                timestamp = pd.Timestamp(timestamp).to_pydatetime()
+            by_hour.setdefault(self._partition_dir(timestamp), []).append((timestamp, *record[1:]))
+
+        for partition, rows in by_hour.items():
+            partition.mkdir(parents=True, exist_ok=True)
+            columns = list(zip(*rows))
+            table = self.pa.Table.from_arrays(
+                [
+                    self.pa.array(columns[0], type=self.pa.timestamp('us')),
+                    *[self.pa.array([float(v) for v in col]) for col in columns[1:5]],
+                    self.pa.array([str(v) for v in columns[5]]),
+                    self.pa.array([str(v) for v in columns[6]]),
+                    self.pa.array([float(v) for v in columns[7]]),
+                ],
+                schema=self.schema
+            )
+            self._sequence += 1
+            name = f"part-{datetime.now():%Y%m%d%H%M%S%f}-{os.getpid()}-{self._sequence}.parquet"
+            tmp_path = partition / f".{name}.tmp"
+            self.pq.write_table(table, tmp_path)
+            os.replace(tmp_path, partition / name)
+
+    def read(self, columns=None, since=None, until=None, limit=None) -> pd.DataFrame:
+        try:
+            return self._read(columns, since, until, limit)
+        except FileNotFoundError:
+            # Une compaction a remplacé des fichiers pendant la lecture
+            return self._read(columns, since, until, limit)
+
+    def _read(self, columns, since, until, limit) -> pd.DataFrame:
+        partitions = self._partitions()
+
+        # Élagage des partitions hors de la plage de temps
+        if since is not None:
+            since_hour = pd.Timestamp(since).floor('h').to_pydatetime()
+            partitions = [p for p in partitions if self._partition_start(p) >= since_hour]
+        if until is not None:
+            until_ts = pd.Timestamp(until).to_pydatetime()
+            partitions = [p for p in partitions if self._partition_start(p) < until_ts]
+
+        needed = self._needed_columns(columns, since, until)
+        if limit is not None and needed is not None and 'timestamp' not in needed:
+            needed.append('timestamp')
+
+        # Pour une limite, lire les partitions les plus récentes d'abord
+        tables = []
+        n_rows = 0
+        for partition in reversed(partitions):
+            files = sorted(partition.glob("*.parquet"))
+            if not files:
+                continue
+            table = self.pq.read_table([str(f) for f in files], columns=needed, schema=self.schema)
+            tables.append(table)
+            n_rows += table.num_rows
+            if limit is not None and since is None and n_rows >= limit:
+                break
+
+        if not tables:
+            return pd.DataFrame(columns=columns or LOG_COLUMNS)
+
+        df = self.pa.concat_tables(tables[::-1]).to_pandas()
+        if limit is not None or since is not None or until is not None:
+            df = df.sort_values('timestamp', kind='stable')
+        return self._filter(df, columns, since, until, limit)
+
+    def apply_retention(self, cutoff: datetime) -> int:
+        """Supprime les partitions horaires entièrement antérieures à cutoff"""
+        removed = 0
+        for partition in self._partitions():
+            if self._partition_start(partition) + timedelta(hours=1) > cutoff:
+                break
+            shutil.rmtree(partition, ignore_errors=True)
+            removed += 1
+            # Dossier du jour vide une fois sa dernière heure supprimée
+            try:
+                partition.parent.rmdir()
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"🧹 {removed} partition(s) du log supprimée(s) (rétention)")
+        return removed
+
+    def compact(self) -> int:
+        """Fusionne les fichiers des heures terminées en un seul fichier par partition"""
+        lock_path = self.root / ".compaction.lock"
+        current = self._partition_dir(datetime.now())
+        compacted = 0
+
+        with open(lock_path, 'w') as lock:
+            # Un seul processus compacte à la fois ; les autres passent leur tour
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            for partition in self._partitions():
+                if partition == current:
+                    continue
+                files = sorted(partition.glob("*.parquet"))
+                if len(files) <= 1:
+                    continue
+
+                table = self.pq.read_table([str(f) for f in files], schema=self.schema)
+                table = table.sort_by('timestamp')
+                tmp_path = partition / f".{self.COMPACTED_NAME}.tmp"
+                self.pq.write_table(table, tmp_path)
+                os.replace(tmp_path, partition / self.COMPACTED_NAME)
+                for f in files:
+                    if f.name != self.COMPACTED_NAME:
+                        f.unlink()
+                compacted += 1
+
+        if compacted:
+            logger.info(f"🗜️ {compacted} partition(s) du log compactée(s)")
+        return compacted
+
+
+# ========== SQLITE ==========
+class SqlitePredictionStore(PredictionStore):
+    """
+    Table SQLite en mode WAL
+
+    Les lecteurs ne bloquent pas l'écrivain (WAL) ; chaque thread utilise sa
+    propre connexion. Les écritures arrivent par blocs depuis le thread
+    écrivain du log (un executemany par bloc, dans une seule transaction).
+    Les horodatages sont stockés en texte ISO, triable comme dans le CSV.
+    """
+
+    TABLE = "predictions"
+
+    def __init__(self, path: str, busy_timeout: float = 30.0):
+        """
+        Args:
+            path: Fichier de la base
+            busy_timeout: Attente maximale (en secondes) d'un verrou tenu par un autre processus
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            # Sûr en mode WAL : seul un arrêt brutal du système peut perdre les derniers blocs
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def initialize(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            # prediction sans type (affinité NUMERIC) : les classes entières sont relues en entiers
+            connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    id INTEGER PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    sepal_length REAL,
+                    sepal_width REAL,
+                    petal_length REAL,
+                    petal_width REAL,
+                    prediction NUMERIC,
+                    prediction_name TEXT,
+                    confidence REAL
+                )
+            """)
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_timestamp ON {self.TABLE} (timestamp)"
+            )
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_prediction ON {self.TABLE} (prediction, timestamp)"
+            )
+
+    def append(self, records):
+        rows = [
+            (
+                timestamp.isoformat(sep=' ', timespec='microseconds') if isinstance(timestamp, datetime)
+                else str(timestamp),
+                *(float(v) for v in features),
+                str(prediction),
+                str(prediction_name),
+                float(confidence),
+            )
+            for timestamp, *features, prediction, prediction_name, confidence in records
+        ]
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                f"INSERT INTO {self.TABLE} ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' * len(LOG_COLUMNS))})",
+                rows
+            )
+
+    def version(self) -> str:
+        # Dernier identifiant inséré (lu dans l'index de la clé primaire)
+        last_id = self._connection().execute(f"SELECT MAX(id) FROM {self.TABLE}").fetchone()[0]
+        return f"sqlite-{last_id}" if last_id is not None else "empty"
+
+    @staticmethod
+    def _format_timestamp(value) -> str:
+        return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    @classmethod
+    def _where(cls, since, until) -> tuple:
+        """Clause WHERE sur l'horodatage (utilise l'index) et ses paramètres"""
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(cls._format_timestamp(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(cls._format_timestamp(until))
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def read(self, columns=None, since=None, until=None, limit=None) -> pd.DataFrame:
+        columns = list(columns) if columns is not None else LOG_COLUMNS
+        unknown = [column for column in columns if column not in LOG_COLUMNS]
+        if unknown:
+            raise ValueError(f"Colonnes inconnues: {', '.join(unknown)}")
+
+        where, params = self._where(since, until)
+        selected = ', '.join(columns)
+        if limit is not None:
+            # Les N plus récentes via l'index, remises dans l'ordre chronologique
+            query = (
+                f"SELECT {selected} FROM ("
+                f"SELECT id AS _id, timestamp AS _ts, {selected} FROM {self.TABLE}{where} "
+                f"ORDER BY timestamp DESC, id DESC LIMIT ?"
+                f") ORDER BY _ts, _id"
+            )
+            params.append(int(limit))
+        else:
+            query = f"SELECT {selected} FROM {self.TABLE}{where} ORDER BY timestamp, id"
+        return pd.read_sql_query(query, self._connection(), params=params)
+
+    def aggregate(self, since=None, until=None) -> dict:
+        connection = self._connection()
+        where, params = self._where(since, until)
+        class_counts, total, confidence_sum = {}, 0, 0.0
+        for prediction_name, count, confidences in connection.execute(
+            f"SELECT prediction_name, COUNT(*), SUM(confidence) FROM {self.TABLE}{where} GROUP BY prediction_name",
+            params
+        ):
+            class_counts[str(prediction_name)] = count
+            total += count
+            confidence_sum += confidences or 0.0
+
+        last = connection.execute(
+            f"SELECT {', '.join(LOG_COLUMNS)} FROM {self.TABLE}{where} ORDER BY timestamp DESC, id DESC LIMIT 1",
+            params
+        ).fetchone()
+        return {
+            "total": total,
+            "class_counts": class_counts,
+            "confidence_sum": confidence_sum,
+            "last_prediction": last,
+        }
+
+    def apply_retention(self, cutoff: datetime) -> int:
+        """Supprime les lignes antérieures à cutoff (plage de l'index sur l'horodatage)"""
+        connection = self._connection()
+        with connection:
+            removed = connection.execute(
+                f"DELETE FROM {self.TABLE} WHERE timestamp < ?", (self._format_timestamp(cutoff),)
+            ).rowcount
+        if removed:
+            logger.info(f"🧹 {removed} prédiction(s) supprimée(s) du log (rétention)")
+        return removed
+
+    def compact(self) -> int:
+        """Met à jour les statistiques du planificateur et replie le WAL dans la base"""
+        connection = self._connection()
+        connection.execute("PRAGMA optimize")
+        connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return 0
+
+
+# ========== FABRIQUE ==========
+_store = None
+
+
+def create_prediction_store(backend: str, csv_path: str, parquet_root: str,
+                            sqlite_path: str = None, archive_dir: str = None,
+                            rotate_max_bytes: float = 0, rotate_max_age: float = 0) -> PredictionStore:
+    """Crée le backend de stockage demandé ("csv", "parquet" ou "sqlite")"""
+    if backend == "csv":
+        return CsvPredictionStore(csv_path, archive_dir, max_bytes=rotate_max_bytes, max_age=rotate_max_age)
+    if backend == "parquet":
+        return ParquetPredictionStore(parquet_root)
+    if backend == "sqlite":
+        return SqlitePredictionStore(sqlite_path)
+    raise ValueError(f"Backend de stockage inconnu: {backend}")
+
+
+def get_prediction_store() -> PredictionStore:
+    """Retourne le backend configuré dans api/config.py (créé au premier appel)"""
+    global _store
+    if _store is None:
+        from .config import (
+            PREDICTION_STORE, PREDICTIONS_LOG, PREDICTIONS_DIR, PREDICTIONS_DB, PREDICTIONS_ARCHIVE_DIR,
+            LOG_ROTATE_MAX_MB, LOG_ROTATE_INTERVAL_HOURS
+        )
+        _store = create_prediction_store(
+            PREDICTION_STORE, PREDICTIONS_LOG, PREDICTIONS_DIR, PREDICTIONS_DB,
+            archive_dir=PREDICTIONS_ARCHIVE_DIR,
+            rotate_max_bytes=LOG_ROTATE_MAX_MB * 1024 * 1024,
+            rotate_max_age=LOG_ROTATE_INTERVAL_HOURS * 3600
+        )
+    return _store
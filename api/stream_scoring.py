@@ -0,0 +1,238 @@
+# api/stream_scoring.py
+"""
+Scoring en flux des gros fichiers (CSV ou NDJSON)
+
+Le corps de la requête est d'abord recopié dans un fichier temporaire
+(en mémoire jusqu'à STREAM_SPOOL_MEMORY_MB, sur disque au-delà), avant le
+début de la réponse : une fois la réponse commencée, Starlette consomme
+lui-même les messages de la requête pour détecter une déconnexion, et
+request.stream() lèverait ClientDisconnect au deuxième morceau du corps.
+Le fichier est ensuite relu et découpé en blocs de chunk_size lignes ;
+chaque bloc passe en un seul predict_proba dans le pool d'inférence, et ses
+résultats sont renvoyés en NDJSON avant la lecture du bloc suivant. La
+mémoire utilisée ne dépend donc que de chunk_size, pas de la taille du
+fichier.
+
+Les colonnes suivent data/Iris.csv (SepalLengthCm... renommées avec
+IRIS_CSV_COLUMNS) ou directement les noms de l'API ; une colonne Id est
+recopiée dans chaque résultat. Les autres colonnes (Species...) sont ignorées.
+
+Lignes produites :
+- {"row": 0, "id": 1, "prediction": "0", "probabilities": [...], "confidence": 1.0}
+- {"error": "...", "row": 5000} si un bloc est invalide (le flux s'arrête)
+- {"count": 150} en dernière ligne quand tout le fichier a été évalué
+
+Les prédictions en flux ne sont pas ajoutées au log des prédictions : un
+fichier de plusieurs millions de lignes remplacerait la fenêtre de drift.
+"""
+import asyncio
+import csv
+import io
+import json
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .codecs import UnsupportedMediaType, InvalidPayload
+from .config import FEATURE_COLUMNS, IRIS_CSV_COLUMNS
+from .executor import ExecutorSaturated
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "application/x-ndjson"
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = (NDJSON, "application/ndjson", "application/jsonl", "application/json-lines")
+
+# Attente entre deux essais quand le pool d'inférence est saturé
+SATURATED_RETRY_DELAY = 0.01
+
+# Taille des lectures dans le fichier temporaire du corps
+SPOOL_READ_SIZE = 1 << 16
+
+
+def stream_format(content_type: str) -> str:
+    """Format du fichier envoyé : "csv" ou "ndjson" """
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    if media_type in CSV_TYPES:
+        return "csv"
+    if media_type in NDJSON_TYPES:
+        return "ndjson"
+    raise UnsupportedMediaType(
+        f"Content-Type non pris en charge: {media_type or 'absent'} (attendu: text/csv ou {NDJSON})"
+    )
+
+
+async def spool_body(stream, max_memory: int):
+    """
+    Recopie le corps reçu en flux dans un fichier temporaire (à appeler avant la réponse)
+
+    Args:
+        stream: Itérateur asynchrone des morceaux du corps (request.stream())
+        max_memory: Taille gardée en mémoire avant de passer sur disque (octets)
+
+    Returns:
+        Fichier temporaire positionné au début (à fermer par l'appelant)
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        async for data in stream:
+            if spool.tell() + len(data) > max_memory:
+                # Fichier sur disque : écriture hors de la boucle asyncio
+                await asyncio.to_thread(spool.write, data)
+            else:
+                spool.write(data)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+async def iter_spool(spool, read_size: int = SPOOL_READ_SIZE):
+    """Morceaux d'un fichier temporaire du corps (lectures disque hors de la boucle asyncio)"""
+    while True:
+        data = await asyncio.to_thread(spool.read, read_size)
+        if not data:
+            return
+        yield data
+
+
+class ChunkReader:
+    """Découpe un corps reçu en flux en blocs de lignes (ids, tableau N×4)"""
+
+    def __init__(self, stream, body_format: str, chunk_size: int = 5000):
+        """
+        Args:
+            stream: Itérateur asynchrone des morceaux du corps (iter_spool)
+            body_format: "csv" ou "ndjson"
+            chunk_size: Nombre de lignes par bloc
+        """
+        self.body_format = body_format
+        self.chunk_size = chunk_size
+        self.columns = None
+        self._lines = self._iter_lines(stream)
+
+    @staticmethod
+    async def _iter_lines(stream):
+        """Lignes non vides du corps (seule la ligne incomplète reste en mémoire)"""
+        pending = b""
+        async for data in stream:
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if pending.strip():
+            yield pending
+
+    async def read_header(self):
+        """
+        Lit et vérifie l'en-tête CSV (à appeler avant de commencer la réponse)
+
+        Raises:
+            InvalidPayload: fichier vide ou colonne de caractéristique manquante
+        """
+        if self.body_format != "csv":
+            return
+        try:
+            header = await self._lines.__anext__()
+        except StopAsyncIteration:
+            raise InvalidPayload("Fichier CSV vide")
+        names = next(csv.reader([header.decode("utf-8-sig")]))
+        self.columns = [IRIS_CSV_COLUMNS.get(name.strip(), name.strip()) for name in names]
+        self._check_columns(self.columns)
+
+    @staticmethod
+    def _check_columns(columns):
+        missing = [column for column in FEATURE_COLUMNS if column not in columns]
+        if missing:
+            raise InvalidPayload(f"Colonnes manquantes: {', '.join(missing)}")
+
+    def _parse(self, lines: list):
+        """Convertit un bloc de lignes en (ids ou None, tableau N×4)"""
+        try:
+            if self.body_format == "csv":
+                df = pd.read_csv(io.BytesIO(b"\n".join(lines)), header=None, names=self.columns)
+            else:
+                records = [json.loads(line) for line in lines]
+                df = pd.DataFrame.from_records(records).rename(columns=IRIS_CSV_COLUMNS)
+                self._check_columns(df.columns)
+            X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            # ValueError couvre aussi les erreurs du parseur CSV et du JSON
+            raise InvalidPayload(f"Bloc illisible: {e}")
+
+        if not np.isfinite(X).all():
+            raise InvalidPayload("Les caractéristiques doivent être des nombres finis")
+        ids = df["Id"].tolist() if "Id" in df else None
+        return ids, X
+
+    async def __aiter__(self):
+        # Le parsing d'un bloc se fait hors de la boucle asyncio
+        lines = []
+        async for line in self._lines:
+            lines.append(line)
+            if len(lines) == self.chunk_size:
+                yield await asyncio.to_thread(self._parse, lines)
+                lines = []
+        if lines:
+            yield await asyncio.to_thread(self._parse, lines)
+
+
+def _ndjson(objects) -> bytes:
+    return "".join(json.dumps(obj) + "\n" for obj in objects).encode()
+
+
+def _encode_results(first_row: int, ids, predictions, probabilities, confidences) -> bytes:
+    """Lignes NDJSON des résultats d'un bloc"""
+    return _ndjson(
+        {
+            "row": first_row + i,
+            **({"id": ids[i]} if ids is not None else {}),
+            "prediction": str(prediction),
+            "probabilities": row_probabilities,
+            "confidence": confidence,
+        }
+        for i, (prediction, row_probabilities, confidence) in enumerate(
+            zip(predictions, probabilities.tolist(), confidences.tolist())
+        )
+    )
+
+
+async def score_stream(reader: ChunkReader, loaded, executor):
+    """
+    Évalue les blocs du lecteur et produit les résultats en NDJSON
+
+    Args:
+        reader: Lecteur du fichier (en-tête déjà lu)
+        loaded: Modèle réservé pour toute la durée du flux
+        executor: Pool d'inférence
+    """
+    row = 0
+    try:
+        async for ids, X in reader:
+            while True:
+                try:
+                    probabilities = await executor.run(X, loaded.engine)
+                    break
+                except ExecutorSaturated:
+                    # Un flux peut attendre : pas de 503 au milieu d'un fichier
+                    await asyncio.sleep(SATURATED_RETRY_DELAY)
+
+            predictions, confidences = loaded.engine.decide(probabilities)
+            yield await asyncio.to_thread(
+                _encode_results, row, ids, predictions, probabilities, confidences
+            )
+            row += len(X)
+    except InvalidPayload as e:
+        yield _ndjson([{"error": str(e), "row": row}])
+        return
+    except Exception as e:
+        logger.error(f"Erreur lors du scoring en flux (ligne {row}): {e}")
+        yield _ndjson([{"error": str(e), "row": row}])
+        return
+
+    logger.info(f"📄 Scoring en flux terminé: {row} lignes ({loaded.name} {loaded.version})")
+    yield _ndjson([{"count": row}])
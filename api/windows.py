@@ -0,0 +1,302 @@
+# api/windows.py
+"""
+Fenêtres des données courantes du monitoring (drift et qualité)
+
+Une fenêtre fixe quelles prédictions récentes sont comparées à la référence :
+- "count"    : les N dernières prédictions (ex: count:100)
+- "sliding"  : les prédictions des S dernières secondes (ex: sliding:900)
+- "tumbling" : la dernière période complète de S secondes, alignée sur
+  l'epoch Unix (ex: tumbling:3600 = l'heure précédente entière)
+
+Une fenêtre en nombre de lignes couvre quelques secondes en pleine charge et
+plusieurs heures la nuit ; une fenêtre en temps garde le même sens à toute
+heure. Les fenêtres configurées (MONITORING_WINDOWS) sont nommées, ce nom
+sert de label Prometheus et de paramètre ?window= des routes /evidently/*.
+
+Les données viennent d'un buffer circulaire des dernières prédictions tenu
+en mémoire (alimenté par le log) ; le stockage n'est relu que si la fenêtre
+demandée remonte plus loin que le buffer, ou en mode multiprocess où
+chaque worker ne voit que ses propres requêtes.
+"""
+import math
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .config import FEATURE_COLUMNS
+from .storage import LOG_COLUMNS, PredictionStore
+
+WINDOW_KINDS = ("count", "sliding", "tumbling")
+
+# Nombre de clés de cache d'une fenêtre glissante sur sa durée : un rapport
+# sur les 15 dernières minutes est réutilisé au plus 15 secondes
+SLIDING_CACHE_STEPS = 60
+
+
+class InvalidWindow(ValueError):
+    """Levée quand une définition de fenêtre est invalide (400)"""
+
+
+class EmptyWindow(ValueError):
+    """Levée quand une fenêtre ne contient aucune prédiction (état normal, pas une erreur serveur)"""
+
+
+class WindowSpec:
+    """Définition d'une fenêtre de données courantes"""
+
+    def __init__(self, name: str, kind: str, size: float):
+        """
+        Args:
+            name: Nom de la fenêtre (label Prometheus)
+            kind: "count", "sliding" ou "tumbling"
+            size: Nombre de lignes (count) ou durée en secondes (sliding, tumbling)
+        """
+        if kind not in WINDOW_KINDS:
+            raise InvalidWindow(f"Type de fenêtre inconnu: {kind} (attendu: {', '.join(WINDOW_KINDS)})")
+        if not size > 0:
+            raise InvalidWindow(f"La taille de la fenêtre {name} doit être positive")
+        self.name = name
+        self.kind = kind
+        self.size = int(size) if kind == "count" else float(size)
+
+    @classmethod
+    def parse(cls, name: str, definition: str) -> "WindowSpec":
+        """Fenêtre décrite par "type:taille" (ex: "sliding:900")"""
+        kind, _, size = definition.strip().partition(":")
+        try:
+            size = float(size)
+        except ValueError:
+            raise InvalidWindow(f"Fenêtre invalide: {definition} (attendu: type:taille)")
+        return cls(name, kind.strip(), size)
+
+    def bounds(self, now: datetime):
+        """(début, fin) d'une fenêtre en temps ; fin exclue"""
+        if self.kind == "sliding":
+            return now - timedelta(seconds=self.size), now
+        if self.kind == "tumbling":
+            end = datetime.fromtimestamp(math.floor(now.timestamp() / self.size) * self.size)
+            return end - timedelta(seconds=self.size), end
+        raise InvalidWindow(f"La fenêtre {self.name} n'est pas définie en temps")
+
+    def cache_key(self, data_version: str, now: datetime) -> str:
+        """
+        Clé des données de la fenêtre (cache des rapports)
+
+        Une période complète ne change plus : sa clé est sa date de début.
+        Une fenêtre glissante change avec le temps même sans nouvelle
+        prédiction : sa clé avance par pas de size / SLIDING_CACHE_STEPS.
+        """
+        definition = f"{self.kind}:{self.size:g}"
+        if self.kind == "tumbling":
+            return f"{definition}:{self.bounds(now)[0].isoformat()}"
+        if self.kind == "sliding":
+            step = max(1.0, self.size / SLIDING_CACHE_STEPS)
+            return f"{definition}:{data_version}:{math.floor(now.timestamp() / step)}"
+        return f"{definition}:{data_version}"
+
+    def describe(self) -> dict:
+        return {"name": self.name, "kind": self.kind, "size": self.size}
+
+
+def parse_windows(definitions: str) -> dict:
+    """
+    Fenêtres configurées : "nom=type:taille" séparés par des virgules
+
+    Returns:
+        {nom: WindowSpec}, dans l'ordre de la configuration
+    """
+    windows = {}
+    for item in filter(None, (part.strip() for part in definitions.split(","))):
+        name, separator, definition = item.partition("=")
+        if not separator or not name.strip():
+            raise InvalidWindow(f"Fenêtre invalide: {item} (attendu: nom=type:taille)")
+        windows[name.strip()] = WindowSpec.parse(name.strip(), definition)
+    return windows
+
+
+class RecentPredictions:
+    """Buffer circulaire des dernières prédictions (toutes les colonnes du log)"""
+
+    def __init__(self, capacity: int = 100000):
+        """
+        Args:
+            capacity: Nombre de prédictions gardées en mémoire
+        """
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity, dtype="datetime64[us]")
+        self._features = np.zeros((capacity, len(FEATURE_COLUMNS)))
+        self._predictions = np.empty(capacity, dtype=object)
+        self._names = np.empty(capacity, dtype=object)
+        self._confidences = np.zeros(capacity)
+        self._position = 0
+        self._size = 0
+        # Vrai dès que le buffer ne contient plus tout le log (lignes écrasées ou non chargées)
+        self._truncated = False
+        self._lock = threading.Lock()
+
+    # ========== ALIMENTATION ==========
+    def _append(self, timestamps, features, predictions, names, confidences):
+        n = len(timestamps)
+        if n == 0:
+            return
+        if n > self.capacity:
+            timestamps, features = timestamps[-self.capacity:], features[-self.capacity:]
+            predictions, names = predictions[-self.capacity:], names[-self.capacity:]
+            confidences = confidences[-self.capacity:]
+            n = self.capacity
+        with self._lock:
+            positions = (self._position + np.arange(n)) % self.capacity
+            self._timestamps[positions] = timestamps
+            self._features[positions] = features
+            self._predictions[positions] = predictions
+            self._names[positions] = names
+            self._confidences[positions] = confidences
+            if self._size + n > self.capacity:
+                self._truncated = True
+            self._position = (self._position + n) % self.capacity
+            self._size = min(self.capacity, self._size + n)
+
+    def observe_records(self, records):
+        """Écouteur du log : ajoute des prédictions (tuples dans l'ordre de LOG_COLUMNS)"""
+        records = list(records)
+        self._append(
+            np.array([record[0] for record in records], dtype="datetime64[us]"),
+            np.array([record[1:5] for record in records], dtype=float),
+            [record[5] for record in records],
+            [record[6] for record in records],
+            np.array([record[7] for record in records], dtype=float)
+        )
+
+    def load(self, store: PredictionStore):
+        """Remplit le buffer avec la fin du log (au démarrage)"""
+        df = store.read(limit=self.capacity)
+        self._append(
+            pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[us]"),
+            df[FEATURE_COLUMNS].to_numpy(dtype=float),
+            df["prediction"].to_numpy(dtype=object),
+            df["prediction_name"].to_numpy(dtype=object),
+            df["confidence"].to_numpy(dtype=float)
+        )
+        if len(df) >= self.capacity:
+            self._truncated = True
+
+    # ========== LECTURE ==========
+    def select(self, window: WindowSpec, now: datetime = None):
+        """
+        Prédictions de la fenêtre (colonnes de LOG_COLUMNS, de la plus ancienne à la plus récente)
+
+        Returns:
+            DataFrame, ou None si la fenêtre remonte plus loin que le buffer
+        """
+        now = now or datetime.now()
+        with self._lock:
+            order = (self._position - self._size + np.arange(self._size)) % self.capacity
+            timestamps = self._timestamps[order]
+            if window.kind == "count":
+                if window.size > self._size and self._truncated:
+                    return None
+                order = order[-window.size:]
+                timestamps = timestamps[-window.size:]
+            else:
+                since, until = (np.datetime64(bound, "us") for bound in window.bounds(now))
+                if self._truncated and (self._size == 0 or timestamps[0] > since):
+                    return None
+                mask = (timestamps >= since) & (timestamps < until)
+                order, timestamps = order[mask], timestamps[mask]
+
+            df = pd.DataFrame(self._features[order], columns=FEATURE_COLUMNS)
+            df.insert(0, "timestamp", timestamps)
+            df["prediction"] = self._predictions[order]
+            df["prediction_name"] = self._names[order]
+            df["confidence"] = self._confidences[order]
+        return df[LOG_COLUMNS]
+
+
+def load_window(window: WindowSpec, store: PredictionStore, recent: RecentPredictions = None,
+                columns=None, now: datetime = None) -> pd.DataFrame:
+    """
+    Prédictions d'une fenêtre, depuis le buffer en mémoire si possible
+
+    Args:
+        window: Fenêtre demandée
+        store: Stockage du log (si le buffer ne couvre pas la fenêtre)
+        recent: Buffer des dernières prédictions (None en mode multiprocess)
+        columns: Colonnes à garder
+        now: Date de référence des fenêtres en temps
+    """
+    now = now or datetime.now()
+    df = recent.select(window, now) if recent is not None else None
+    if df is not None:
+        return (df[columns] if columns is not None else df).reset_index(drop=True)
+
+    if window.kind == "count":
+        return store.read(columns=columns, limit=window.size)
+    since, until = window.bounds(now)
+    return store.read(columns=columns, since=since, until=until)
+
+
+# ========== FENÊTRES CONFIGURÉES ==========
+_windows = None
+_recent = None
+
+
+def get_windows() -> dict:
+    """Fenêtres configurées dans api/config.py ({nom: WindowSpec}, lues au premier appel)"""
+    global _windows
+    if _windows is None:
+        from .config import MONITORING_WINDOWS
+        _windows = parse_windows(MONITORING_WINDOWS)
+    return _windows
+
+
+def default_window() -> WindowSpec:
+    """Fenêtre utilisée quand la requête n'en précise pas (DEFAULT_MONITORING_WINDOW)"""
+    from .config import DEFAULT_MONITORING_WINDOW
+    windows = get_windows()
+    if DEFAULT_MONITORING_WINDOW not in windows:
+        raise InvalidWindow(f"Fenêtre par défaut inconnue: {DEFAULT_MONITORING_WINDOW}")
+    return windows[DEFAULT_MONITORING_WINDOW]
+
+
+def resolve_window(name: str = None, kind: str = None, size: float = None) -> WindowSpec:
+    """
+    Fenêtre demandée par une requête : nom configuré, ou type et taille ad hoc
+
+    Une fenêtre ad hoc est bornée par MAX_ADHOC_WINDOW_ROWS (count) ou
+    MAX_ADHOC_WINDOW_SECONDS (sliding, tumbling) : elle est lue à chaque
+    requête et crée sa propre entrée dans le cache des rapports.
+
+    Raises:
+        InvalidWindow: nom inconnu, définition invalide ou fenêtre ad hoc trop grande
+    """
+    if kind is not None or size is not None:
+        from .config import MAX_ADHOC_WINDOW_ROWS, MAX_ADHOC_WINDOW_SECONDS
+        if kind is None or size is None:
+            raise InvalidWindow("window_type et window_size doivent être fournis ensemble")
+        window = WindowSpec(f"{kind}:{size:g}", kind, size)
+        if window.kind == "count" and window.size > MAX_ADHOC_WINDOW_ROWS:
+            raise InvalidWindow(f"Fenêtre ad hoc trop grande: {window.name} (maximum {MAX_ADHOC_WINDOW_ROWS} lignes)")
+        if window.kind != "count" and window.size > MAX_ADHOC_WINDOW_SECONDS:
+            raise InvalidWindow(
+                f"Fenêtre ad hoc trop grande: {window.name} (maximum {MAX_ADHOC_WINDOW_SECONDS:g} secondes)"
+            )
+        return window
+    if name is None:
+        return default_window()
+    windows = get_windows()
+    if name not in windows:
+        raise InvalidWindow(f"Fenêtre inconnue: {name} (configurées: {', '.join(windows)})")
+    return windows[name]
+
+
+def set_recent_predictions(recent: RecentPredictions):
+    """Buffer des dernières prédictions partagé par les fenêtres (créé par l'application)"""
+    global _recent
+    _recent = recent
+
+
+def get_recent_predictions():
+    """Buffer des dernières prédictions, ou None s'il n'est pas utilisé"""
+    return _recent
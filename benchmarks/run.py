@@ -0,0 +1,313 @@
+"""
+Banc de performance reproductible de l'API Iris
+
+Non interactif, sans Prometheus ni Grafana : l'application est pilotée
+en mémoire (transport ASGI, lifespan compris) ou via HTTP vers une
+instance déjà lancée, avec une concurrence configurable. Chaque scénario
+(prédiction unitaire, batch, statistiques, drift) est mesuré séparément :
+latences p50/p95/p99 et débit, écrits en JSON.
+
+Avec --baseline, les résultats sont comparés à une référence enregistrée
+(--save-baseline) : une dégradation au-delà de --tolerance fait échouer
+l'exécution (code de sortie 1). La référence benchmarks/baseline.json est
+versionnée ; elle est à régénérer (--save-baseline) sur la machine de CI
+quand une baisse de performance est voulue.
+
+Exemples :
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 32 --requests 2000 --output results.json
+    python -m benchmarks.run --url http://localhost:8000 --baseline benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+
+En CI (application en mémoire, échec en cas de régression) :
+    python -m benchmarks.run --baseline benchmarks/baseline.json --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Échantillons typiques de chaque classe (mêmes valeurs que monitoring/test_metrics.py)
+IRIS_SAMPLES = [
+    {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2},
+    {"sepal_length": 4.9, "sepal_width": 3.0, "petal_length": 1.4, "petal_width": 0.2},
+    {"sepal_length": 4.7, "sepal_width": 3.2, "petal_length": 1.3, "petal_width": 0.2},
+    {"sepal_length": 7.0, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4},
+    {"sepal_length": 6.4, "sepal_width": 3.2, "petal_length": 4.5, "petal_width": 1.5},
+    {"sepal_length": 6.9, "sepal_width": 3.1, "petal_length": 4.9, "petal_width": 1.5},
+    {"sepal_length": 6.3, "sepal_width": 3.3, "petal_length": 6.0, "petal_width": 2.5},
+    {"sepal_length": 5.8, "sepal_width": 2.7, "petal_length": 5.1, "petal_width": 1.9},
+    {"sepal_length": 7.1, "sepal_width": 3.0, "petal_length": 5.9, "petal_width": 2.1},
+]
+
+
+def random_sample(rng: random.Random) -> dict:
+    """Échantillon légèrement bruité (évite de ne mesurer que le cache des prédictions)"""
+    sample = rng.choice(IRIS_SAMPLES)
+    return {k: round(v + rng.uniform(-0.3, 0.3), 2) for k, v in sample.items()}
+
+
+# ========== SCÉNARIOS ==========
+# nom: (méthode, chemin, générateur du corps, part du nombre de requêtes)
+SCENARIOS = {
+    "predict": ("POST", "/predict", lambda rng: random_sample(rng), 1.0),
+    "predict_batch": (
+        "POST", "/predict/batch",
+        lambda rng: {"instances": [random_sample(rng) for _ in range(32)]}, 0.25
+    ),
+    # Même lot en float32 binaire (application/octet-stream, réponse binaire)
+    "predict_batch_binary": (
+        "POST", "/predict/batch",
+        lambda rng: np.array(
+            [list(random_sample(rng).values()) for _ in range(32)], dtype="<f4"
+        ).tobytes(), 0.25
+    ),
+    "prediction_stats": ("GET", "/prediction-stats", None, 1.0),
+    # Rafraîchissement réel des métriques de drift, mesuré jusqu'à sa fin (voir wait_for_drift_refresh)
+    "drift_refresh": ("POST", "/evidently/update-metrics", None, 0.02),
+    "drift_report": ("GET", "/evidently/drift", None, 0.02),
+}
+
+DRIFT_REFRESH_POLL_S = 0.01
+
+
+async def wait_for_drift_refresh(client: httpx.AsyncClient, requested_at: float, timeout: float) -> int:
+    """
+    Attend la fin d'un calcul des métriques de drift postérieur à la demande
+
+    Le POST ne fait que réveiller le scheduler : la requête n'est terminée
+    qu'une fois qu'une exécution s'est achevée après requested_at (date
+    time.time() de l'envoi). Avec plusieurs workers derrière --url, l'état
+    interrogé peut être celui d'un autre worker : mesure fiable en mémoire
+    ou avec un seul worker.
+
+    Returns:
+        Code HTTP retenu pour la requête (500 si le calcul a échoué, 504 au-delà de timeout)
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client.get("/evidently/update-metrics")
+        if response.status_code >= 400:
+            return response.status_code
+        status = response.json()
+        last_run = status.get("last_run")
+        if last_run and datetime.fromisoformat(last_run).timestamp() >= requested_at:
+            return 500 if status.get("last_error") else response.status_code
+        await asyncio.sleep(DRIFT_REFRESH_POLL_S)
+    return 504
+
+
+# Scénarios dont la réponse ne marque pas la fin du travail mesuré
+COMPLETIONS = {"drift_refresh": wait_for_drift_refresh}
+
+BINARY_HEADERS = {"Content-Type": "application/octet-stream"}
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, n_requests: int,
+                       concurrency: int, warmup: int, seed: int) -> dict:
+    """Envoie n_requests requêtes avec `concurrency` clients simultanés"""
+    method, path, make_body, _ = SCENARIOS[name]
+    completion = COMPLETIONS.get(name)
+    rng = random.Random(seed)
+    bodies = [make_body(rng) if make_body else None for _ in range(n_requests + warmup)]
+
+    async def send(body):
+        requested_at = time.time()
+        start_time = time.perf_counter()
+        if isinstance(body, bytes):
+            response = await client.request(method, path, content=body, headers=BINARY_HEADERS)
+        else:
+            response = await client.request(method, path, json=body)
+        status_code = response.status_code
+        if completion is not None and status_code < 400:
+            status_code = await completion(client, requested_at, client.timeout.read or 60.0)
+        return time.perf_counter() - start_time, status_code
+
+    for body in bodies[:warmup]:
+        await send(body)
+
+    latencies, errors = [], 0
+    queue = iter(bodies[warmup:])
+
+    async def worker():
+        nonlocal errors
+        for body in queue:
+            latency, status_code = await send(body)
+            latencies.append(latency)
+            if status_code >= 400:
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start_time
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+            "mean": round(float(latencies_ms.mean()), 3),
+            "max": round(float(latencies_ms.max()), 3),
+        },
+    }
+
+
+async def run_suite(client: httpx.AsyncClient, scenarios, n_requests: int, concurrency: int,
+                    warmup: int, seed: int) -> dict:
+    results = {}
+    for name in scenarios:
+        count = max(1, int(n_requests * SCENARIOS[name][3]))
+        results[name] = await run_scenario(
+            client, name, count, min(concurrency, count), warmup, seed
+        )
+        print(
+            f"  {name:<18} {results[name]['throughput_rps']:>9.1f} req/s  "
+            f"p50 {results[name]['latency_ms']['p50']:>8.2f} ms  "
+            f"p95 {results[name]['latency_ms']['p95']:>8.2f} ms  "
+            f"p99 {results[name]['latency_ms']['p99']:>8.2f} ms  "
+            f"erreurs {results[name]['errors']}",
+            file=sys.stderr
+        )
+    return results
+
+
+# ========== MODES D'EXÉCUTION ==========
+async def run_in_process(args) -> dict:
+    """Application chargée dans ce processus, appelée via le transport ASGI (hors réseau)"""
+    # Répertoire de travail jetable : le log des prédictions et les rapports
+    # ne polluent pas le dépôt ; modèles et données de référence sont liés
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="iris-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    for name in ("models", "data"):
+        link = workdir / name
+        if not link.exists():
+            link.symlink_to(REPO_ROOT / name, target_is_directory=True)
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_ROOT))
+
+    from api.app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await run_suite(client, args.scenarios, args.requests, args.concurrency, args.warmup, args.seed)
+
+
+async def run_over_http(args) -> dict:
+    """Instance déjà démarrée, appelée via HTTP"""
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await run_suite(client, args.scenarios, args.requests, args.concurrency, args.warmup, args.seed)
+
+
+# ========== COMPARAISON À LA RÉFÉRENCE ==========
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare les scénarios communs à la référence
+
+    Returns:
+        Liste des régressions (vide si aucune)
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+        if current["errors"] > reference["errors"]:
+            regressions.append(f"{name}: {current['errors']} erreurs (référence: {reference['errors']})")
+        for percentile in ("p50", "p95", "p99"):
+            limit = reference["latency_ms"][percentile] * (1 + tolerance)
+            if current["latency_ms"][percentile] > limit:
+                regressions.append(
+                    f"{name}: {percentile} {current['latency_ms'][percentile]:.2f} ms "
+                    f"> {limit:.2f} ms (référence {reference['latency_ms'][percentile]:.2f} ms)"
+                )
+        floor = reference["throughput_rps"] * (1 - tolerance)
+        if current["throughput_rps"] < floor:
+            regressions.append(
+                f"{name}: débit {current['throughput_rps']:.1f} req/s < {floor:.1f} req/s "
+                f"(référence {reference['throughput_rps']:.1f} req/s)"
+            )
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de performance de l'API Iris")
+    parser.add_argument("--url", help="URL d'une instance lancée (sinon : application en mémoire via ASGI)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="Requêtes par scénario (pondérées par scénario)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients simultanés")
+    parser.add_argument("--warmup", type=int, default=10, help="Requêtes de chauffe non mesurées")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des données envoyées")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--workdir", help="Répertoire de travail du mode en mémoire (temporaire par défaut)")
+    parser.add_argument("--output", help="Fichier JSON des résultats (sinon : sortie standard)")
+    parser.add_argument("--baseline", help="Référence à comparer ; une régression fait échouer l'exécution")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Dégradation tolérée (0.3 = 30 %%)")
+    parser.add_argument("--save-baseline", help="Enregistre les résultats comme nouvelle référence")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # Résolus avant un éventuel changement de répertoire (mode en mémoire)
+    for option in ("output", "baseline", "save_baseline"):
+        if getattr(args, option):
+            setattr(args, option, str(Path(getattr(args, option)).resolve()))
+
+    mode = "http" if args.url else "asgi"
+    print(f"🏁 Banc de performance ({mode}, concurrence {args.concurrency})", file=sys.stderr)
+    scenarios = asyncio.run(run_over_http(args) if args.url else run_in_process(args))
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "mode": mode,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "scenarios": scenarios,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(output, encoding="utf-8")
+        print(f"💾 Référence enregistrée: {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Régressions de performance:", file=sys.stderr)
+            for regression in regressions:
+                print(f"   - {regression}", file=sys.stderr)
+            return 1
+        print(f"✅ Aucune régression (tolérance {args.tolerance:.0%})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,14 @@
 """
 Script pour générer les données de référence Evidently
-À exécuter UNE SEULE FOIS pour créer data/reference_data.csv
-"""
-import pandas as pd
-
-# Mapping des espèces vers des valeurs numériques
-SPECIES_MAP = {
-    'Iris-setosa': 0,
-    'Iris-versicolor': 1,
-    'Iris-virginica': 2
-}
-
-# Lire le CSV d'origine
-df = pd.read_csv('data/Iris.csv')
+Crée data/reference_data.csv et son profil data/reference_profile.npz
 
-# Renommer les colonnes pour correspondre à l'API
-df = df.rename(columns={
-    'SepalLengthCm': 'sepal_length',
-    'SepalWidthCm': 'sepal_width',
-    'PetalLengthCm': 'petal_length',
-    'PetalWidthCm': 'petal_width',
-    'Species': 'prediction_name'
-})
-
-# Ajouter la colonne prediction (numérique)
-df['prediction'] = df['prediction_name'].map(SPECIES_MAP)
-
-# Sélectionner les colonnes dans le bon ordre
-df = df[['sepal_length', 'sepal_width', 'petal_length', 'petal_width', 
-         'prediction', 'prediction_name']]
+Équivalent à : python -m api.reference (voir api/reference.py pour les options)
+"""
+import sys
+from pathlib import Path
 
-# Sauvegarder
-df.to_csv('data/reference_data.csv', index=False)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from api.reference import main
 
-print(f"✅ Fichier de référence créé : data/reference_data.csv")
-print(f"📊 Nombre de lignes : {len(df)}")
-print(f"\n📋 Aperçu :")
-print(df.head())
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+"""
+Service multi-workers : Gunicorn lance plusieurs workers Uvicorn (un par cœur
+par défaut, WEB_CONCURRENCY) et les métriques Prometheus personnalisées sont
+partagées entre eux via le mode multiprocess de prometheus_client.
+
+Lancement : gunicorn -c gunicorn.conf.py api.app:app
+"""
+import os
+
+# Doit être défini avant tout import de prometheus_client (master et workers)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+# Les cœurs sont répartis entre les workers : petit pool d'inférence par worker
+os.environ.setdefault("INFERENCE_WORKERS", "2")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# La génération d'un rapport Evidently peut prendre plusieurs secondes
+timeout = 120
+graceful_timeout = 30
+
+
+def on_starting(server):
+    """Vide les fichiers de métriques laissés par une exécution précédente"""
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    """Retire les gauges "live*" d'un worker arrêté ou mort"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,76 @@
+"""
+Mode compilé : CompiledForest doit reproduire predict_proba de scikit-learn
+
+Vérifié pour les modèles livrés dans models/, sur des lignes aléatoires et
+sur des lignes placées exactement sur les seuils des arbres (et juste de
+part et d'autre), là où float32 et float64 peuvent diverger.
+"""
+import asyncio
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.config import FEATURE_COLUMNS
+from api.inference import CompiledForest
+from api.registry import ModelRegistry
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHIPPED_MODELS = ["random_forest_classifier", "decision_tree_classifier"]
+
+
+def _load(name: str):
+    return joblib.load(REPO_ROOT / "models" / name / f"{name}.pkl")
+
+
+def _sklearn_proba(model, X) -> np.ndarray:
+    return model.predict_proba(pd.DataFrame(X, columns=getattr(model, "feature_names_in_", None)))
+
+
+def _boundary_rows(model, rng) -> np.ndarray:
+    """Pour chaque seuil : valeur du seuil et valeurs float32 adjacentes, autres colonnes aléatoires"""
+    forest = CompiledForest(model)
+    is_split = forest.left != np.arange(len(forest.left))
+    rows = []
+    for feature, threshold in zip(forest.feature[is_split], forest.threshold[is_split]):
+        value = np.float32(threshold)
+        for candidate in (value, np.nextafter(value, np.float32(-np.inf)), np.nextafter(value, np.float32(np.inf)),
+                          threshold):
+            row = rng.uniform(0.0, 8.0, size=len(FEATURE_COLUMNS))
+            row[feature] = candidate
+            rows.append(row)
+    return np.array(rows, dtype=np.float64)
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+@pytest.mark.parametrize("name", SHIPPED_MODELS)
+def test_compiled_forest_matches_sklearn_on_random_inputs(name):
+    model = _load(name)
+    rng = np.random.default_rng(0)
+    X = np.vstack([
+        rng.uniform(0.0, 8.0, size=(2000, len(FEATURE_COLUMNS))),
+        rng.normal(4.0, 3.0, size=(500, len(FEATURE_COLUMNS))),
+    ])
+    np.testing.assert_allclose(CompiledForest(model).predict_proba(X), _sklearn_proba(model, X), atol=1e-12)
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+@pytest.mark.parametrize("name", SHIPPED_MODELS)
+def test_compiled_forest_matches_sklearn_on_thresholds(name):
+    model = _load(name)
+    X = _boundary_rows(model, np.random.default_rng(1))
+    assert len(X) > 0
+    np.testing.assert_allclose(CompiledForest(model).predict_proba(X), _sklearn_proba(model, X), atol=1e-12)
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+@pytest.mark.parametrize("name", SHIPPED_MODELS)
+def test_registry_keeps_compiled_mode_verified_on_reference_data(name):
+    registry = ModelRegistry(
+        REPO_ROOT / "models", name, mode="compiled", micro_batching=False,
+        reference_data_path=str(REPO_ROOT / "data" / "reference_data.csv")
+    )
+    loaded = asyncio.run(registry.load(name))
+    assert loaded.engine.mode == "compiled"
@@ -0,0 +1,144 @@
+"""
+Snapshots des statistiques avec plusieurs workers
+
+Les workers sont simulés par des pid fictifs (os.getpid remplacé au
+chargement et à chaque sauvegarde) ; les processus vivants sont ceux de
+ALIVE (_alive remplacé).
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.prediction_stats import RunningPredictionStats
+from api.storage import CsvPredictionStore
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+ALIVE = set()
+
+
+def _records(first: int, n: int, class_name: str = "Iris-setosa"):
+    return [
+        (START + timedelta(seconds=i), 5.1, 3.5, 1.4, 0.2, 0, class_name, 0.5)
+        for i in range(first, first + n)
+    ]
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    """worker(pid) : charge les statistiques comme le ferait le processus pid"""
+    ALIVE.clear()
+    monkeypatch.setattr(RunningPredictionStats, "_alive", staticmethod(lambda pid: pid in ALIVE))
+    snapshot_path = str(tmp_path / "prediction_stats.json")
+
+    def start(pid: int) -> RunningPredictionStats:
+        monkeypatch.setattr(os, "getpid", lambda: pid)
+        ALIVE.add(pid)
+        stats = RunningPredictionStats(snapshot_path)
+        assert stats.load_snapshot()
+        save_snapshot = stats.save_snapshot
+
+        def save_as_worker():
+            monkeypatch.setattr(os, "getpid", lambda: pid)
+            save_snapshot()
+
+        stats.save_snapshot = save_as_worker
+        return stats
+
+    RunningPredictionStats._write_state(snapshot_path, {
+        "total": 10, "class_counts": {"Iris-setosa": 10}, "confidence_sum": 5.0, "last_prediction": None,
+    })
+    return start
+
+
+def _worker_pids(stats: RunningPredictionStats) -> list:
+    return sorted(stats._worker_files())
+
+
+def _base_total(stats: RunningPredictionStats) -> int:
+    return RunningPredictionStats._read_state(stats.snapshot_path)["total"]
+
+
+def test_dead_worker_files_merged_once_then_deleted(worker):
+    first = worker(101)
+    first.update(_records(0, 5, "Iris-virginica"))
+    first.save_snapshot()
+    ALIVE.discard(101)
+
+    second = worker(102)
+    assert second.total == 15
+    assert second.class_counts == {"Iris-setosa": 10, "Iris-virginica": 5}
+    assert second.confidence_sum == pytest.approx(7.5)
+    assert second.last_prediction["timestamp"] == "2026-01-01 12:00:04.000000"
+    assert _base_total(second) == 15
+    assert _worker_pids(second) == []
+
+    # Déjà fusionné : un nouveau chargement ne l'ajoute pas une seconde fois
+    assert worker(103).total == 15
+    assert _base_total(second) == 15
+
+
+def test_live_worker_deltas_added_without_double_counting(worker):
+    first = worker(101)
+    first.update(_records(0, 5))
+    first.save_snapshot()
+
+    second = worker(102)
+    assert second.total == 15
+    # Le fichier du worker vivant reste séparé de la base
+    assert _base_total(second) == 10
+    assert _worker_pids(second) == [101]
+
+    second.update(_records(5, 3))
+    second.save_snapshot()
+    assert RunningPredictionStats._read_state(second._worker_path(102))["total"] == 3
+
+    first.update(_records(8, 2))
+    first.save_snapshot()
+    assert RunningPredictionStats._read_state(first._worker_path(101))["total"] == 7
+
+    assert worker(103).total == 20
+
+
+def test_restarted_worker_does_not_count_its_predictions_twice(worker):
+    first = worker(101)
+    first.update(_records(0, 5))
+    first.save_snapshot()
+
+    # Redémarrage avec le même pid : son propre fichier rejoint la base
+    restarted = worker(101)
+    assert restarted.total == 15
+    assert _base_total(restarted) == 15
+    restarted.update(_records(5, 2))
+    restarted.save_snapshot()
+    assert RunningPredictionStats._read_state(restarted._worker_path(101))["total"] == 2
+    assert worker(102).total == 17
+
+    # Redémarrage avec un nouveau pid : l'ancien fichier est fusionné une seule fois
+    ALIVE.discard(101)
+    replacement = worker(104)
+    assert replacement.total == 17
+    replacement.save_snapshot()
+    assert worker(105).total == 17
+
+
+def test_rebuild_replaces_base_and_dead_worker_files(worker, tmp_path):
+    store = CsvPredictionStore(str(tmp_path / "log.csv"))
+    store.initialize()
+    store.append(_records(0, 4))
+
+    dead = worker(101)
+    dead.update(_records(0, 2))
+    dead.save_snapshot()
+    ALIVE.discard(101)
+    live = worker(102)
+    live.update(_records(2, 2))
+    live.save_snapshot()
+
+    stats = worker(103)
+    stats.rebuild(store)
+    assert stats.total == 4
+    assert _base_total(stats) == 4
+    # Le log contient déjà les prédictions du worker terminé, pas celles du worker vivant
+    assert _worker_pids(stats) == [102]
+    assert worker(104).total == 6
@@ -0,0 +1,149 @@
+"""
+Log CSV des prédictions : rotation, archives gzip indexées, lectures bornées et rétention
+
+sepal_length porte le numéro de chaque ligne : les lectures sont comparées
+aux numéros attendus.
+"""
+import gzip
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.storage import CsvPredictionStore
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _timestamp(i: int) -> datetime:
+    return START + timedelta(seconds=i)
+
+
+def _records(first: int, n: int):
+    return [
+        (_timestamp(i), float(i), 3.0, 1.4, 0.2, i % 3, "Iris-setosa", 0.9)
+        for i in range(first, first + n)
+    ]
+
+
+def _ids(df) -> list:
+    return [int(value) for value in df["sepal_length"]]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """
+    Deux archives (lignes 0-24 puis 25-54, blocs de 10 lignes) et le
+    fichier courant (lignes 55-61)
+    """
+    monkeypatch.setattr(CsvPredictionStore, "ARCHIVE_BLOCK_ROWS", 10)
+    store = CsvPredictionStore(str(tmp_path / "log.csv"), str(tmp_path / "archive"), max_bytes=1)
+    store.initialize()
+    store.append(_records(0, 25))
+    assert store.rotate()
+    store.append(_records(25, 30))
+    assert store.rotate()
+    store.append(_records(55, 7))
+    return store
+
+
+N_ROWS = 62
+
+
+def test_archives_are_plain_gzip_with_index(store):
+    archives = store._archives()
+    assert len(archives) == 2
+    for archive in archives:
+        assert archive.with_name(f"{archive.name}.idx").exists()
+    with gzip.open(archives[-1], "rt") as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith("timestamp,")
+    assert len(lines) == 31
+
+
+@pytest.mark.parametrize("limit", [1, 5, 7, 8, 17, 20, 37, 55, 62, 100])
+def test_read_limit_across_archives(store, limit):
+    assert _ids(store.read(limit=limit)) == list(range(N_ROWS))[-limit:]
+
+
+@pytest.mark.parametrize("first", [0, 3, 9, 10, 24, 25, 30, 54, 55, 58, 61])
+def test_read_since_across_archives(store, first):
+    expected = list(range(first, N_ROWS))
+    assert _ids(store.read(since=_timestamp(first))) == expected
+    # Entre deux lignes : la suivante est la première retenue
+    assert _ids(store.read(since=_timestamp(first) - timedelta(milliseconds=500))) == expected
+
+
+def test_read_since_until_and_full_read(store):
+    assert _ids(store.read(since=_timestamp(20), until=_timestamp(30))) == list(range(20, 30))
+    assert _ids(store.read()) == list(range(N_ROWS))
+    assert list(store.read(columns=["confidence"], limit=3).columns) == ["confidence"]
+
+
+@pytest.mark.parametrize("kwargs, members", [
+    ({"limit": 7}, 0),
+    ({"limit": 8}, 1),
+    ({"limit": 17}, 1),
+    ({"limit": 18}, 2),
+    ({"limit": 40}, 4),
+    ({"since": _timestamp(58)}, 0),
+    ({"since": _timestamp(50)}, 1),
+    ({"since": _timestamp(44)}, 2),
+    ({"since": _timestamp(24)}, 4),
+])
+def test_bounded_reads_decompress_only_needed_members(store, monkeypatch, kwargs, members):
+    decompressed = []
+    decompress = gzip.decompress
+
+    def counting_decompress(data):
+        decompressed.append(len(data))
+        return decompress(data)
+
+    monkeypatch.setattr(gzip, "decompress", counting_decompress)
+    store.read(**kwargs)
+    assert len(decompressed) == members
+
+
+def test_retention_deletes_expired_archives_and_index(store):
+    old, recent = store._archives()
+    expired = old.with_name(f"{store._stem}-20200101-000000.000000-1.csv.gz")
+    old.rename(expired)
+    old.with_name(f"{old.name}.idx").rename(expired.with_name(f"{expired.name}.idx"))
+
+    assert store.apply_retention(datetime.now() - timedelta(days=1)) == 1
+    assert not expired.exists()
+    assert not expired.with_name(f"{expired.name}.idx").exists()
+    assert store._archives() == [recent]
+    assert _ids(store.read()) == list(range(25, N_ROWS))
+
+
+def test_rotate_with_concurrent_appends(tmp_path, monkeypatch):
+    monkeypatch.setattr(CsvPredictionStore, "ARCHIVE_BLOCK_ROWS", 50)
+    store = CsvPredictionStore(str(tmp_path / "log.csv"), str(tmp_path / "archive"), max_bytes=4096)
+    store.initialize()
+    n_writers, n_batches, batch_size = 4, 100, 5
+    writing = threading.Event()
+    writing.set()
+    rotations = []
+
+    def write(writer: int):
+        for batch in range(n_batches):
+            store.append(_records((writer * n_batches + batch) * batch_size, batch_size))
+
+    def rotate():
+        while writing.is_set():
+            if store.rotate():
+                rotations.append(1)
+
+    rotator = threading.Thread(target=rotate)
+    rotator.start()
+    writers = [threading.Thread(target=write, args=(w,)) for w in range(n_writers)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writing.clear()
+    rotator.join()
+
+    assert rotations
+    assert sorted(_ids(store.read())) == list(range(n_writers * n_batches * batch_size))
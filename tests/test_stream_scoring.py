@@ -0,0 +1,114 @@
+"""
+Scoring en flux (/predict/stream) avec un corps reçu en plusieurs morceaux
+
+Le corps est envoyé par morceaux de 64 Ko via le transport ASGI de httpx :
+chaque morceau est un message http.request distinct, comme sous uvicorn
+pour un gros fichier. Le modèle est celui de models/random_forest_classifier.
+"""
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+import pandas as pd
+from fastapi import FastAPI
+
+from api import routes
+from api.config import FEATURE_COLUMNS
+from api.executor import InferenceExecutor
+from api.registry import ModelRegistry
+from api.stream_scoring import ChunkReader, NDJSON
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BODY_PIECE_SIZE = 1 << 16
+IRIS_FEATURES = ["SepalLengthCm", "SepalWidthCm", "PetalLengthCm", "PetalWidthCm"]
+
+
+def _iris(n_rows: int) -> pd.DataFrame:
+    """n_rows lignes de data/Iris.csv (répétées), Id renuméroté"""
+    iris = pd.read_csv(REPO_ROOT / "data" / "Iris.csv")
+    df = pd.concat([iris] * (n_rows // len(iris) + 1), ignore_index=True).head(n_rows)
+    df["Id"] = range(1, n_rows + 1)
+    return df
+
+
+async def _pieces(body: bytes, size: int = BODY_PIECE_SIZE):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def _post_stream(body: bytes, content_type: str, piece_size: int = BODY_PIECE_SIZE, chunk_size: int = 1000):
+    """Envoie body en morceaux de piece_size octets et renvoie (statut, lignes NDJSON)"""
+    registry = ModelRegistry(REPO_ROOT / "models", "random_forest_classifier", micro_batching=False)
+    loaded = await registry.load("random_forest_classifier")
+    executor = InferenceExecutor(engine=loaded.engine, kind="thread", max_workers=2)
+    executor.start()
+    registry.executor = executor
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    globals_before = (routes.model_registry, routes.inference_executor, routes.STREAM_CHUNK_SIZE)
+    routes.model_registry, routes.inference_executor, routes.STREAM_CHUNK_SIZE = registry, executor, chunk_size
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            response = await client.post(
+                "/predict/stream", content=_pieces(body, piece_size), headers={"content-type": content_type}
+            )
+    finally:
+        routes.model_registry, routes.inference_executor, routes.STREAM_CHUNK_SIZE = globals_before
+        executor.shutdown()
+    return response.status_code, [json.loads(line) for line in response.text.splitlines()]
+
+
+def _check_results(lines: list, n_rows: int):
+    assert "error" not in lines[-1], lines[-1]
+    assert lines[-1] == {"count": n_rows}
+    results = lines[:-1]
+    assert [result["row"] for result in results] == list(range(n_rows))
+    assert [result["id"] for result in results] == list(range(1, n_rows + 1))
+
+
+def test_chunk_reader_lines_split_across_pieces():
+    df = _iris(2500)
+    body = df.to_csv(index=False).encode()
+
+    async def read():
+        reader = ChunkReader(_pieces(body, 1000), "csv", chunk_size=1000)
+        await reader.read_header()
+        return [(ids, X) async for ids, X in reader]
+
+    blocks = asyncio.run(read())
+    assert [len(X) for _, X in blocks] == [1000, 1000, 500]
+    assert sum((ids for ids, _ in blocks), []) == df["Id"].tolist()
+    assert (pd.concat([pd.DataFrame(X) for _, X in blocks]).to_numpy()
+            == df[IRIS_FEATURES].to_numpy()).all()
+
+
+def test_stream_csv_multi_chunk_body():
+    n_rows = 20000
+    body = _iris(n_rows).to_csv(index=False).encode()
+    assert len(body) > 4 * BODY_PIECE_SIZE
+
+    status, lines = asyncio.run(_post_stream(body, "text/csv"))
+    assert status == 200
+    _check_results(lines, n_rows)
+
+
+def test_stream_ndjson_multi_chunk_body():
+    n_rows = 12000
+    body = _iris(n_rows).to_json(orient="records", lines=True).encode()
+    assert len(body) > 4 * BODY_PIECE_SIZE
+
+    status, lines = asyncio.run(_post_stream(body, NDJSON))
+    assert status == 200
+    _check_results(lines, n_rows)
+
+
+def test_stream_ndjson_single_line_split_across_pieces():
+    record = dict(zip(FEATURE_COLUMNS, (5.1, 3.5, 1.4, 0.2)), Id=1)
+    body = json.dumps(record).encode()
+
+    status, lines = asyncio.run(_post_stream(body, NDJSON, piece_size=8))
+    assert status == 200
+    _check_results(lines, 1)